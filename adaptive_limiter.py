@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+
+DEFAULT_INITIAL_LIMIT = 8
+DEFAULT_MAX_LIMIT = 64
+DEFAULT_RETRIES = 5
+DEFAULT_BASE_DELAY_S = 0.5
+DEFAULT_MAX_DELAY_S = 20.0
+# Without an explicit target, latency above this multiple of the baseline stops growth
+DEFAULT_LATENCY_TOLERANCE = 2.0
+# Successes per window of the minimum-latency baseline
+DEFAULT_BASELINE_WINDOW = 100
+# Weight of the latest success in the smoothed latency compared against the baseline
+_SMOOTHING = 0.1
+
+logger = logging.getLogger("adaptive_limiter")
+
+# Whole-word match, so resource ids that merely contain "429" do not count
+_THROTTLE_PATTERN = re.compile(r"\b(429|503|RESOURCE_EXHAUSTED|UNAVAILABLE)\b|Resource exhausted|"
+                               r"Quota exceeded|Too Many Requests|Service Unavailable")
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """
+    True for quota/overload errors worth retrying (HTTP 429/503, gRPC RESOURCE_EXHAUSTED/UNAVAILABLE).
+
+    Checks google.api_core-style integer codes, grpc-style code() methods and, as a last
+    resort, the error text, so no client library has to be imported.
+    """
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if code in (429, 503):
+        return True
+    if code is not None and getattr(code, "name", None) in ("RESOURCE_EXHAUSTED", "UNAVAILABLE"):
+        return True
+    return bool(_THROTTLE_PATTERN.search(str(error)))
+
+
+class _Waiter:
+    # A caller queued for a slot: a thread (event) or a coroutine (future on its loop)
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one backend (Speech-to-Text, an agent engine, ...).
+
+    Every healthy success grows the limit by 1/limit (about +1 per round of requests);
+    a throttling error halves it, at most once per cooldown so a burst of 429s from
+    requests already in flight counts as one signal. A success is healthy while the
+    smoothed latency stays under the target: target_latency_s when given, else
+    latency_tolerance times the baseline, the lowest latency seen over the last
+    baseline_window successes (as in TCP Vegas). Above it, requests are queueing at the
+    backend, so each success shrinks the limit by 1/limit instead.
+
+    Waiting threads and coroutines are served in arrival order, and each freed slot is
+    handed to exactly one of them.
+
+    Args:
+        name (str): Backend name, for logging.
+        initial_limit (int): Starting concurrency.
+        min_limit (int): Lower bound of the limit.
+        max_limit (int): Upper bound of the limit.
+        target_latency_s (float): Optional fixed smoothed latency above which the limit shrinks.
+        decrease_factor (float): Multiplier applied on throttling.
+        cooldown_s (float): Minimum time between two decreases.
+        latency_tolerance (float): Multiple of the baseline latency treated as healthy.
+        baseline_window (int): Successes after which the baseline is re-measured.
+    """
+
+    def __init__(self, name: str, initial_limit: int = DEFAULT_INITIAL_LIMIT, min_limit: int = 1,
+                 max_limit: int = DEFAULT_MAX_LIMIT, target_latency_s: float = None,
+                 decrease_factor: float = 0.5, cooldown_s: float = 1.0,
+                 latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+                 baseline_window: int = DEFAULT_BASELINE_WINDOW):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency_s = target_latency_s
+        self.decrease_factor = decrease_factor
+        self.cooldown_s = cooldown_s
+        self.latency_tolerance = latency_tolerance
+        self.baseline_window = baseline_window
+        self.baseline_latency_s = None
+        self.smoothed_latency_s = None
+        self.in_flight = 0
+        self._window_min = None
+        self._window_count = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def _try_take(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _grant(self):
+        # Caller holds the lock: passes free slots to the longest-waiting callers, one each
+        while self._waiters and self._try_take():
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            if waiter.future is None:
+                waiter.event.set()
+                continue
+            try:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+            except RuntimeError:
+                # The waiter's event loop is closed; nobody will use this slot
+                waiter.granted = False
+                self.in_flight -= 1
+
+    def acquire(self):
+        """Blocks until a slot is free."""
+        with self._lock:
+            if not self._waiters and self._try_take():
+                return
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        # The slot is ours once the event is set
+        waiter.event.wait()
+
+    async def acquire_async(self):
+        """Waits on the event loop until a slot is free."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._try_take():
+                return
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # A slot was handed over just as this coroutine was cancelled; pass it on
+                    self.in_flight -= 1
+                    self._grant()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        """Frees a slot, handing it to the longest-waiting thread or coroutine."""
+        with self._lock:
+            self.in_flight -= 1
+            self._grant()
+
+    def _target(self, latency_s: float):
+        # Caller holds the lock
+        if self.target_latency_s is not None:
+            return self.target_latency_s
+        if self._window_min is None or latency_s < self._window_min:
+            self._window_min = latency_s
+        self._window_count += 1
+        if self.baseline_latency_s is None or self._window_count >= self.baseline_window:
+            # Re-measured per window, so the baseline follows a backend that got slower for good
+            self.baseline_latency_s = self._window_min
+            self._window_min, self._window_count = None, 0
+        return self.baseline_latency_s * self.latency_tolerance
+
+    def on_success(self, latency_s: float):
+        with self._lock:
+            smoothed = self.smoothed_latency_s
+            self.smoothed_latency_s = smoothed = (latency_s if smoothed is None
+                                                  else smoothed + _SMOOTHING * (latency_s - smoothed))
+            if smoothed <= self._target(latency_s):
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._grant()
+            else:
+                self.limit = max(self.min_limit, self.limit - 1.0 / self.limit)
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown_s:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = now
+                logger.warning("%s: throttled, concurrency limit lowered to %d", self.name, int(self.limit))
+
+
+def backoff_delay(attempt: int, base_delay_s: float = DEFAULT_BASE_DELAY_S,
+                  max_delay_s: float = DEFAULT_MAX_DELAY_S) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(max_delay_s, base_delay_s * (2 ** attempt)))
+
+
+def call_with_retry(limiter: AdaptiveLimiter, fn, *args, retries: int = DEFAULT_RETRIES, **kwargs):
+    """
+    Calls fn under the limiter, retrying throttling errors with jittered exponential backoff.
+
+    Returns:
+        The result of fn. Non-throttling errors and the last throttling error are raised.
+    """
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            limiter.release()
+            if attempt < retries and is_throttling_error(e):
+                limiter.on_throttle()
+                time.sleep(backoff_delay(attempt))
+                continue
+            raise
+        limiter.on_success(time.monotonic() - started)
+        limiter.release()
+        return result
+
+
+async def acall_with_retry(limiter: AdaptiveLimiter, coro_fn, *args, retries: int = DEFAULT_RETRIES,
+                           **kwargs):
+    """Async variant of call_with_retry; coro_fn is an async function."""
+    for attempt in range(retries + 1):
+        await limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Cancelled by the caller (e.g. a deadline); the slot must not leak
+            limiter.release()
+            raise
+        except Exception as e:
+            limiter.release()
+            if attempt < retries and is_throttling_error(e):
+                limiter.on_throttle()
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            raise
+        limiter.on_success(time.monotonic() - started)
+        limiter.release()
+        return result
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, **options) -> AdaptiveLimiter:
+    """Returns the process-wide limiter for a backend, creating it with options on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter(name, **options)
+        return limiter
@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import dotenv
+from vertexai import agent_engines
+
+from adaptive_limiter import (acall_with_retry, backoff_delay, call_with_retry, get_limiter,
+                              is_throttling_error, DEFAULT_RETRIES)
+from agent_sessions import SessionPool
+from metrics import get_metrics, span
+
+# Load environment variables from a .env file
+dotenv.load_dotenv()
+
+# User the agent sessions belong to when the caller does not name one
+DEFAULT_USER_ID = os.environ.get("ADVISOR_ID", "new_user")
+
+# Prefix of the message returned instead of a response when an agent call fails
+ERROR_PREFIX = "An error occurred while invoking the agent"
+
+# Every agent event is logged at DEBUG level; AGENT_LOG_EVENTS=1 turns that on
+logger = logging.getLogger("agent_client")
+if os.environ.get("AGENT_LOG_EVENTS"):
+    logging.basicConfig()
+    logger.setLevel(logging.DEBUG)
+
+
+class AgentCancelled(Exception):
+    """Raised in a synchronous agent call whose async caller stopped waiting for it."""
+
+
+class AgentConfig:
+    """
+    Per-agent settings.
+
+    Args:
+        name (str): Short name the agent is referred to by (e.g. "premeet").
+        engine_id (str): Vertex AI Agent Engine resource id.
+        message_template (str): Format string turning the caller's input into the message.
+    """
+
+    def __init__(self, name: str, engine_id: str, message_template: str = "{}"):
+        self.name = name
+        self.engine_id = engine_id
+        self.message_template = message_template
+
+
+def _engine_id(name: str, default: str) -> str:
+    # e.g. PREMEET_AGENT_ENGINE_ID overrides the id of the pre-meeting agent
+    return os.environ.get(f"{name.upper()}_AGENT_ENGINE_ID", default)
+
+
+AGENTS = {
+    "premeet": AgentConfig("premeet", _engine_id("premeet", "6835540644581081088"),
+                           "Pre-Meeting Brief for  {}"),
+    "inmeet": AgentConfig("inmeet", _engine_id("inmeet", "429170174646550528")),
+    "postmeet": AgentConfig("postmeet", _engine_id("postmeet", "8908322373078351872")),
+    "generic": AgentConfig("generic", _engine_id("generic", "7305603855687876608")),
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_agent_engine(engine_id: str):
+    """
+    Returns the agent engine handle for engine_id, resolving it only once per process.
+
+    Args:
+        engine_id (str): Vertex AI Agent Engine resource id.
+
+    Returns:
+        The agent engine handle from vertexai.agent_engines.get.
+    """
+    engine = _engines.get(engine_id)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(engine_id)
+            if engine is None:
+                engine = agent_engines.get(engine_id)
+                _engines[engine_id] = engine
+    return engine
+
+
+def _create_session(agent_name: str, user_id: str) -> str:
+    agent_engine = get_agent_engine(AGENTS[agent_name].engine_id)
+    with span("agent.session_create", agent=agent_name):
+        return agent_engine.create_session(user_id=user_id)["id"]
+
+
+def _delete_session(agent_name: str, session) -> None:
+    agent_engine = get_agent_engine(AGENTS[agent_name].engine_id)
+    with span("agent.session_delete", agent=agent_name):
+        agent_engine.delete_session(user_id=session.user_id, session_id=session.session_id)
+
+
+# In-meeting sessions are reused across chunks, but retired after INMEET_SESSION_TURNS
+# exchanges so the chunk history the agent carries along stays short
+INMEET_SESSION_TURNS = int(os.environ.get("INMEET_SESSION_TURNS", 16))
+
+session_pool = SessionPool(_create_session, max_turns={"inmeet": INMEET_SESSION_TURNS},
+                           delete_session=_delete_session)
+
+
+def warm_sessions(agent_name: str, meeting_id: str = None, count: int = 1,
+                  user_id: str = DEFAULT_USER_ID):
+    """Pre-creates agent sessions for a meeting on a background thread."""
+    return session_pool.warm_in_background(agent_name, user_id, meeting_id, count)
+
+
+def invoke_agent(agent_name: str, user_input: str, user_id: str = DEFAULT_USER_ID,
+                 meeting_id: str = None, cancelled: threading.Event = None) -> str:
+    """
+    Sends one message to a configured agent and returns its final response.
+
+    The message goes to a pooled session for (agent, user, meeting), so consecutive calls
+    with the same key skip session creation and share the conversation (in-meeting calls
+    reuse a session for INMEET_SESSION_TURNS exchanges).
+
+    Args:
+        agent_name (str): Key into AGENTS ("premeet", "inmeet", "postmeet" or "generic").
+        user_input (str): The caller's input, formatted with the agent's message template.
+        user_id (str): The advisor (or chat user) the agent session belongs to.
+        meeting_id (str): Optional meeting or conversation the session is scoped to.
+        cancelled (threading.Event): Optional; once set, the call gives up at the next
+                                     response event, freeing its limiter slot and
+                                     discarding its session.
+
+    Returns:
+        str: The final, main response from the agent as a formatted string,
+             or an error message if the agent fails.
+    """
+    config = AGENTS[agent_name]
+    message = config.message_template.format(user_input)
+
+    try:
+        # Quota errors are retried with backoff under the engine's adaptive limiter
+        return call_with_retry(get_limiter(f"agent:{config.engine_id}"), _query,
+                               config, message, user_id, meeting_id, cancelled)
+    except Exception as e:
+        return f"{ERROR_PREFIX}: {e}"
+
+
+def _check_cancelled(cancelled: threading.Event):
+    if cancelled is not None and cancelled.is_set():
+        raise AgentCancelled("the caller stopped waiting for the response")
+
+
+def _query(config: AgentConfig, message: str, user_id: str, meeting_id: str,
+           cancelled: threading.Event = None) -> str:
+    _check_cancelled(cancelled)
+    # Get the (cached) agent engine and borrow a session from the pool
+    agent_engine = get_agent_engine(config.engine_id)
+
+    # Initialize a variable to hold the last event
+    last_event = None
+
+    with session_pool.checkout(config.name, user_id, meeting_id) as session, \
+            span("agent.stream", agent=config.name):
+        # Stream the query and capture each event, keeping only the last one
+        for event in agent_engine.stream_query(
+                user_id=session.user_id,
+                session_id=session.session_id,
+                message=message
+        ):
+            logger.debug("Received event: %s", event)
+            last_event = event
+            # Raising here discards the session, whose conversation is now half-finished
+            _check_cancelled(cancelled)
+
+    return _main_response(last_event)
+
+
+async def ainvoke_agent(agent_name: str, user_input: str, user_id: str = DEFAULT_USER_ID,
+                        meeting_id: str = None) -> str:
+    """
+    Async variant of invoke_agent.
+
+    Uses the engine's async_stream_query when the deployed agent provides it and falls back
+    to running invoke_agent on a worker thread otherwise. Cancelling the await (e.g. with
+    asyncio.wait_for) also stops the worker thread's call at its next response event.
+    """
+    config = AGENTS[agent_name]
+    try:
+        agent_engine = await asyncio.to_thread(get_agent_engine, config.engine_id)
+    except Exception as e:
+        return f"{ERROR_PREFIX}: {e}"
+    if not hasattr(agent_engine, "async_stream_query"):
+        cancelled = threading.Event()
+        try:
+            return await asyncio.to_thread(invoke_agent, agent_name, user_input, user_id, meeting_id, cancelled)
+        except asyncio.CancelledError:
+            # The thread cannot be interrupted; it stops at the next event instead
+            cancelled.set()
+            raise
+
+    message = config.message_template.format(user_input)
+    try:
+        return await acall_with_retry(get_limiter(f"agent:{config.engine_id}"), _aquery,
+                                      agent_engine, config, message, user_id, meeting_id)
+    except Exception as e:
+        return f"{ERROR_PREFIX}: {e}"
+
+
+async def _aquery(agent_engine, config: AgentConfig, message: str, user_id: str, meeting_id: str) -> str:
+    session = await asyncio.to_thread(session_pool.acquire, config.name, user_id, meeting_id)
+    last_event = None
+    try:
+        with span("agent.stream", agent=config.name):
+            async for event in agent_engine.async_stream_query(
+                    user_id=session.user_id,
+                    session_id=session.session_id,
+                    message=message
+            ):
+                logger.debug("Received event: %s", event)
+                last_event = event
+    except BaseException:
+        session_pool.discard(config.name, [session])
+        raise
+    # Sessions are only returned to the pool after a successful exchange
+    session_pool.release(config.name, session, meeting_id)
+
+    return _main_response(last_event)
+
+
+def stream_agent(agent_name: str, user_input: str, user_id: str = DEFAULT_USER_ID,
+                 meeting_id: str = None, raise_errors: bool = False):
+    """
+    Streams an agent's response as text deltas while it is being generated.
+
+    Partial (token-level) events are yielded as they arrive; an agent that does not stream
+    partials yields the text of each complete event instead. Throttling errors that occur
+    before any text was produced are retried like invoke_agent; any other failure is
+    yielded as a final error message, or raised with raise_errors.
+
+    Args:
+        agent_name (str): Key into AGENTS ("premeet", "inmeet", "postmeet" or "generic").
+        user_input (str): The caller's input, formatted with the agent's message template.
+        user_id (str): The advisor (or chat user) the agent session belongs to.
+        meeting_id (str): Optional meeting or conversation the session is scoped to.
+        raise_errors (bool): Raise failures instead of yielding them, so a caller that keeps
+                             the text can tell a complete response from a cut-off one.
+
+    Yields:
+        str: Consecutive pieces of the response text.
+    """
+    config = AGENTS[agent_name]
+    message = config.message_template.format(user_input)
+    limiter = get_limiter(f"agent:{config.engine_id}")
+
+    for attempt in range(DEFAULT_RETRIES + 1):
+        produced = False
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            for delta in _stream_deltas(config, message, user_id, meeting_id):
+                produced = True
+                yield delta
+            limiter.on_success(time.monotonic() - started)
+            return
+        except Exception as e:
+            if not produced and attempt < DEFAULT_RETRIES and is_throttling_error(e):
+                limiter.on_throttle()
+                retry_delay = backoff_delay(attempt)
+            elif raise_errors:
+                raise
+            else:
+                yield f"{ERROR_PREFIX}: {e}"
+                return
+        finally:
+            limiter.release()
+        time.sleep(retry_delay)
+
+
+def _stream_deltas(config: AgentConfig, message: str, user_id: str, meeting_id: str):
+    agent_engine = get_agent_engine(config.engine_id)
+    streamed_partials = False
+    separator = ""
+    # Timed by hand, since a span cannot stay open across yields
+    metrics = get_metrics()
+    waiting_for_first = True
+
+    with session_pool.checkout(config.name, user_id, meeting_id) as session:
+        started = time.perf_counter()
+        try:
+            for event in agent_engine.stream_query(
+                    user_id=session.user_id,
+                    session_id=session.session_id,
+                    message=message
+            ):
+                logger.debug("Received event: %s", event)
+                text = _event_text(event)
+                if text and waiting_for_first:
+                    metrics.observe("agent.first_token", time.perf_counter() - started, agent=config.name)
+                    waiting_for_first = False
+                if event.get('partial'):
+                    if text:
+                        yield (separator if not streamed_partials else "") + text
+                        streamed_partials = True
+                elif streamed_partials:
+                    # The complete event repeats the partials already streamed
+                    streamed_partials = False
+                    separator = "\n\n"
+                elif text:
+                    yield separator + text
+                    separator = "\n\n"
+        finally:
+            metrics.observe("agent.stream", time.perf_counter() - started, agent=config.name)
+
+
+def _event_text(event) -> str:
+    parts = (event.get('content') or {}).get('parts') or []
+    return "".join(part.get('text') or "" for part in parts)
+
+
+def _main_response(last_event) -> str:
+    # The main response is in the 'text' part of the last event's 'content'
+    if last_event and 'content' in last_event and 'parts' in last_event['content']:
+        return last_event['content']['parts'][0]['text']
+    return "Could not find the main response in the agent's output."
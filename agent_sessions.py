@@ -0,0 +1,184 @@
+import concurrent.futures
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_SESSION_TTL_S = float(os.environ.get("AGENT_SESSION_TTL_S", 30 * 60))
+# Expired idle sessions are dropped on checkout at most this often
+PRUNE_INTERVAL_S = 60.0
+# Threads that create replacement and pre-warmed sessions and delete retired ones
+SESSION_WORKERS = int(os.environ.get("AGENT_SESSION_WORKERS", 4))
+
+
+class PooledSession:
+    """
+    A remote agent session owned by the pool.
+
+    Args:
+        session_id (str): Id returned by the agent engine's create_session.
+        user_id (str): The user the session was created for.
+    """
+
+    def __init__(self, session_id: str, user_id: str):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Exchanges completed in this session, i.e. turns of history the agent has kept
+        self.turns = 0
+
+
+class SessionPool:
+    """
+    Reusable agent sessions keyed by (agent, user, meeting).
+
+    A session is checked out by exactly one caller at a time, so concurrent workers never
+    interleave messages in the same conversation; idle sessions are handed to the next
+    caller with the same key. Sessions unused for longer than ttl_s are dropped.
+
+    An agent whose history should stay short (e.g. analysis of meeting chunks) gets a
+    turn limit: a session that has served that many exchanges is retired, and a fresh one
+    is created in the background to take its place. Retired, expired and failed sessions
+    are deleted from the engine when delete_session is given. Background work runs on one
+    long-lived pool of SESSION_WORKERS threads, so it never spawns a thread per call.
+
+    Args:
+        create_session (callable): create_session(agent_name, user_id) -> session id.
+        ttl_s (float): Idle time after which a session is no longer reused.
+        max_turns (dict): Optional agent name -> exchanges a session serves before it is retired.
+        delete_session (callable): Optional delete_session(agent_name, session) removing a
+                                   PooledSession from the engine.
+    """
+
+    def __init__(self, create_session, ttl_s: float = DEFAULT_SESSION_TTL_S, max_turns: dict = None,
+                 delete_session=None):
+        self._create_session = create_session
+        self._delete_session = delete_session
+        self.ttl_s = ttl_s
+        self.max_turns = dict(max_turns or {})
+        self._idle = {}
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _is_fresh(self, session: PooledSession, now: float) -> bool:
+        return now - session.last_used < self.ttl_s
+
+    def _submit(self, fn, *args) -> concurrent.futures.Future:
+        with self._lock:
+            if self._worker is None:
+                self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=SESSION_WORKERS,
+                                                                     thread_name_prefix="agent-sessions")
+            return self._worker.submit(fn, *args)
+
+    def _delete(self, agent_name: str, sessions):
+        for session in sessions:
+            try:
+                self._delete_session(agent_name, session)
+            except Exception as e:
+                print(f"Could not delete {agent_name} session {session.session_id}: {e}")
+
+    def discard(self, agent_name: str, sessions):
+        """Deletes sessions that will not be used again from the engine, in the background."""
+        if self._delete_session is not None and sessions:
+            self._submit(self._delete, agent_name, list(sessions))
+
+    def _take_idle(self, key):
+        now = time.monotonic()
+        with self._lock:
+            sessions = self._idle.get(key, [])
+            fresh = [s for s in sessions if self._is_fresh(s, now)]
+            expired = [s for s in sessions if not self._is_fresh(s, now)]
+            session = fresh.pop() if fresh else None
+            self._idle[key] = fresh
+        self.discard(key[0], expired)
+        return session
+
+    def _new_session(self, agent_name: str, user_id: str) -> PooledSession:
+        return PooledSession(self._create_session(agent_name, user_id), user_id)
+
+    def acquire(self, agent_name: str, user_id: str, meeting_id: str = None) -> PooledSession:
+        """
+        Takes an idle session for the key, creating one if none is available.
+
+        The caller owns the session until it is passed back to release(); a session that
+        failed mid-call is passed to discard() instead.
+        """
+        if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_S:
+            self.prune()
+        key = (agent_name, user_id, meeting_id)
+        return self._take_idle(key) or self._new_session(agent_name, user_id)
+
+    def release(self, agent_name: str, session: PooledSession, meeting_id: str = None):
+        """
+        Returns a session obtained from acquire() to the idle pool after one exchange.
+
+        A session that reached the agent's turn limit is retired instead: it is deleted and
+        replaced by a new one created in the background.
+        """
+        session.turns += 1
+        max_turns = self.max_turns.get(agent_name)
+        if max_turns is not None and session.turns >= max_turns:
+            self.discard(agent_name, [session])
+            self.warm_in_background(agent_name, session.user_id, meeting_id)
+            return
+        self._release((agent_name, session.user_id, meeting_id), session)
+
+    def _release(self, key, session: PooledSession):
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._idle.setdefault(key, []).append(session)
+
+    @contextmanager
+    def checkout(self, agent_name: str, user_id: str, meeting_id: str = None):
+        """
+        Borrows a session for one exchange with the agent, creating one if none is idle.
+
+        If the block raises, the session is discarded rather than returned to the pool.
+
+        Yields:
+            PooledSession: The borrowed session.
+        """
+        session = self.acquire(agent_name, user_id, meeting_id)
+        try:
+            yield session
+        except BaseException:
+            self.discard(agent_name, [session])
+            raise
+        self.release(agent_name, session, meeting_id)
+
+    def _warm_one(self, agent_name: str, user_id: str, meeting_id: str):
+        try:
+            self._release((agent_name, user_id, meeting_id), self._new_session(agent_name, user_id))
+        except Exception as e:
+            print(f"Could not pre-create {agent_name} session: {e}")
+
+    def warm(self, agent_name: str, user_id: str, meeting_id: str = None, count: int = 1):
+        """
+        Pre-creates sessions so the first calls for a meeting skip session creation.
+
+        Sessions are created concurrently; failures are logged and skipped.
+        """
+        concurrent.futures.wait(self.warm_in_background(agent_name, user_id, meeting_id, count))
+
+    def warm_in_background(self, agent_name: str, user_id: str, meeting_id: str = None,
+                           count: int = 1) -> list:
+        """Queues the creation of count sessions on the pool's workers and returns their futures."""
+        return [self._submit(self._warm_one, agent_name, user_id, meeting_id) for _ in range(count)]
+
+    def prune(self):
+        """Drops every idle session that has outlived the TTL."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            self._last_prune = now
+            for key, sessions in list(self._idle.items()):
+                fresh = [s for s in sessions if self._is_fresh(s, now)]
+                expired += [(key[0], s) for s in sessions if not self._is_fresh(s, now)]
+                if fresh:
+                    self._idle[key] = fresh
+                else:
+                    del self._idle[key]
+        for agent_name, session in expired:
+            self.discard(agent_name, [session])
@@ -0,0 +1,266 @@
+import collections
+import io
+import subprocess
+import threading
+import time
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+
+from metrics import get_metrics, span
+
+# Streams are decoded straight to the format sent to Speech-to-Text: 16 kHz mono
+STREAM_FRAME_RATE = 16000
+STREAM_CHANNELS = 1
+DEFAULT_FRAME_MS = 500
+
+
+class AudioChunk:
+    """
+    A window onto a PcmBuffer. The samples are a NumPy view of the parent buffer,
+    so creating a chunk never copies audio data.
+
+    Args:
+        samples (np.ndarray): int16 view of shape (frames, channels).
+        frame_rate (int): Sample rate of the audio in Hz.
+        start_ms (int): Offset of the chunk from the start of the recording.
+    """
+
+    def __init__(self, samples: np.ndarray, frame_rate: int, start_ms: int):
+        self.samples = samples
+        self.frame_rate = frame_rate
+        self.start_ms = start_ms
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def end_ms(self) -> int:
+        return self.start_ms + len(self)
+
+    def __len__(self) -> int:
+        # Duration in milliseconds, mirroring len(AudioSegment)
+        return int(round(self.samples.shape[0] * 1000 / self.frame_rate))
+
+    def linear16(self) -> memoryview:
+        """Returns the raw little-endian LINEAR16 bytes of the chunk without copying."""
+        return memoryview(self.samples).cast("B")
+
+
+class PcmBuffer:
+    """
+    A whole recording decoded once into one contiguous int16 array.
+
+    Args:
+        samples (np.ndarray): int16 array of shape (frames, channels).
+        frame_rate (int): Sample rate of the audio in Hz.
+    """
+
+    def __init__(self, samples: np.ndarray, frame_rate: int):
+        self.samples = np.ascontiguousarray(samples, dtype=np.int16)
+        self.frame_rate = frame_rate
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.samples.shape[0] / self.frame_rate
+
+    def __len__(self) -> int:
+        # Duration in milliseconds, mirroring len(AudioSegment)
+        return int(round(self.samples.shape[0] * 1000 / self.frame_rate))
+
+    def frame_at(self, position_ms: int) -> int:
+        """Converts a millisecond offset into a frame index clamped to the buffer."""
+        frame = int(position_ms * self.frame_rate // 1000)
+        return max(0, min(frame, self.samples.shape[0]))
+
+    def chunk(self, start_ms: int, end_ms: int) -> AudioChunk:
+        """Returns a zero-copy chunk covering [start_ms, end_ms)."""
+        start, end = self.frame_at(start_ms), self.frame_at(end_ms)
+        return AudioChunk(self.samples[start:end], self.frame_rate, start_ms)
+
+    def iter_chunks(self, chunk_duration_ms: int):
+        """Yields consecutive fixed-length chunks, the last one possibly shorter."""
+        for start in range(0, len(self), chunk_duration_ms):
+            yield self.chunk(start, start + chunk_duration_ms)
+
+
+def from_segment(audio: AudioSegment) -> PcmBuffer:
+    """Wraps an already decoded AudioSegment as a PcmBuffer, sharing its raw bytes."""
+    if audio.sample_width != 2:
+        audio = audio.set_sample_width(2)
+    samples = np.frombuffer(audio.raw_data, dtype="<i2").reshape(-1, audio.channels)
+    return PcmBuffer(samples, audio.frame_rate)
+
+
+def decode_audio(source, format: str = None) -> PcmBuffer:
+    """
+    Decodes an audio file a single time into a PcmBuffer.
+
+    Args:
+        source: A file path, raw file bytes or a binary file-like object.
+        format (str): Optional container format hint (e.g. "mp3"), passed to pydub.
+
+    Returns:
+        PcmBuffer: The decoded audio.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with span("audio.decode", mode="whole"):
+        return from_segment(AudioSegment.from_file(source, format=format))
+
+
+def _feed(stdin, data: bytes):
+    try:
+        with stdin:
+            stdin.write(data)
+    except (BrokenPipeError, ValueError, OSError):
+        # The reader stopped early and ffmpeg is gone; the rest of the input is not needed
+        pass
+
+
+def _drain(stream, tail: collections.deque):
+    for line in stream:
+        tail.append(line)
+
+
+def stream_pcm(source, format: str = None, frame_ms: int = DEFAULT_FRAME_MS, start_ms: int = 0,
+               frame_rate: int = STREAM_FRAME_RATE, channels: int = STREAM_CHANNELS):
+    """
+    Decodes audio through an ffmpeg pipe, yielding fixed-size frames as they are decoded.
+
+    Unlike decode_audio, the recording is never held in memory as a whole: ffmpeg only
+    decodes as fast as the frames are consumed, so memory stays at a few frames however
+    long the recording is, and the first frames are available almost immediately.
+
+    Args:
+        source: A file path or raw file bytes (fed to ffmpeg on stdin, no temp file).
+        format (str): Optional container format hint (e.g. "mp3"), passed to ffmpeg.
+        frame_ms (int): Duration of each yielded frame; the last one may be shorter.
+        start_ms (int): Offset to start decoding at.
+        frame_rate (int): Sample rate to decode to.
+        channels (int): Channel count to decode to.
+
+    Yields:
+        AudioChunk: Consecutive frames, timed from the start of the recording.
+    """
+    command = [AudioSegment.converter, "-hide_banner", "-loglevel", "error"]
+    if start_ms:
+        command += ["-ss", f"{start_ms / 1000:.3f}"]
+    if format:
+        command += ["-f", format]
+    from_bytes = isinstance(source, (bytes, bytearray, memoryview))
+    command += ["-i", "pipe:0" if from_bytes else str(source), "-vn", "-f", "s16le",
+                "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(frame_rate), "pipe:1"]
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if from_bytes else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    errors = collections.deque(maxlen=20)
+    helpers = [threading.Thread(target=_drain, args=(process.stderr, errors), daemon=True)]
+    if from_bytes:
+        helpers.append(threading.Thread(target=_feed, args=(process.stdin, source), daemon=True))
+    for helper in helpers:
+        helper.start()
+
+    frame_len = max(1, frame_rate * frame_ms // 1000)
+    frame_bytes = frame_len * channels * 2
+    finished = False
+    # Only the time spent waiting for ffmpeg counts as decoding, not the consumer's work
+    decoding_s = 0.0
+    try:
+        index = 0
+        while True:
+            read_started = time.perf_counter()
+            data = process.stdout.read(frame_bytes)
+            decoding_s += time.perf_counter() - read_started
+            if not data:
+                break
+            usable = len(data) - len(data) % (channels * 2)
+            samples = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, channels)
+            yield AudioChunk(samples, frame_rate, start_ms + index * frame_ms)
+            index += 1
+        finished = True
+    finally:
+        get_metrics().observe("audio.decode", decoding_s, mode="stream")
+        if not finished and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        returncode = process.wait()
+        for helper in helpers:
+            helper.join()
+    if returncode != 0:
+        message = b"".join(errors).decode(errors="replace").strip()
+        raise CouldntDecodeError(f"ffmpeg exited with code {returncode}: {message}")
+
+
+class StreamWindow:
+    """
+    The most recent stretch of a decoded stream, from which chunks are cut.
+
+    Frames are appended as they arrive and audio that is no longer needed is discarded,
+    so only a few seconds are held however long the stream is.
+
+    Args:
+        frame_rate (int): Sample rate of the stream in Hz.
+        channels (int): Channel count of the stream.
+        start_ms (int): Offset of the first frame from the start of the recording.
+    """
+
+    def __init__(self, frame_rate: int, channels: int, start_ms: int = 0):
+        self.frame_rate = frame_rate
+        self.samples = np.empty((0, channels), dtype=np.int16)
+        # Absolute frame index of samples[0]
+        self._offset = self.frame_at(start_ms)
+
+    def frame_at(self, position_ms: int) -> int:
+        return int(position_ms * self.frame_rate // 1000)
+
+    @property
+    def end_ms(self) -> int:
+        return int(round((self._offset + len(self.samples)) * 1000 / self.frame_rate))
+
+    def append(self, frame: AudioChunk):
+        self.samples = np.concatenate([self.samples, frame.samples])
+
+    def chunk(self, start_ms: int, end_ms: int) -> AudioChunk:
+        """Returns a chunk covering [start_ms, end_ms), copied out of the window."""
+        start = max(0, self.frame_at(start_ms) - self._offset)
+        end = max(start, self.frame_at(end_ms) - self._offset)
+        return AudioChunk(self.samples[start:end].copy(), self.frame_rate, start_ms)
+
+    def discard_before(self, position_ms: int):
+        """Drops the samples before position_ms."""
+        drop = min(len(self.samples), self.frame_at(position_ms) - self._offset)
+        if drop > 0:
+            self.samples = self.samples[drop:]
+            self._offset += drop
+
+
+def stream_fixed_chunks(frames, chunk_duration_ms: int):
+    """
+    Re-cuts decoded frames (e.g. from stream_pcm) into consecutive fixed-length chunks.
+
+    Args:
+        frames: Iterable of AudioChunk in stream order.
+        chunk_duration_ms (int): Length of each chunk; the last one may be shorter.
+
+    Yields:
+        AudioChunk: The chunks, as soon as enough audio has been decoded for each.
+    """
+    window = None
+    for frame in frames:
+        if window is None:
+            window = StreamWindow(frame.frame_rate, frame.channels, frame.start_ms)
+            position = frame.start_ms
+        window.append(frame)
+        while window.end_ms - position >= chunk_duration_ms:
+            yield window.chunk(position, position + chunk_duration_ms)
+            position += chunk_duration_ms
+            window.discard_before(position)
+    if window is not None and window.end_ms > position:
+        yield window.chunk(position, window.end_ms)
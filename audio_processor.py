@@ -1,3 +1,5 @@
+import argparse
+import asyncio
 import json
 import os
 import sys
@@ -17,41 +19,42 @@ from pydub import AudioSegment
 AudioSegment.converter = f"{ffmpeg_path}/ffmpeg"
 AudioSegment.ffprobe = f"{ffmpeg_path}/ffprobe"
 
-import concurrent.futures
 import sys
-from s2tconcur import process_chunk
-from inmeetagent_test import invoke_inmeet_agent
+from cpu_pool import decode_audio_shared, plan_chunks_in_pool
+from result_cache import audio_digest, cache_key, get_result_cache
+from inmeet_pipeline import process_chunks, run_pipeline
+from metrics import get_metrics
 
+# Files picked up when the batch input is a directory
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg")
 
-def extract_tone_sentiment(text):
-    """Extract tone and sentiment from agent response"""
-    import re
-    match = re.search(r"Tone:\s*(\w+)\s+Sentiment:\s*(\w+)", text)
-    return match.groups() if match else (None, None)
 
+def plan_fixed_chunks(audio_length_ms, chunk_duration_ms, total_chunks):
+    """Fixed-length (start, end) spans, capped at total_chunks and the audio length"""
+    spans = []
+    for i in range(total_chunks):
+        start = i * chunk_duration_ms
+        if start >= audio_length_ms:
+            break
+        spans.append((start, min(start + chunk_duration_ms, audio_length_ms)))
+    return spans
 
-def process_single_chunk(chunk, start_time):
-    """Process one audio chunk and return analysis"""
-    try:
-        transcript = process_chunk(chunk)
-        feedback = invoke_inmeet_agent(transcript)
-        tone, sentiment = extract_tone_sentiment(feedback)
-        return {
-            "start": start_time,
-            "end": start_time + len(chunk),
-            "transcript": transcript,
-            "feedback": feedback,
-            "tone": tone,
-            "sentiment": sentiment
-        }
-    except Exception as e:
-        print(f"Chunk processing error: {str(e)}")
-        return None
 
+def process_audio_parallel(input_path, chunk_duration_ms, total_chunks, use_vad=False, vad_params=None,
+                           stt_concurrency=16, agent_concurrency=8, batching=None):
+    """Main processing function with parallel execution.
+
+    Chunks run through the asyncio in-meeting pipeline with separate concurrency limits
+    for Speech-to-Text and agent requests. batching (MicroBatcher settings, {} for
+    defaults) groups adjacent transcripts into one agent request.
 
-def process_audio_parallel(input_path, chunk_duration_ms, total_chunks):
-    """Main processing function with parallel execution"""
+    With use_vad, chunks come from the voice-activity planner (silence skipped, cuts at
+    pauses) and total_chunks is ignored. Results are looked up in the on-disk result
+    cache before any decoding or API work is done.
+    """
     results = []
+    spans = []
+    key = None
     try:
         # Verify input file exists with retry
         max_retries = 3
@@ -69,48 +72,255 @@ def process_audio_parallel(input_path, chunk_duration_ms, total_chunks):
         except IOError as e:
             raise IOError(f"File exists but cannot be read: {input_path}. Error: {str(e)}")
 
+        # Same key layout as the dashboard, so either side can reuse the other's results
+        digest = audio_digest(input_path)
+        key = cache_key(digest,
+                        chunk_duration_ms=None if use_vad else chunk_duration_ms,
+                        use_vad=use_vad, vad_params=vad_params or {}, batching=batching,
+                        **({} if use_vad else {"total_chunks": total_chunks}))
+        cached = get_result_cache().get(key)
+        if cached is not None:
+            print(f"Loaded {len(cached)} cached chunk results for {input_path}")
+            return cached
+
         # Load audio file
         print(f"Loading audio file from {input_path}")
-        audio = AudioSegment.from_file(input_path)
+        audio = decode_audio_shared(input_path)
         print(f"Successfully loaded {len(audio)}ms of audio")
 
+        if use_vad:
+            spans = plan_chunks_in_pool(audio, **(vad_params or {}))
+        else:
+            spans = plan_fixed_chunks(len(audio), chunk_duration_ms, total_chunks)
+
         # Process chunks in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-            futures = []
-
-            # Create and submit all chunk processing tasks
-            for i in range(total_chunks):
-                start = i * chunk_duration_ms
-                end = min(start + chunk_duration_ms, len(audio))
-                chunk = audio[start:end]
-                futures.append(executor.submit(process_single_chunk, chunk, start))
-
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result:
-                    results.append(result)
+        results = process_chunks([audio.chunk(start, end) for start, end in spans], meeting_id=digest,
+                                 stt_concurrency=stt_concurrency, agent_concurrency=agent_concurrency,
+                                 batching=batching)
 
     except Exception as e:
         print(f"Audio processing failed: {str(e)}")
         traceback.print_exc()
 
     # Sort results by start time
-    return sorted(results, key=lambda x: x['start'])
+    results = sorted(results, key=lambda x: x['start'])
+
+    # Only complete runs are cached, so failed chunks get another chance next time
+    if key and spans and len(results) == len(spans):
+        get_result_cache().put(key, results)
+    return results
+
+
+def load_manifest(source):
+    """Recordings for a batch run: every audio file in a directory, or the entries of a JSONL manifest.
+
+    Manifest lines are JSON objects with the recording's "path" (also accepted: "audio_path",
+    "input_path"; relative to the manifest) and an optional "id" naming its output files.
+
+    Returns:
+        list: Dicts with "id" and "path".
+    """
+    if os.path.isdir(source):
+        return [{"id": os.path.splitext(name)[0], "path": os.path.join(source, name)}
+                for name in sorted(os.listdir(source)) if name.lower().endswith(AUDIO_EXTENSIONS)]
+
+    entries = []
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            path = entry.get("path") or entry.get("audio_path") or entry.get("input_path")
+            if not path:
+                print(f"Skipping manifest line {line_number}: no audio path")
+                continue
+            path = os.path.join(base_dir, path)
+            entries.append({"id": str(entry.get("id") or os.path.splitext(os.path.basename(path))[0]),
+                            "path": path})
+    return entries
+
+
+def read_checkpoint(checkpoint_path):
+    """Chunk results already appended to a JSONL checkpoint, by chunk index"""
+    done = {}
+    if not os.path.exists(checkpoint_path):
+        return done
+    with open(checkpoint_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line; that chunk is redone
+                continue
+            done[record["chunk"]] = record["result"]
+    return done
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+async def process_recording(entry, output_dir, chunk_duration_ms, total_chunks, use_vad=False, vad_params=None,
+                            batching=None, stt_slots=None, agent_slots=None):
+    """Processes one recording of a batch run, resuming from its checkpoint.
+
+    Each finished chunk is appended to <output_dir>/<id>-<key>.jsonl as soon as it is ready,
+    so a crash loses at most the chunks in flight; on restart only the chunks missing from
+    the checkpoint are processed. When every chunk is done, the sorted results are written
+    to <id>-<key>.json (the processed_results.json format) and stored in the result cache.
+    The key covers the audio content and the chunking parameters, so changing either starts
+    a fresh checkpoint.
+
+    Returns:
+        bool: True if the recording is complete.
+    """
+    input_path = entry["path"]
+    digest = await asyncio.to_thread(audio_digest, input_path)
+    key = cache_key(digest,
+                    chunk_duration_ms=None if use_vad else chunk_duration_ms,
+                    use_vad=use_vad, vad_params=vad_params or {}, batching=batching,
+                    **({} if use_vad else {"total_chunks": total_chunks}))
+    base_path = os.path.join(output_dir, f"{entry['id']}-{key[:12]}")
+    results_path, checkpoint_path = f"{base_path}.json", f"{base_path}.jsonl"
+
+    if os.path.exists(results_path):
+        print(f"Already processed: {input_path}")
+        return True
+    cached = get_result_cache().get(key)
+    if cached is not None:
+        write_json_atomic(results_path, cached)
+        print(f"Loaded {len(cached)} cached chunk results for {input_path}")
+        return True
+
+    audio = await asyncio.to_thread(decode_audio_shared, input_path)
+    if use_vad:
+        spans = await asyncio.to_thread(plan_chunks_in_pool, audio, **(vad_params or {}))
+    else:
+        spans = plan_fixed_chunks(len(audio), chunk_duration_ms, total_chunks)
+
+    done = read_checkpoint(checkpoint_path)
+    todo = [i for i in range(len(spans)) if i not in done]
+    failed = []
+    print(f"{input_path}: {len(spans)} chunks, {len(done)} from checkpoint, {len(todo)} to process")
+
+    if todo:
+        index_by_start = {spans[i][0]: i for i in todo}
+        # Start on a fresh line if the previous run died mid-write
+        needs_newline = False
+        if os.path.exists(checkpoint_path) and os.path.getsize(checkpoint_path) > 0:
+            with open(checkpoint_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        with open(checkpoint_path, "a") as checkpoint:
+            if needs_newline:
+                checkpoint.write("\n")
+
+            def on_result(result):
+                index = index_by_start[result['start']]
+                checkpoint.write(json.dumps({"chunk": index, "result": result}) + "\n")
+                checkpoint.flush()
+                done[index] = result
+
+            def on_failure(start_ms, end_ms, error):
+                # Failed chunks stay out of the checkpoint, so the next run retries them
+                failed.append(index_by_start[start_ms])
+
+            await run_pipeline([audio.chunk(*spans[i]) for i in todo], meeting_id=digest,
+                               on_result=on_result, on_failure=on_failure, batching=batching,
+                               stt_slots=stt_slots, agent_slots=agent_slots)
+
+    if len(done) < len(spans):
+        print(f"{input_path}: {len(spans) - len(done)} chunks failed ({sorted(failed)}); run again to retry them")
+        return False
+
+    results = [done[i] for i in range(len(spans))]
+    write_json_atomic(results_path, results)
+    get_result_cache().put(key, results)
+    print(f"Completed {input_path} ({len(results)} chunks)")
+    return True
+
+
+async def run_batch(source, output_dir, chunk_duration_ms=2000, total_chunks=100000, use_vad=False,
+                    vad_params=None, batching=None, max_files=4, stt_budget=16, agent_budget=8):
+    """Processes every recording of a directory or manifest, several at a time.
+
+    All recordings share one Speech-to-Text and one agent request budget, so the total load
+    on the APIs stays the same however many files run concurrently.
+
+    Returns:
+        tuple: (number of complete recordings, number of recordings)
+    """
+    entries = load_manifest(source)
+    os.makedirs(output_dir, exist_ok=True)
+    stt_slots = asyncio.Semaphore(stt_budget)
+    agent_slots = asyncio.Semaphore(agent_budget)
+    file_slots = asyncio.Semaphore(max_files)
+
+    async def run(entry):
+        async with file_slots:
+            try:
+                return await process_recording(entry, output_dir, chunk_duration_ms, total_chunks,
+                                               use_vad, vad_params, batching, stt_slots, agent_slots)
+            except Exception as e:
+                print(f"Audio processing failed for {entry['path']}: {str(e)}")
+                traceback.print_exc()
+                return False
+
+    outcomes = await asyncio.gather(*(run(entry) for entry in entries))
+    return sum(outcomes), len(entries)
+
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="audio_processor.py batch",
+                                     description="Resumable batch processing of many recordings")
+    parser.add_argument("source", help="Directory of recordings or JSONL manifest")
+    parser.add_argument("output_dir", help="Directory for checkpoints and results")
+    parser.add_argument("--chunk-ms", type=int, default=2000)
+    parser.add_argument("--total-chunks", type=int, default=100000)
+    parser.add_argument("--vad", action="store_true")
+    parser.add_argument("--batch", action="store_true", help="Batch agent calls across adjacent chunks")
+    parser.add_argument("--files", type=int, default=4, help="Recordings processed at the same time")
+    parser.add_argument("--stt-budget", type=int, default=16, help="Speech-to-Text requests in flight, in total")
+    parser.add_argument("--agent-budget", type=int, default=8, help="Agent requests in flight, in total")
+    parser.add_argument("--metrics", help="Write stage timings to this file (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args(argv)
+
+    complete, total = asyncio.run(run_batch(args.source, args.output_dir, args.chunk_ms, args.total_chunks,
+                                            use_vad=args.vad, batching={} if args.batch else None,
+                                            max_files=args.files, stt_budget=args.stt_budget,
+                                            agent_budget=args.agent_budget))
+    print(f"Batch finished: {complete}/{total} recordings complete")
+    if args.metrics:
+        metrics = get_metrics()
+        with open(args.metrics, "w") as f:
+            f.write(metrics.to_prometheus() if args.metrics.endswith(".prom") else metrics.to_json())
+    return 0 if complete == total else 1
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # python audio_processor.py batch <dir|manifest.jsonl> <output_dir> [options]
+        sys.exit(batch_main(sys.argv[2:]))
+
     try:
         # Parse command line arguments
-        if len(sys.argv) != 4:
-            raise ValueError("Usage: python audio_processor.py <audio_path> <chunk_ms> <total_chunks>")
+        flags = set(sys.argv[4:])
+        if len(sys.argv) < 4 or not flags <= {"--vad", "--batch"}:
+            raise ValueError("Usage: python audio_processor.py <audio_path> <chunk_ms> <total_chunks> "
+                             "[--vad] [--batch]")
 
         input_path = sys.argv[1]
         chunk_duration_ms = int(sys.argv[2])
         total_chunks = int(sys.argv[3])
 
         # Process the audio file
-        results = process_audio_parallel(input_path, chunk_duration_ms, total_chunks)
+        results = process_audio_parallel(input_path, chunk_duration_ms, total_chunks, use_vad="--vad" in flags,
+                                         batching={} if "--batch" in flags else None)
 
         # Save results to JSON file
         with open("processed_results.json", "w") as f:
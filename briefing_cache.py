@@ -0,0 +1,210 @@
+import concurrent.futures
+import os
+import threading
+import time
+from datetime import date
+
+from agent_client import ERROR_PREFIX
+from premeet_agent_test import stream_premeet_agent
+
+DEFAULT_BRIEFING_TTL_S = float(os.environ.get("BRIEFING_TTL_S", 30 * 60))
+# After a failed load, prefetch waits this long before trying again, doubling per failure
+DEFAULT_RETRY_S = float(os.environ.get("BRIEFING_RETRY_S", 30))
+MAX_RETRY_S = 15 * 60
+
+
+class _Load:
+    """A briefing being fetched; its text can be followed while it is generated."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._changed = threading.Condition()
+
+    def append(self, text: str):
+        with self._changed:
+            self.parts.append(text)
+            self._changed.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    def follow(self):
+        """Yields the text from the start, as it arrives; raises the load's error at the end."""
+        position = 0
+        while True:
+            with self._changed:
+                while position == len(self.parts) and not self.done:
+                    self._changed.wait()
+                parts, done = self.parts[position:], self.done
+            position += len(parts)
+            yield from parts
+            if done and position == len(self.parts):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    def result(self) -> str:
+        """Waits for the whole briefing; a failed load returns an error message."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.done)
+        return "".join(self.parts) if self.error is None else f"{ERROR_PREFIX}: {self.error}"
+
+
+class BriefingCache:
+    """
+    Pre-meeting briefings keyed by (client, date), kept for ttl_s.
+
+    Concurrent requests for the same briefing share one agent call, and prefetch() loads
+    briefings on background threads so they are ready before a client is selected. A
+    briefing still being loaded can be followed with stream() while it is generated.
+    Failed agent calls are not cached; prefetch() skips a failed briefing for retry_s,
+    doubling the wait after each further failure, so an agent outage does not cost one
+    call per client on every rerun. Briefings from earlier days are dropped when the next
+    load starts, so a long-running dashboard does not accumulate them.
+
+    Args:
+        fetch (callable): fetch(client_name) -> briefing text, or an iterable of text
+                          deltas that raises if the agent call fails.
+        ttl_s (float): How long a briefing stays fresh.
+        max_workers (int): Maximum briefings fetched at the same time.
+        retry_s (float): Wait after the first failure before prefetch() tries again.
+    """
+
+    def __init__(self, fetch, ttl_s: float = DEFAULT_BRIEFING_TTL_S, max_workers: int = 4,
+                 retry_s: float = DEFAULT_RETRY_S):
+        self._fetch = fetch
+        self.ttl_s = ttl_s
+        self.retry_s = retry_s
+        self._entries = {}
+        # key -> (time before which prefetch skips it, consecutive failures)
+        self._failures = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="briefing")
+
+    @staticmethod
+    def _key(client_name: str):
+        return client_name, date.today().isoformat()
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl_s:
+            return entry[1]
+        return None
+
+    def _record_failure(self, key):
+        # Caller holds the lock
+        _, failures = self._failures.get(key, (0.0, 0))
+        wait_s = min(MAX_RETRY_S, self.retry_s * 2 ** failures)
+        self._failures[key] = (time.monotonic() + wait_s, failures + 1)
+
+    def _store(self, key, briefing: str):
+        # Caller holds the lock
+        self._entries[key] = (time.monotonic(), briefing)
+        self._failures.pop(key, None)
+
+    def _load(self, key, client_name: str, load: _Load):
+        succeeded = False
+        error = None
+        try:
+            result = self._fetch(client_name)
+            for text in [result] if isinstance(result, str) else result:
+                load.append(text)
+            briefing = "".join(load.parts)
+            succeeded = not briefing.startswith(ERROR_PREFIX)
+            if succeeded:
+                with self._lock:
+                    self._store(key, briefing)
+        except Exception as e:
+            # A briefing cut off mid-stream is never cached
+            error = e
+        finally:
+            with self._lock:
+                if not succeeded:
+                    self._record_failure(key)
+                self._in_flight.pop(key, None)
+            load.finish(error)
+
+    def _submit(self, key, client_name: str) -> _Load:
+        # Caller holds the lock
+        load = self._in_flight.get(key)
+        if load is None:
+            self._drop_earlier_days(key[1])
+            load = self._in_flight[key] = _Load()
+            self._executor.submit(self._load, key, client_name, load)
+        return load
+
+    def _drop_earlier_days(self, today: str):
+        # Caller holds the lock; keys are (client, ISO date), so earlier days sort first
+        for entries in (self._entries, self._failures):
+            for key in [key for key in entries if key[1] < today]:
+                del entries[key]
+
+    def peek(self, client_name: str):
+        """Returns today's briefing for the client if it is cached and fresh, else None."""
+        with self._lock:
+            return self._fresh(self._key(client_name))
+
+    def is_loading(self, client_name: str) -> bool:
+        """True while an agent call for today's briefing of the client is in flight."""
+        with self._lock:
+            return self._key(client_name) in self._in_flight
+
+    def get(self, client_name: str) -> str:
+        """Returns today's briefing, waiting for (or starting) the agent call if needed."""
+        key = self._key(client_name)
+        with self._lock:
+            briefing = self._fresh(key)
+            if briefing is not None:
+                return briefing
+            load = self._submit(key, client_name)
+        return load.result()
+
+    def stream(self, client_name: str):
+        """
+        Yields today's briefing as it is generated, joining a load already in flight (e.g.
+        a prefetch) from its start, or starting one. A cached briefing is yielded whole.
+
+        Raises:
+            Exception: The agent call's error, after the text received before it.
+        """
+        key = self._key(client_name)
+        with self._lock:
+            briefing = self._fresh(key)
+            load = None if briefing is not None else self._submit(key, client_name)
+        if load is None:
+            yield briefing
+        else:
+            yield from load.follow()
+
+    def prefetch(self, client_names):
+        """
+        Starts background loads for every client without a fresh or in-flight briefing,
+        except those whose last load failed less than their retry wait ago.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for client_name in client_names:
+                key = self._key(client_name)
+                retry_at, _ = self._failures.get(key, (0.0, 0))
+                if self._fresh(key) is None and now >= retry_at:
+                    self._submit(key, client_name)
+
+
+_briefing_cache = None
+_briefing_cache_lock = threading.Lock()
+
+
+def get_briefing_cache() -> BriefingCache:
+    """Process-wide briefing cache backed by the pre-meeting agent."""
+    global _briefing_cache
+    with _briefing_cache_lock:
+        if _briefing_cache is None:
+            _briefing_cache = BriefingCache(lambda client_name: stream_premeet_agent(client_name, raise_errors=True))
+        return _briefing_cache
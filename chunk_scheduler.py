@@ -0,0 +1,242 @@
+import threading
+import time
+
+from audio_buffer import AudioChunk
+from inmeet_pipeline import DEFAULT_AGENT_CONCURRENCY, DEFAULT_STT_CONCURRENCY, process_chunks
+
+# A seek further than this past the audio being decoded restarts decoding at the playhead;
+# anything closer is reached sooner by decoding on
+RESTART_AHEAD_MS = 30_000
+# A chunk whose transcription or analysis failed is handed out again until it failed this often
+MAX_CHUNK_ATTEMPTS = 2
+
+
+class PlaybackScheduler:
+    """
+    Processes a recording in the background, starting at the playhead.
+
+    The recording is decoded as a stream from the playhead on, and each chunk is handed
+    to the in-meeting pipeline as soon as it is decoded, so the first segments are ready
+    within seconds and only the chunks in flight are held in memory. seek() moves the
+    playhead; when it lands on audio that has not been reached yet, decoding restarts
+    there. Once a stream reaches audio that was already handed out (or the end of the
+    recording), decoding resumes at the first part still missing, until the whole
+    recording is covered. Results are published as they complete, so playback can start
+    after the first few segments.
+
+    A chunk whose transcription or agent call failed is handed out again (up to
+    MAX_CHUNK_ATTEMPTS times), so a transient error does not leave a hole in the results;
+    chunks that keep failing are counted in failed, and the run is then not complete.
+
+    Args:
+        open_chunks (callable): open_chunks(start_ms) returns an iterator of AudioChunk
+                                covering the recording from start_ms on, in order.
+        duration_ms (int): Length of the recording.
+        meeting_id (str): Scopes the pooled in-meeting agent sessions.
+        stt_concurrency (int): Maximum Speech-to-Text requests in flight.
+        agent_concurrency (int): Maximum agent requests in flight.
+    """
+
+    def __init__(self, open_chunks, duration_ms: int, meeting_id: str = None,
+                 stt_concurrency: int = DEFAULT_STT_CONCURRENCY,
+                 agent_concurrency: int = DEFAULT_AGENT_CONCURRENCY):
+        self.open_chunks = open_chunks
+        self.duration_ms = duration_ms
+        self.meeting_id = meeting_id
+        self.stt_concurrency = stt_concurrency
+        self.agent_concurrency = agent_concurrency
+        # Sorted, disjoint [start_ms, end_ms) ranges already decoded and handed out
+        self._covered = []
+        self._dispatched = 0
+        self._settled = 0
+        self._results = {}
+        # start_ms -> failed attempts, and the chunks given up on
+        self._attempts = {}
+        self._failed = set()
+        # Playhead as (position_ms, time it was reported, playing)
+        self._anchor = (0, time.monotonic(), False)
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = None
+        self.done = False
+
+    @property
+    def total(self) -> int:
+        """Chunks handed to the pipeline so far."""
+        with self._lock:
+            return self._dispatched
+
+    @property
+    def completed(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+    @property
+    def failed(self) -> int:
+        """Chunks that still failed after MAX_CHUNK_ATTEMPTS attempts."""
+        with self._lock:
+            return len(self._failed)
+
+    @property
+    def covered_ms(self) -> int:
+        """Milliseconds of the recording decoded and handed out so far."""
+        with self._lock:
+            return sum(end - start for start, end in self._covered)
+
+    @property
+    def complete(self) -> bool:
+        """True once the whole recording was processed without a failed chunk."""
+        return (self.done and not self._cancelled and self.covered_ms >= self.duration_ms
+                and not self.failed)
+
+    def seek(self, position_ms: int, playing: bool = False):
+        """Moves the playhead; while playing, it is assumed to advance in real time."""
+        with self._lock:
+            self._anchor = (position_ms, time.monotonic(), playing)
+
+    def playhead_ms(self) -> float:
+        position_ms, reported_at, playing = self._anchor
+        if playing:
+            position_ms += (time.monotonic() - reported_at) * 1000
+        return position_ms
+
+    def cancel(self):
+        """Stops handing out chunks; requests already in flight still complete."""
+        with self._lock:
+            self._cancelled = True
+            self._changed.notify_all()
+
+    def _gap_from(self, position_ms):
+        # Start of the first audio not handed out at or after position_ms, else the first
+        # from the start of the recording; None once everything is covered
+        for origin in (max(0, min(int(position_ms), self.duration_ms)), 0):
+            position = origin
+            for start, end in self._covered:
+                if end <= position:
+                    continue
+                if start > position:
+                    return position
+                position = end
+            if position < self.duration_ms:
+                return position
+        return None
+
+    def _covered_after(self, position_ms) -> int:
+        # Where covered audio (or the recording's end) is next reached from position_ms
+        for start, end in self._covered:
+            if end > position_ms:
+                return max(start, position_ms)
+        return self.duration_ms
+
+    def _claim(self, start_ms, end_ms):
+        if end_ms <= start_ms:
+            return
+        ranges = self._covered + [(start_ms, end_ms)]
+        ranges.sort()
+        merged = [ranges[0]]
+        for start, end in ranges[1:]:
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        self._covered = merged
+
+    def _unclaim(self, start_ms, end_ms):
+        ranges = []
+        for start, end in self._covered:
+            ranges += [(a, b) for a, b in ((start, min(end, start_ms)), (max(start, end_ms), end)) if a < b]
+        self._covered = ranges
+
+    def _next_start(self):
+        # Where the next stream starts; waits for the chunks in flight before finishing,
+        # since a failed one is handed out again
+        with self._lock:
+            while not self._cancelled:
+                start = self._gap_from(self.playhead_ms())
+                if start is not None:
+                    return start
+                if self._settled >= self._dispatched:
+                    return None
+                self._changed.wait(timeout=1.0)
+            return None
+
+    def _ordered_chunks(self):
+        while True:
+            start = self._next_start()
+            if start is None:
+                return
+            stream = self.open_chunks(start)
+            cursor = start
+            try:
+                for chunk in stream:
+                    with self._lock:
+                        if self._cancelled:
+                            return
+                        limit = self._covered_after(cursor)
+                        if chunk.start_ms >= limit:
+                            # Reached audio handed out earlier; continue at the next gap
+                            self._claim(cursor, limit)
+                            break
+                        if chunk.end_ms > limit:
+                            chunk = _clip(chunk, limit)
+                        self._claim(cursor, chunk.end_ms)
+                        cursor = chunk.end_ms
+                        self._dispatched += 1
+                    yield chunk
+
+                    with self._lock:
+                        target = self._gap_from(self.playhead_ms())
+                    if target is not None and (target < cursor or target > cursor + RESTART_AHEAD_MS):
+                        # The playhead moved to audio this stream will not reach soon
+                        break
+                else:
+                    # The stream ended, so everything up to the next covered range was decoded
+                    with self._lock:
+                        self._claim(cursor, self._covered_after(cursor))
+            finally:
+                stream.close()
+
+    def _publish(self, result):
+        with self._lock:
+            self._results[result['start']] = result
+            self._settled += 1
+            self._changed.notify_all()
+
+    def _fail(self, start_ms, end_ms, error):
+        with self._lock:
+            self._settled += 1
+            self._attempts[start_ms] = self._attempts.get(start_ms, 0) + 1
+            if self._attempts[start_ms] < MAX_CHUNK_ATTEMPTS:
+                # The range becomes a gap again, so it is decoded and handed out once more
+                self._unclaim(start_ms, end_ms)
+            else:
+                self._failed.add(start_ms)
+            self._changed.notify_all()
+
+    def _run(self):
+        try:
+            # A one-slot queue keeps the order decided as late as possible
+            process_chunks(self._ordered_chunks(), meeting_id=self.meeting_id,
+                           stt_concurrency=self.stt_concurrency, agent_concurrency=self.agent_concurrency,
+                           queue_size=1, on_result=self._publish, on_failure=self._fail)
+        except Exception as e:
+            print(f"Progressive processing failed: {e}")
+        finally:
+            self.done = True
+
+    def start(self):
+        """Starts processing on a background thread."""
+        self._thread = threading.Thread(target=self._run, name="playback-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def results(self) -> list:
+        """Results published so far, sorted by start time."""
+        with self._lock:
+            return [self._results[start] for start in sorted(self._results)]
+
+
+def _clip(chunk: AudioChunk, end_ms: int) -> AudioChunk:
+    frames = int((end_ms - chunk.start_ms) * chunk.frame_rate // 1000)
+    return AudioChunk(chunk.samples[:frames], chunk.frame_rate, chunk.start_ms)
@@ -0,0 +1,204 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from audio_buffer import AudioChunk, PcmBuffer, decode_audio
+from metrics import span
+from vad import plan_chunks
+
+# Worker processes for payload encoding, and for decoding and VAD of whole recordings (batch
+# runs; streamed uploads are decoded by ffmpeg and planned as they arrive); 0 keeps that work in-process
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", os.cpu_count() or 1))
+# Recordings a worker keeps mapped at the same time
+_WORKER_ATTACHMENTS = 4
+# A decoded recording goes to /dev/shm only if it takes at most this share of its free space
+# (Docker gives containers 64 MB unless run with --shm-size, while an hour of 44.1 kHz
+# stereo is ~635 MB); larger ones are shared through a memory-mapped file in SHARED_AUDIO_DIR
+SHM_MAX_FRACTION = 0.5
+SHARED_AUDIO_DIR = os.environ.get("SHARED_AUDIO_DIR") or tempfile.gettempdir()
+
+
+class _SharedMemory(shared_memory.SharedMemory):
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            # NumPy views are still alive; the mapping is released together with them
+            pass
+
+
+class SharedPcmBuffer(PcmBuffer):
+    """
+    A PcmBuffer whose samples live in a shared memory block or a memory-mapped file.
+
+    Chunks carry a small reference (block name or file path, and frame range) instead of
+    audio, so pool workers read their samples straight from the shared pages without any
+    pickling. The block or file is removed when the buffer is garbage collected.
+
+    Args:
+        name (str): Name of the shared memory block, or absolute path of the raw PCM file.
+        shape (tuple): (frames, channels).
+        frame_rate (int): Sample rate of the audio in Hz.
+    """
+
+    def __init__(self, name: str, shape, frame_rate: int):
+        self._name = name
+        if _is_file(name):
+            super().__init__(np.memmap(name, dtype=np.int16, mode="r", shape=tuple(shape)), frame_rate)
+            weakref.finalize(self, _remove, name)
+        else:
+            shm = self._shm = _SharedMemory(name=name)
+            super().__init__(np.ndarray(shape, dtype=np.int16, buffer=shm.buf), frame_rate)
+            weakref.finalize(self, _unlink, shm)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def chunk(self, start_ms: int, end_ms: int) -> AudioChunk:
+        chunk = super().chunk(start_ms, end_ms)
+        start = self.frame_at(start_ms)
+        chunk.shared_ref = (self.name, self.samples.shape, self.frame_rate,
+                            start, start + chunk.samples.shape[0], start_ms)
+        return chunk
+
+
+def _is_file(name: str) -> bool:
+    # Shared memory block names are never absolute paths
+    return os.path.isabs(name)
+
+
+def _unlink(shm):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _fits_in_shm(nbytes: int) -> bool:
+    try:
+        free = shutil.disk_usage("/dev/shm").free
+    except OSError:
+        # No /dev/shm to measure (e.g. macOS); shared memory is not size-limited there
+        return True
+    return nbytes <= free * SHM_MAX_FRACTION
+
+
+_attached = OrderedDict()
+
+
+def _attach_samples(name: str, shape) -> np.ndarray:
+    # Worker side: map each block once and keep the most recently used ones mapped
+    entry = _attached.get(name)
+    if entry is None:
+        if _is_file(name):
+            samples = np.memmap(name, dtype=np.int16, mode="r", shape=tuple(shape))
+            entry = _attached[name] = (None, samples)
+        else:
+            shm = _SharedMemory(name=name)
+            entry = _attached[name] = (shm, np.ndarray(shape, dtype=np.int16, buffer=shm.buf))
+        while len(_attached) > _WORKER_ATTACHMENTS:
+            _attached.popitem(last=False)
+    else:
+        _attached.move_to_end(name)
+    return entry[1]
+
+
+def attach_chunk(ref) -> AudioChunk:
+    """Rebuilds a chunk in a worker from the shared_ref of a SharedPcmBuffer chunk."""
+    name, shape, frame_rate, start, end, start_ms = ref
+    return AudioChunk(_attach_samples(name, shape)[start:end], frame_rate, start_ms)
+
+
+def _decode_to_shared(source, format):
+    audio = decode_audio(source, format)
+    if not _fits_in_shm(audio.samples.nbytes):
+        fd, path = tempfile.mkstemp(prefix="pcm-", suffix=".raw", dir=SHARED_AUDIO_DIR)
+        with os.fdopen(fd, "wb") as f:
+            audio.samples.tofile(f)
+        return path, audio.samples.shape, audio.frame_rate
+    shm = shared_memory.SharedMemory(create=True, size=max(1, audio.samples.nbytes))
+    np.ndarray(audio.samples.shape, dtype=np.int16, buffer=shm.buf)[:] = audio.samples
+    # The block outlives this handle; the parent unlinks it when the buffer is dropped
+    shm.close()
+    return shm.name, audio.samples.shape, audio.frame_rate
+
+
+def _plan_chunks_shared(name, shape, frame_rate, params):
+    return plan_chunks(PcmBuffer(_attach_samples(name, shape), frame_rate), **params)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_cpu_pool():
+    """Process-wide worker pool for CPU-bound audio work, or None when CPU_WORKERS is 0."""
+    global _pool
+    if CPU_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned (not forked) workers, since the dashboard process runs many threads
+            _pool = ProcessPoolExecutor(max_workers=CPU_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def decode_audio_shared(source, format: str = None) -> PcmBuffer:
+    """
+    decode_audio in a worker process, into shared memory.
+
+    Recordings too large for /dev/shm (see SHM_MAX_FRACTION) are written to a temporary
+    file in SHARED_AUDIO_DIR instead and memory-mapped, so they never exhaust a
+    container's small shared memory mount.
+
+    Args:
+        source: A file path or raw file bytes.
+        format (str): Optional container format hint (e.g. "mp3").
+
+    Returns:
+        PcmBuffer: A SharedPcmBuffer, or a plain PcmBuffer when the pool is disabled.
+    """
+    pool = get_cpu_pool()
+    if pool is None:
+        return decode_audio(source, format)
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    with span("audio.decode", mode="pool"):
+        name, shape, frame_rate = pool.submit(_decode_to_shared, source, format).result()
+    return SharedPcmBuffer(name, shape, frame_rate)
+
+
+def plan_chunks_in_pool(audio: PcmBuffer, **params) -> list:
+    """plan_chunks run in a worker when the audio is in shared memory, in-process otherwise."""
+    pool = get_cpu_pool()
+    if pool is None or not isinstance(audio, SharedPcmBuffer):
+        return plan_chunks(audio, **params)
+    with span("vad.plan", mode="pool"):
+        return pool.submit(_plan_chunks_shared, audio.name, audio.samples.shape, audio.frame_rate,
+                           params).result()
+
+
+async def run_in_pool(fn, *args):
+    """Awaits fn(*args) in the worker pool (on a thread when the pool is disabled)."""
+    pool = get_cpu_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
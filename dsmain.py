@@ -1,14 +1,12 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import os
-import time
 import concurrent.futures
-import numpy as np
-import matplotlib.pyplot as plt
+import queue
 from io import BytesIO
 import sys
 import base64
-import tempfile
+import uuid
 from functools import partial
 import pandas as pd
 # Configure FFmpeg paths
@@ -18,32 +16,27 @@ import pandas as pd
 #os.environ["FFMPEG_PATH"] = f"{ffmpeg_path}/ffmpeg"
 #os.environ["FFPROBE_PATH"] = f"{ffmpeg_path}/ffprobe"
 
-# Import pydub after setting paths
-from pydub import AudioSegment
-
-#AudioSegment.converter = f"{ffmpeg_path}/ffmpeg"
-#AudioSegment.ffprobe = f"{ffmpeg_path}/ffprobe"
-
 # Import other project modules
 from gsutil import read_schedule_from_gcs, read_notification_history_from_gcs_new
-from premeet_agent_test import invoke_premeet_agent
-from inmeetagent_test import invoke_inmeet_agent
-from postmeetagent_test import invoke_postmeet_agent
-from genericagent_test import invoke_generic_agent
-from s2tconcur import process_chunk
+from postmeetagent_test import stream_postmeet_agent
+from genericagent_test import stream_generic_agent
+from agent_client import ERROR_PREFIX, warm_sessions
+from briefing_cache import get_briefing_cache
+from inmeet_pipeline import analyze_segments, process_chunks
+from stt_backend import stream_transcribe
+from audio_buffer import stream_fixed_chunks, stream_pcm
+from vad import stream_speech_chunks
+from result_cache import audio_digest, cache_key, get_result_cache
+from notification_feed import NotificationFeed
+from playback_component import meeting_playback
+from waveform import PeakPyramid
+from chunk_scheduler import PlaybackScheduler
+from metrics import get_metrics, span, timed
 
 # Initialize session state for notifications if not exists
 if 'notifications_data' not in st.session_state:
     st.session_state.notifications_data = None
-
-def extract_tone_sentiment(text):
-    import re
-    match = re.search(r"Tone:\s*(\w+)\s+Sentiment:\s*(\w+)", text)
-    if match:
-        return match.group(1), match.group(2)
-    else:
-        print(f"⚠️ Could not extract tone/sentiment from: {text}")
-        return None, None
+    st.session_state.notifications_feed = None
 
 def get_tone_emoji(tone):
     tone_map = {
@@ -73,80 +66,272 @@ def get_sentiment_emoji(sentiment):
     if not sentiment:
         return "😊"
     return sentiment_map.get(sentiment.lower(), "😊")
-# Helper: Extract waveform from audio
-def get_waveform(audio: AudioSegment):
-    samples = np.array(audio.get_array_of_samples())
-    if audio.channels == 2:
-        samples = samples.reshape((-1, 2)).mean(axis=1)
-    return samples
-
-# Helper: Plot waveform with red marker
-def plot_waveform(samples, sample_rate, current_time_sec):
-    times = np.linspace(0, len(samples)/sample_rate, num=len(samples))
-    fig, ax = plt.subplots(figsize=(6, 2))
-    ax.plot(times, samples, linewidth=0.5)
-    ax.axvline(x=current_time_sec, color='red', linestyle='--')
-    ax.set_xlim(0, times[-1])
-    ax.set_ylim(-max(abs(samples)), max(abs(samples)))
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Amplitude")
-    ax.set_title("Audio Waveform")
-    return fig
-
-def process_audio_chunk(chunk, start_time, progress_bar, feedback_container):
-    """Process a single audio chunk and update UI"""
-    try:
-        transcript = process_chunk(chunk)
-        feedback = invoke_inmeet_agent(transcript)
-        tone, sentiment = extract_tone_sentiment(feedback)
-
-        return {
-            "start": start_time,
-            "end": start_time + len(chunk),
-            "transcript": transcript,
-            "feedback": feedback,
-            "tone": tone,
-            "sentiment": sentiment
-        }
-    except Exception as e:
-        st.error(f"Error processing chunk: {e}")
-        return None
-
-
-def parallel_audio_processing(audio, chunk_duration_ms=2000, max_workers=20):
-    """Process audio in parallel chunks"""
-    total_chunks = len(audio) // chunk_duration_ms + 1
-    chunks = [(audio[i * chunk_duration_ms:(i + 1) * chunk_duration_ms], i * chunk_duration_ms)
-              for i in range(total_chunks)]
-
-    results = []
+def results_cache_key(digest, chunk_duration_ms=2000, use_vad=True, vad_params=None, batching=None):
+    """Cache key for the results of parallel_audio_processing on a given upload"""
+    return cache_key(digest, chunk_duration_ms=None if use_vad else chunk_duration_ms,
+                     use_vad=use_vad, vad_params=vad_params or {}, batching=batching)
+
+
+def cached_results(digest):
+    """Results of any earlier processing mode for this upload, or None"""
+    cache = get_result_cache()
+    for key in (results_cache_key(digest), results_cache_key(digest, batching={}),
+                cache_key(digest, mode="streaming")):
+        results = cache.get(key)
+        if results is not None:
+            return results
+    return None
+
+
+def stream_audio_chunks(source, format=None, start_ms=0, chunk_duration_ms=2000, use_vad=True,
+                        vad_params=None):
+    """Chunks from the voice-activity planner (or every chunk_duration_ms) as the upload is decoded
+
+    The upload is piped through ffmpeg, so chunks are yielded while decoding is still going
+    on and only the chunks in flight are held in memory. Decoding runs in the ffmpeg process
+    and payload encoding in the CPU worker pool; the streaming voice-activity planner keeps
+    state across frames, so it runs in this process, on the pipeline's producer thread.
+    """
+    frames = stream_pcm(source, format=format, start_ms=start_ms)
+    if use_vad:
+        return stream_speech_chunks(frames, **(vad_params or {}))
+    return stream_fixed_chunks(frames, chunk_duration_ms)
+
+
+def parallel_audio_processing(source, format=None, duration_ms=0, chunk_duration_ms=2000,
+                              stt_concurrency=16, agent_concurrency=8, use_vad=True, vad_params=None,
+                              digest=None, batching=None):
+    """Process the upload in parallel chunks, dispatched while it is still being decoded.
+
+    Chunks go through the asyncio in-meeting pipeline, which bounds Speech-to-Text and
+    agent requests separately (stt_concurrency / agent_concurrency) without holding threads.
+    Passing batching (MicroBatcher settings, {} for defaults) groups adjacent transcripts
+    into one agent request.
+
+    With use_vad the chunks come from the voice-activity planner, which skips silence and
+    cuts at pauses; otherwise the audio is cut every chunk_duration_ms. When the digest of
+    the upload is given, results are served from / stored in the on-disk result cache.
+    """
+    key = None
+    if digest:
+        key = results_cache_key(digest, chunk_duration_ms, use_vad, vad_params, batching)
+        cached = get_result_cache().get(key)
+        if cached is not None:
+            return cached
+
     progress_bar = st.progress(0)
     status_text = st.empty()
+    dispatched = [0]
+    completed = [0]
+    failed = []
+
+    def counted(chunks):
+        for chunk in chunks:
+            dispatched[0] += 1
+            yield chunk
+
+    def on_result(result):
+        completed[0] += 1
+        progress_bar.progress(min(result['end'] / max(duration_ms, 1), 1.0))
+        status_text.text(f"Processed {completed[0]} chunks ({result['end'] // 1000}/{duration_ms // 1000}s)")
+
+    def on_failure(start_ms, end_ms, error):
+        failed.append((start_ms, end_ms))
+
+    # Results come back sorted by start time
+    results = process_chunks(counted(stream_audio_chunks(source, format, 0, chunk_duration_ms,
+                                                         use_vad, vad_params)),
+                             meeting_id=digest, stt_concurrency=stt_concurrency,
+                             agent_concurrency=agent_concurrency, on_result=on_result,
+                             on_failure=on_failure, batching=batching)
+
+    if failed:
+        st.warning(f"{len(failed)} chunk(s) could not be analyzed; processing again will retry them.")
+    # Only complete runs are cached, so failed chunks get another chance next time
+    if key and not failed and len(results) == dispatched[0]:
+        get_result_cache().put(key, results)
+    return results
+
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        for chunk, start in chunks:
-            futures.append(executor.submit(
-                process_audio_chunk,
-                chunk,
-                start,
-                progress_bar,
-                feedback_container
-            ))
-
-        for i, future in enumerate(concurrent.futures.as_completed(futures)):
-            result = future.result()
-            if result:
-                results.append(result)
-            progress = (i + 1) / total_chunks
-            progress_bar.progress(progress)
-            status_text.text(f"Processed {i + 1}/{total_chunks} chunks")
-
-    # Sort by start time
-    results.sort(key=lambda x: x['start'])
+def start_progressive_processing(source, format=None, duration_ms=0, digest=None):
+    """Start processing in the background, from the playhead on.
+
+    Returns the running PlaybackScheduler; render_playback publishes its results while
+    the recording plays and caches them once the whole recording is done.
+    """
+    return PlaybackScheduler(partial(stream_audio_chunks, source, format), duration_ms,
+                             meeting_id=digest).start()
+
+
+@timed("ui.render", view="playback")
+def render_playback(uploaded_file, digest, pyramid):
+    """Playback component; reruns every second while chunks are still being processed"""
+    scheduler = st.session_state.get('scheduler')
+    if scheduler is not None:
+        st.session_state.precomputed_data = scheduler.results()
+        if scheduler.done:
+            # Only complete runs are cached, so failed chunks get another chance next time
+            if scheduler.complete:
+                get_result_cache().put(results_cache_key(digest), st.session_state.precomputed_data)
+            st.session_state.failed_chunks = scheduler.failed
+            st.session_state.scheduler = None
+            st.rerun()
+        covered_ms = scheduler.covered_ms
+        st.progress(min(covered_ms / max(scheduler.duration_ms, 1), 1.0),
+                    text=f"Processed {scheduler.completed} chunks ({covered_ms // 1000}/"
+                         f"{scheduler.duration_ms // 1000}s) - segments fill in ahead of the playback cursor")
+    elif st.session_state.get('failed_chunks'):
+        st.warning(f"{st.session_state.failed_chunks} chunk(s) could not be analyzed and are missing "
+                   f"from the feedback.")
+
+    segments = [dict(data, tone_emoji=get_tone_emoji(data['tone']),
+                     sentiment_emoji=get_sentiment_emoji(data['sentiment']))
+                for data in st.session_state.precomputed_data or []]
+    playback_event = meeting_playback(uploaded_file.getvalue(), uploaded_file.type or "audio/mpeg",
+                                      digest, pyramid, segments)
+    if not playback_event:
+        return
+
+    # Each play/pause/seek moves the point the remaining chunks are prioritized around
+    if scheduler is not None and playback_event.get('seq') != st.session_state.get('playback_seq'):
+        st.session_state.playback_seq = playback_event.get('seq')
+        scheduler.seek(playback_event['position_ms'], playing=playback_event.get('playing', False))
+    if playback_event.get('event') == "ended":
+        st.success("✅ Meeting playback complete!")
+
+
+def streaming_audio_processing(source, format=None, duration_ms=0, agent_concurrency=8, digest=None):
+    """Transcribe the whole recording over one streaming session.
+
+    The streaming API takes audio at most as fast as it is spoken, so this mode runs in
+    real time. Interim text is shown while the audio is streamed; each final result goes
+    to the agent stage of the in-meeting pipeline as soon as it arrives.
+    """
+    key = cache_key(digest, mode="streaming") if digest else None
+    if key:
+        cached = get_result_cache().get(key)
+        if cached is not None:
+            return cached
+
+    live_text = st.empty()
+    status_text = st.empty()
+    total_seconds = duration_ms // 1000
+    # Final transcripts, handed from this (script) thread to the pipeline's event loop
+    segments = queue.Queue()
+    failed = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        analysis = executor.submit(analyze_segments, iter(segments.get, None), meeting_id=digest,
+                                   agent_concurrency=agent_concurrency,
+                                   on_failure=lambda start_ms, end_ms, error: failed.append(start_ms))
+        try:
+            # Frames go to Speech-to-Text as ffmpeg decodes them
+            for event in stream_transcribe(stream_pcm(source, format=format, frame_ms=100)):
+                if event.is_final:
+                    if event.text:
+                        segments.put((event.start_ms, event.end_ms, event.text))
+                    live_text.markdown(f"**{event.start_ms // 1000}s:** {event.text}")
+                else:
+                    live_text.markdown(f"_{event.text}_")
+                status_text.text(f"Transcribed {event.end_ms // 1000}/{total_seconds}s")
+        except Exception as e:
+            st.error(f"Error during streaming transcription: {e}")
+            key = None
+        finally:
+            segments.put(None)
+
+        status_text.text("Waiting for agent feedback...")
+        results = analysis.result()
+    live_text.empty()
+    status_text.empty()
+
+    if failed:
+        st.warning(f"{len(failed)} segment(s) could not be analyzed; processing again will retry them.")
+    elif key:
+        get_result_cache().put(key, results)
     return results
 
 
+def load_notifications(bucket_name, refresh=False):
+    """Loads the notification history and prepares its feed once, not on every rerun"""
+    data = read_notification_history_from_gcs_new(bucket_name, refresh=refresh)
+    st.session_state.notifications_data = data
+    st.session_state.notifications_feed = NotificationFeed(data) if not data.empty else None
+
+
+@st.fragment
+@timed("ui.render", view="notifications")
+def render_notification_feed(feed: NotificationFeed, page_size=20):
+    """Filters and pages the notifications; only this fragment reruns when they change"""
+    filter_col1, filter_col2 = st.columns(2)
+    client = filter_col1.selectbox("Client", ["All clients"] + feed.client_names, key="nudge_client")
+    kind = filter_col2.selectbox("Type", ["All types"] + feed.notification_types, key="nudge_type")
+    positions = feed.select(None if client == "All clients" else client,
+                            None if kind == "All types" else kind)
+    if len(positions) == 0:
+        st.info("No notifications match the selected filters.")
+        return
+
+    page_count = (len(positions) + page_size - 1) // page_size
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1,
+                           step=1,
+                           # Keyed by the filters, so changing them starts again at page 1
+                           key=f"nudge_page_{client}_{kind}") if page_count > 1 else 1
+
+    # Display the notifications of the current page only
+    for row in feed.page(positions, page, page_size):
+        icon = "📧" if row['notification_type'] == 'email' else "📩"
+        with st.expander(f"{icon} {row['date']} - {row['client_name']}"):
+            st.markdown(f"**Type:** {row['notification_type']}")
+            st.markdown(f"**Message:** {row['message_content']}")
+    st.caption(f"Showing {min(len(positions), (page - 1) * page_size + 1)}-"
+               f"{min(len(positions), page * page_size)} of {len(positions)} notifications")
+
+
+def render_metrics_sidebar(recent=20):
+    """Debug panel: where the time went, per stage (decode, encode, STT, agent, render)"""
+    if not st.sidebar.toggle("⏱ Timing metrics", key="show_metrics"):
+        return
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    with st.sidebar:
+        if not snapshot["stages"]:
+            st.caption("Nothing timed yet.")
+        else:
+            to_ms = lambda seconds: None if seconds is None else round(seconds * 1000, 1)
+            st.dataframe(pd.DataFrame([{
+                "stage": stage["name"],
+                "labels": ", ".join(f"{key}={value}" for key, value in stage["labels"].items()),
+                "count": stage["count"],
+                "p50 ms": to_ms(stage["p50"]),
+                "p95 ms": to_ms(stage["p95"]),
+                "max ms": to_ms(stage["max"]),
+                "total s": round(stage["sum"], 2),
+            } for stage in snapshot["stages"]]), hide_index=True)
+        if snapshot["counters"]:
+            st.dataframe(pd.DataFrame([{
+                "event": counter["name"],
+                "labels": ", ".join(f"{key}={value}" for key, value in counter["labels"].items()),
+                "count": counter["value"],
+            } for counter in snapshot["counters"]]), hide_index=True)
+        with st.expander("Recent spans"):
+            for recorded in reversed(snapshot["recent_spans"][-recent:]):
+                parent = f" (in {recorded['parent']})" if recorded["parent"] else ""
+                error = f" ❌ {recorded['error']}" if recorded["error"] else ""
+                st.text(f"{recorded['name']}{parent}: {recorded['duration_s'] * 1000:.1f} ms{error}")
+
+        export_json, export_prometheus = st.columns(2)
+        export_json.download_button("JSON", metrics.to_json(), file_name="metrics.json",
+                                    mime="application/json")
+        export_prometheus.download_button("Prometheus", metrics.to_prometheus(), file_name="metrics.prom",
+                                          mime="text/plain")
+        # The registry is shared by every session of this server, so resetting it is
+        # left to operators who turn it on with METRICS_ALLOW_RESET=1
+        if os.environ.get("METRICS_ALLOW_RESET") == "1" and st.button("Reset metrics"):
+            metrics.reset()
+            st.rerun()
+
+
 # [Previous imports remain exactly the same...]
 
 # Page config and UI setup
@@ -230,22 +415,35 @@ with col1:
     st.markdown("---")
     # Today's Meetings section
     st.markdown("### Today's Meetings")
-    bucket_name = "digexpbuckselfdata"
+    # Bucket holding meetings.csv and the notification history (see storage_backend.py)
+    bucket_name = os.environ.get("DASHBOARD_BUCKET", "digexpbuckselfdata")
     schedule = read_schedule_from_gcs(bucket_name, "meetings.csv")
+    # Load today's briefings in the background; a no-op for those already cached or loading
+    get_briefing_cache().prefetch([item['client'] for item in schedule])
     for item in schedule:
         st.markdown(f"**{item['time']}** - {item['client']} (Age {item['age']})")
     st.markdown("---")
 
 with tab_holder:
     tab1, tab2, tab3 = st.tabs(["📋 Pre-Meeting Agent", "💬 In-Meeting & Post-Meeting Agents", "🤖✨AI Chat Assistant"])
-    with tab1:
+    with tab1, span("ui.render", view="premeet"):
         container2 = st.container()
         st.markdown("### Pre-Meeting AI Agent")
         client_list = ["---Select---"] + [x["client"] for x in schedule]
         selected_client = st.selectbox("Select a client:", client_list)
         if selected_client and selected_client != "---Select---":
-            st.info(f"Fetching insights for **{selected_client}**...")
-            st.success(invoke_premeet_agent(selected_client))
+            briefing_cache = get_briefing_cache()
+            briefing = briefing_cache.peek(selected_client)
+            if briefing is not None:
+                st.success(briefing)
+            else:
+                # Follow the prefetch (or a new load) as it is generated instead of waiting for it
+                try:
+                    with st.container(border=True):
+                        st.write_stream(briefing_cache.stream(selected_client))
+                except Exception as e:
+                    # A briefing cut off mid-stream is shown but never cached
+                    st.error(f"{ERROR_PREFIX}: {e}")
         st.markdown("---")
 
         st.markdown("#### 🧠 Recently Sent Nudges to Clients (Last 7 Days)")
@@ -253,16 +451,17 @@ with tab_holder:
         # Initialize if not exists
         if 'notifications_data' not in st.session_state:
             st.session_state.notifications_data = None
+            st.session_state.notifications_feed = None
 
         # Load notifications if not loaded
         if st.session_state.notifications_data is None:
             with st.spinner("Loading notifications..."):
-                st.session_state.notifications_data = read_notification_history_from_gcs_new(bucket_name)
+                load_notifications(bucket_name)
 
         # Refresh button
         if st.button("🔄 Refresh Notifications"):
             with st.spinner("Refreshing notifications..."):
-                st.session_state.notifications_data = read_notification_history_from_gcs_new(bucket_name)
+                load_notifications(bucket_name, refresh=True)
 
         # Display notifications with proper null checks
         if st.session_state.notifications_data is None:
@@ -271,119 +470,102 @@ with tab_holder:
             if st.session_state.notifications_data.empty:
                 st.info("No notification history found for the last 7 days.")
             else:
-                # Convert timestamp to readable date
-                st.session_state.notifications_data['notification_date'] = \
-                    st.session_state.notifications_data['notification_sent_date'].dt.strftime('%Y-%m-%d %H:%M')
-
-                # Display each notification
-                for _, row in st.session_state.notifications_data.iterrows():
-                    icon = "📧" if row.get('notification_type') == 'email' else "📩"
-                    with st.expander(f"{icon} {row['notification_date']} - {row['client_name']}"):
-                        st.markdown(f"**Type:** {row.get('notification_type', 'N/A')}")
-                        st.markdown(f"**Message:** {row['message_content']}")
+                render_notification_feed(st.session_state.notifications_feed)
         else:
             st.error("Invalid notifications data format")
 
-    with tab2:
+    with tab2, span("ui.render", view="inmeet"):
         container3 = st.container()
         st.markdown("### In-Meeting AI Agent")
         uploaded_file = st.file_uploader("Choose an audio file", type=["mp3", "wav"])
 
         waveform_plot = st.empty()
-        feedback_container = st.container()
         summary_container = st.container()
 
         if uploaded_file:
-            # Initialize session state
-            if 'audio_data' not in st.session_state:
-                st.session_state.audio_data = None
-                st.session_state.precomputed_data = None
-                st.session_state.playback_active = False
-                st.session_state.start_time = 0
-                st.session_state.current_chunk = 0
+            # Hash each upload once, not on every rerun
+            if st.session_state.get('upload_file_id') != uploaded_file.file_id:
+                st.session_state.upload_file_id = uploaded_file.file_id
+                st.session_state.upload_digest = audio_digest(uploaded_file.getvalue())
+            upload_digest = st.session_state.upload_digest
+
+            # Initialize session state (again whenever a different recording is uploaded)
+            if st.session_state.get('audio_digest') != upload_digest:
+                st.session_state.audio_digest = upload_digest
+                st.session_state.waveform_pyramid = None
+                st.session_state.precomputed_data = cached_results(upload_digest)
                 st.session_state.postmeetresponse = None
-
-            # Load audio using temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_path = tmp_file.name
-
-            try:
-                audio = AudioSegment.from_file(tmp_path)
-                st.session_state.audio_data = audio
-                st.session_state.audio_duration = len(audio) / 1000
-                st.audio(tmp_path, format="audio/mp3")
-
-                # Parallel processing button
-                if st.button("🔍 Process Audio (20 threads)") and not st.session_state.precomputed_data:
-                    with st.spinner("Processing audio with 20 parallel threads..."):
-                        st.session_state.precomputed_data = parallel_audio_processing(audio)
-                        st.success("Audio processing complete!")
-
-                # Playback controls
+                st.session_state.failed_chunks = 0
+                if st.session_state.get('scheduler') is not None:
+                    st.session_state.scheduler.cancel()
+                    st.session_state.scheduler = None
                 if st.session_state.precomputed_data:
-                    if not st.session_state.playback_active:
-                        if st.button("▶️ Start Playback"):
-                            st.session_state.playback_active = True
-                            st.session_state.start_time = time.time()
-                            st.session_state.current_chunk = 0
-                    else:
-                        if st.button("⏸️ Pause Playback"):
-                            st.session_state.playback_active = False
-
-                    # Real-time display during playback
-                    if st.session_state.playback_active:
-                        elapsed = time.time() - st.session_state.start_time
-                        current_chunk = min(int(elapsed // 2), len(st.session_state.precomputed_data) - 1)
-
-                        if current_chunk != st.session_state.current_chunk:
-                            st.session_state.current_chunk = current_chunk
-                            data = st.session_state.precomputed_data[current_chunk]
-
-                            # Update waveform
-                            samples = get_waveform(audio)
-                            fig = plot_waveform(samples, audio.frame_rate, elapsed)
-                            waveform_plot.pyplot(fig)
-
-                            # Update feedback
-                            with feedback_container:
-                                st.markdown(f"""
-                                **Segment {current_chunk + 1} ({data['start'] // 1000}-{data['end'] // 1000}s)**
-                                - **Transcript:** {data['transcript']}
-                                - **Tone:** `{data['tone']}` {get_tone_emoji(data['tone'])}
-                                - **Sentiment:** `{data['sentiment']}` {get_sentiment_emoji(data['sentiment'])}
-                                - **Feedback:** {data['feedback']}
-                                """)
-
-                            time.sleep(0.1)
-                            st.rerun()
-
-                        # Check if playback complete
-                        if elapsed >= st.session_state.audio_duration:
-                            st.session_state.playback_active = False
-                            st.success("✅ Meeting playback complete!")
-
-                    # Add separate button for post-meeting summary
-                    if st.button("📄 Generate Post-Meeting Summary"):
-                        with st.spinner("Generating meeting summary..."):
-                            full_transcript = "\n".join([d["transcript"] for d in st.session_state.precomputed_data])
-                            st.session_state.postmeetresponse = invoke_postmeet_agent(full_transcript)
-                            st.rerun()
-
-                # Display post-meeting summary if available
-                if 'postmeetresponse' in st.session_state:
+                    st.info("Loaded previously processed results for this recording.")
+                else:
+                    # Have in-meeting agent sessions ready by the time processing starts
+                    warm_sessions("inmeet", meeting_id=upload_digest, count=8)
+
+            # The upload is never held decoded: processing streams it through ffmpeg, and
+            # only the waveform peaks are kept, computed once per recording in one streamed pass
+            upload_format = os.path.splitext(uploaded_file.name)[1][1:] or None
+            if st.session_state.waveform_pyramid is None:
+                st.session_state.waveform_pyramid = PeakPyramid.from_frames(
+                    stream_pcm(uploaded_file.getvalue(), format=upload_format))
+            duration_ms = st.session_state.waveform_pyramid.duration_ms
+
+            # Parallel processing button
+            processing_mode = st.radio("Transcription mode", ["Chunked (parallel)", "Streaming (real time)"],
+                                       horizontal=True)
+            batch_agent_calls = processing_mode != "Streaming (real time)" and st.checkbox(
+                "Batch agent calls across adjacent chunks", value=False)
+            processing = st.session_state.get('scheduler') is not None
+            if st.button("🔍 Process Audio") and not st.session_state.precomputed_data and not processing:
+                if processing_mode == "Streaming (real time)":
+                    with st.spinner("Streaming audio to Speech-to-Text..."):
+                        st.session_state.precomputed_data = streaming_audio_processing(
+                            uploaded_file.getvalue(), upload_format, duration_ms, digest=upload_digest)
+                    st.success("Audio processing complete!")
+                elif batch_agent_calls:
+                    # Batches need adjacent chunks in order, so this mode processes everything up front
+                    with st.spinner("Processing audio chunks in parallel..."):
+                        st.session_state.precomputed_data = parallel_audio_processing(
+                            uploaded_file.getvalue(), upload_format, duration_ms,
+                            digest=upload_digest, batching={})
+                    st.success("Audio processing complete!")
+                else:
+                    # Playback can start right away; segments are published as they complete
+                    st.session_state.scheduler = start_progressive_processing(
+                        uploaded_file.getvalue(), upload_format, duration_ms, digest=upload_digest)
+                    processing = True
+
+            # Playback: cursor and feedback follow the audio element in the browser
+            with waveform_plot.container():
+                st.fragment(render_playback, run_every=1 if processing else None)(
+                    uploaded_file, upload_digest, st.session_state.waveform_pyramid)
+
+            if st.session_state.precomputed_data and not processing:
+                # Add separate button for post-meeting summary
+                if st.button("📄 Generate Post-Meeting Summary"):
+                    full_transcript = "\n".join([d["transcript"] for d in st.session_state.precomputed_data])
                     with summary_container:
                         st.markdown("### Post-Meeting Summary")
-                        st.write(st.session_state.postmeetresponse)
-
-            finally:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-    with tab3:
+                        st.session_state.postmeetresponse = st.write_stream(stream_postmeet_agent(
+                            full_transcript, meeting_id=st.session_state.audio_digest))
+                    st.rerun()
+
+            # Display post-meeting summary if available
+            if st.session_state.get('postmeetresponse'):
+                with summary_container:
+                    st.markdown("### Post-Meeting Summary")
+                    st.write(st.session_state.postmeetresponse)
+    with tab3, span("ui.render", view="chat"):
         # Chat Assistant Section
         st.markdown("### AI Chat Assistant")
         if 'chat_history' not in st.session_state:
             st.session_state.chat_history = []
+        # One agent session per browser session keeps the conversation context across turns
+        if 'chat_user_id' not in st.session_state:
+            st.session_state.chat_user_id = f"chat-{uuid.uuid4().hex}"
         # Display chat history
         chat_container = st.container(height=300)
         with chat_container:
@@ -411,7 +593,10 @@ with tab_holder:
             # Here you would call your actual AI agent
             # For demonstration, we'll use a placeholder response
             # ai_response = f"I received your message: '{user_input}'. This would be replaced with your actual AI agent response."
-            ai_response = invoke_generic_agent(user_input)
+            with chat_container:
+                st.markdown(f"**You:** {user_input}")
+                ai_response = st.write_stream(stream_generic_agent(user_input,
+                                                                   user_id=st.session_state.chat_user_id))
             # Add AI response to chat history
             st.session_state.chat_history.append({'role': 'ai', 'content': ai_response})
 
@@ -421,4 +606,7 @@ with tab_holder:
     st.markdown("""
         <hr style='border: 1px solid #ccc;'>
         <p style='text-align: center; color: #888;'>© 2025 Digital Experts | Powered by Code2Wealth</p>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+# Drawn last, so it includes this run's render times
+render_metrics_sidebar()
@@ -1,39 +1,17 @@
-import dotenv, os
-from vertexai import agent_engines
-
-# Load environment variables from a .env file
-dotenv.load_dotenv()
-
-
-def invoke_generic_agent(user_input: str) -> str:
-    agent_engine_id = "7305603855687876608"
-
-    try:
-        # Get the agent engine and create a new session
-        agent_engine = agent_engines.get(agent_engine_id)
-        session = agent_engine.create_session(user_id="new_user")
-
-        # Initialize a variable to hold the last event
-        last_event = None
-
-        # Stream the query and capture each event, keeping only the last one
-        for event in agent_engine.stream_query(
-                user_id="new_user",
-                session_id=session["id"],
-                message=user_input
-        ):
-            print("Received event:", event)  # Optional: for debugging
-            last_event = event
-
-        # The main response is in the 'text' part of the last event's 'content'
-        if last_event and 'content' in last_event and 'parts' in last_event['content']:
-            main_response = last_event['content']['parts'][0]['text']
-            return main_response
-        else:
-            return "Could not find the main response in the agent's output."
-
-    except Exception as e:
-        return f"An error occurred while invoking the agent: {e}"
+from agent_client import DEFAULT_USER_ID, invoke_agent, stream_agent
+
+
+def invoke_generic_agent(user_input: str, user_id: str = DEFAULT_USER_ID) -> str:
+    """Invokes the generic chat assistant agent with a user message and returns its answer.
+
+    All turns of one user go to the same pooled session, so the conversation keeps its context.
+    """
+    return invoke_agent("generic", user_input, user_id=user_id, meeting_id="chat")
+
+
+def stream_generic_agent(user_input: str, user_id: str = DEFAULT_USER_ID):
+    """Like invoke_generic_agent, but yields the answer text as it is generated."""
+    return stream_agent("generic", user_input, user_id=user_id, meeting_id="chat")
 
 
 if __name__ == "__main__":
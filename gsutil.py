@@ -1,90 +1,267 @@
+import collections
+import concurrent.futures
 import csv
 import io
+import threading
+import time
 import pandas as pd
 from datetime import datetime, timedelta
 from io import StringIO
-from google.cloud import storage
 import os
 
-def read_schedule_from_gcs(bucket_name, source_blob_name):
+from metrics import get_metrics, span
+from storage_backend import NotModified, get_storage_backend
+
+# "csv" reads notification_sent.csv; "parquet" reads the date-partitioned store
+NOTIFICATION_STORE = os.environ.get("NOTIFICATION_STORE", "csv").lower()
+
+# How long a parsed object is served from memory before the store is asked whether it changed
+GCS_CACHE_TTL_S = float(os.environ.get("GCS_CACHE_TTL_S", 60))
+
+# Entries unused for this long are dropped from the in-memory caches
+GCS_CACHE_EXPIRE_S = float(os.environ.get("GCS_CACHE_EXPIRE_S", 30 * 60))
+# Upper bounds of the raw object cache and of the parsed value cache
+GCS_CACHE_MAX_BYTES = int(os.environ.get("GCS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+GCS_PARSED_CACHE_ENTRIES = int(os.environ.get("GCS_PARSED_CACHE_ENTRIES", 32))
+
+
+class _LruCache:
+    """
+    Thread-safe LRU map bounded by entry count and total size, dropping entries unused for expire_s.
+
+    Args:
+        max_entries (int): Maximum number of entries.
+        max_bytes (int): Maximum summed size of the entries, as given to put().
+        expire_s (float): Idle time after which an entry is dropped.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, expire_s: float = GCS_CACHE_EXPIRE_S):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expire_s = expire_s
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """The value stored for key, or None if it is absent or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[2] >= self.expire_s:
+                self._drop(key)
+                return None
+            self._entries[key] = (entry[0], entry[1], now)
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size: int = 0):
+        """Stores value (unless it alone exceeds max_bytes), evicting the least recently used entries."""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while ((self.max_entries is not None and len(self._entries) > self.max_entries) or
+                   (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# (bucket, name) -> (generation, data); data is None for a missing object
+_object_cache = _LruCache(max_bytes=GCS_CACHE_MAX_BYTES)
+# (kind, bucket, name) -> (checked_at, generation, parsed value); raw bytes are not kept
+_parsed_cache = _LruCache(max_entries=GCS_PARSED_CACHE_ENTRIES)
+
+
+def _conditional_read(bucket_name: str, blob_name: str, generation):
+    # Raises NotModified when the object still has the given generation
+    with span("gcs.read"):
+        return get_storage_backend().read(bucket_name, blob_name, if_generation_not_match=generation)
+
+
+def read_object(bucket_name: str, blob_name: str):
+    """
+    Reads an object through the storage backend, reusing the local copy if it has not changed.
+
+    The read is conditional on the cached generation, so on GCS an unchanged object costs
+    one 304 response instead of a full transfer. Copies are kept in a size-bounded LRU
+    cache (GCS_CACHE_MAX_BYTES) and dropped after GCS_CACHE_EXPIRE_S without use.
+
+    Args:
+        bucket_name (str): The name of the bucket.
+        blob_name (str): The full path to the object in the bucket.
+
+    Returns:
+        tuple: (generation, bytes); (None, None) if the object does not exist.
+    """
+    key = (bucket_name, blob_name)
+    cached = _object_cache.get(key)
+
+    try:
+        generation, data = _conditional_read(bucket_name, blob_name, cached[0] if cached else None)
+    except NotModified:
+        get_metrics().increment("gcs.not_modified")
+        return cached
+
+    _object_cache.put(key, (generation, data), len(data) if data else 0)
+    return generation, data
+
+
+def _read_parsed(kind: str, bucket_name: str, blob_name: str, parse, refresh: bool = False):
+    # Serves parse(bytes) from memory for GCS_CACHE_TTL_S, then revalidates the object
+    # and parses again only if its generation changed. Only the parsed value is kept,
+    # so large objects are not held twice.
+    key = (kind, bucket_name, blob_name)
+    cached = _parsed_cache.get(key)
+    if cached and not refresh and time.monotonic() - cached[0] < GCS_CACHE_TTL_S:
+        return cached[2]
+
+    try:
+        generation, data = _conditional_read(bucket_name, blob_name, cached[1] if cached else None)
+    except NotModified:
+        get_metrics().increment("gcs.not_modified")
+        generation, value = cached[1], cached[2]
+    else:
+        with span("gcs.parse", kind=kind):
+            value = parse(data)
+    _parsed_cache.put(key, (time.monotonic(), generation, value))
+    return value
+
+
+def _parse_schedule(data):
+    if data is None:
+        return []
+
+    # Use StringIO to treat the string as a file-like object
+    csv_file = StringIO(data.decode('utf-8'))
+
+    # Use csv.DictReader to read the data into a list of dictionaries
+    reader = csv.DictReader(csv_file)
+    schedule = [row for row in reader]
+
+    # Convert 'age' from string to integer
+    for item in schedule:
+        if 'age' in item:
+            item['age'] = int(item['age'])
+
+    return schedule
+
+def read_schedule_from_gcs(bucket_name, source_blob_name, refresh=False):
     """Reads a CSV file from a Google Cloud Storage bucket and returns the data as a list of dictionaries.
 
+    The parsed schedule is cached in memory for GCS_CACHE_TTL_S and only downloaded again
+    when the object's generation changes.
+
     Args:
         bucket_name (str): The name of the GCS bucket.
         source_blob_name (str): The full path to the file in the bucket (e.g., 'data/schedule.csv').
+        refresh (bool): Revalidate against GCS even if the cached copy is still fresh.
 
     Returns:
         list: A list of dictionaries, where each dictionary represents a row in the CSV.
     """
     try:
-        # Initialize a client
-        storage_client = storage.Client()
+        schedule = _read_parsed("schedule", bucket_name, source_blob_name, _parse_schedule, refresh)
+        # Callers get their own rows, so the cached copy cannot be modified
+        return [dict(item) for item in schedule]
 
-        # Get the bucket and the blob (file)
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(source_blob_name)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
 
-        # Download the contents of the blob as a string
-        csv_string = blob.download_as_string().decode('utf-8')
 
-        # Use StringIO to treat the string as a file-like object
-        csv_file = StringIO(csv_string)
+def _parse_notifications(data):
+    if data is None:
+        return None
+    return pd.read_csv(io.BytesIO(data), parse_dates=['timestamp'])
 
-        # Use csv.DictReader to read the data into a list of dictionaries
-        reader = csv.DictReader(csv_file)
-        schedule = [row for row in reader]
 
-        # Convert 'age' from string to integer
-        for item in schedule:
-            if 'age' in item:
-                item['age'] = int(item['age'])
+# Columns of the notification sources; notification_type is optional in older data
+NOTIFICATION_SOURCE_COLUMNS = ['timestamp', 'client_name', 'message', 'notification_type']
+NOTIFICATION_HISTORY_COLUMNS = ['notification_sent_date', 'client_name', 'message_content', 'notification_type']
 
-        return schedule
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return []
+def _read_notifications_parquet(bucket_name: str, cutoff: datetime):
+    # None means "use the CSV", so a missing pyarrow or store never hides notifications
+    try:
+        from notification_store import read_notifications
+        return read_notifications(bucket_name, cutoff)
+    except ImportError as e:
+        print(f"Parquet notification store unavailable ({e}), reading the CSV instead")
+        return None
 
 
-def read_notification_history_from_gcs_new(bucket_name: str) -> pd.DataFrame:
-    """Always returns a DataFrame, never None"""
+def read_notification_history_from_gcs_new(bucket_name: str, refresh: bool = False) -> pd.DataFrame:
+    """Always returns a DataFrame, never None
+
+    The parsed CSV is cached like the schedule (see read_schedule_from_gcs); refresh=True
+    revalidates it against GCS immediately. With NOTIFICATION_STORE=parquet only the last
+    week's partitions of the Parquet store (see notification_store.py) are read instead.
+    """
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob("notification_sent.csv")
-
-        if not blob.exists():
-            return pd.DataFrame(columns=[
-                'notification_sent_date',
-                'client_name',
-                'message_content'
-            ])
-
-        temp_path = "/tmp/notification_sent.csv"
-        blob.download_to_filename(temp_path)
-        df = pd.read_csv(temp_path, parse_dates=['timestamp'])
-        os.remove(temp_path)
+        cutoff = datetime.now() - timedelta(days=7)
+        df = None
+        if NOTIFICATION_STORE == "parquet":
+            df = _read_notifications_parquet(bucket_name, cutoff)
+        if df is None:
+            df = _read_parsed("notifications", bucket_name, "notification_sent.csv",
+                              _parse_notifications, refresh)
+
+        if df is None:
+            return pd.DataFrame(columns=NOTIFICATION_HISTORY_COLUMNS)
 
         # Ensure we have required columns
         if not {'timestamp', 'client_name', 'message'}.issubset(df.columns):
             return pd.DataFrame()
 
-        # Filter last 7 days and rename columns
-        cutoff = datetime.now() - timedelta(days=7)
-        return df[df['timestamp'] >= cutoff].rename(columns={
+        # Filter last 7 days and rename columns; notification_type is kept when the source has it
+        df = df[df['timestamp'] >= cutoff].rename(columns={
             'timestamp': 'notification_sent_date',
             'message': 'message_content'
-        })[['notification_sent_date', 'client_name', 'message_content']]
+        })
+        return df[[c for c in NOTIFICATION_HISTORY_COLUMNS if c in df.columns]]
 
     except Exception as e:
         print(f"Error reading notifications: {e}")
         return pd.DataFrame()  # Always return DataFrame, never None
 
+NOTIFICATION_FILE_PREFIX = "notification_sent_"
+# Concurrent downloads when reading day-partitioned notification files
+NOTIFICATION_READ_WORKERS = int(os.environ.get("NOTIFICATION_READ_WORKERS", 16))
+
+
+def _read_notification_day(bucket_name: str, blob_name: str, file_date):
+    _, data = read_object(bucket_name, blob_name)
+    if data is None:
+        return None
+    df_day = pd.read_csv(io.BytesIO(data))
+    # Dates in the files carry no year; the file's own date supplies it
+    df_day['_file_year'] = file_date.year
+    return df_day
+
+
 def read_notification_history_from_gcs(bucket_name: str, days_to_read: int = 7) -> pd.DataFrame:
     """
     Reads notification history from GCS for the last specified number of days.
     It looks for files named 'notification_sent_ddmmyyyy.csv'.
 
+    The bucket is listed once to find the files that exist; they are then downloaded and
+    parsed concurrently on the shared client and concatenated in one step, so reading 30
+    or 90 days costs about as much wall time as reading a handful.
+
     Args:
         bucket_name (str): The name of the GCS bucket where notification files are stored.
         days_to_read (int): The number of past days (including today) to read data for.
@@ -93,53 +270,61 @@ def read_notification_history_from_gcs(bucket_name: str, days_to_read: int = 7)
         pd.DataFrame: A DataFrame containing combined notification history.
                       Returns an empty DataFrame if no files are found or an error occurs.
     """
-    all_notifications_df = pd.DataFrame()
     today = datetime.now().date()
-
-
+    wanted = {}
     for i in range(days_to_read):
         current_date = today - timedelta(days=i)
-        file_date_str = current_date.strftime("%d%m%Y")
-        file_name = f"notification_sent_{file_date_str}.csv"
-        blob_path = file_name  # Assuming files are directly in the bucket root
-        storage_client = storage.Client()
-
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(blob_path)
-
-        if blob.exists():
-            try:
-                # Download blob content to an in-memory BytesIO object
-                # This is efficient for pandas to read directly
-                blob_content = blob.download_as_bytes()
-                df_day = pd.read_csv(io.BytesIO(blob_content))
-                all_notifications_df = pd.concat([all_notifications_df, df_day], ignore_index=True)
-                print(f"✅ Loaded: `{file_name}`")
-            except Exception as e:
-                print(f"⚠️ Error reading `{file_name}`: {e}")
-        else:
-            print(f"ℹ️ File not found: `{file_name}`")
-
-    # Sort the DataFrame by date (assuming 'notification_sent_date' is in 'MMM DD' format,
-    # we'll need to convert it to a sortable format if not already sorted by file name)
-    # For robust sorting, it's best to use the original datetime objects or a sortable string.
-    # Since we're concatenating, the order might be mixed. Let's re-sort by parsing the date.
+        # Files are assumed to be directly in the bucket root
+        wanted[f"{NOTIFICATION_FILE_PREFIX}{current_date.strftime('%d%m%Y')}.csv"] = current_date
+
+    try:
+        with span("gcs.list"):
+            existing = {info.name for info in
+                        get_storage_backend().list(bucket_name, prefix=NOTIFICATION_FILE_PREFIX)}
+    except Exception as e:
+        print(f"⚠️ Error listing notification files: {e}")
+        return pd.DataFrame()
+
+    to_read = [name for name in wanted if name in existing]
+    for name in wanted:
+        if name not in existing:
+            print(f"ℹ️ File not found: `{name}`")
+
+    frames = []
+    if to_read:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(NOTIFICATION_READ_WORKERS, len(to_read))) as executor:
+            futures = {executor.submit(_read_notification_day, bucket_name, name, wanted[name]): name
+                       for name in to_read}
+            for future in concurrent.futures.as_completed(futures):
+                file_name = futures[future]
+                try:
+                    df_day = future.result()
+                except Exception as e:
+                    print(f"⚠️ Error reading `{file_name}`: {e}")
+                    continue
+                if df_day is not None:
+                    frames.append(df_day)
+                    print(f"✅ Loaded: `{file_name}`")
+
+    if not frames:
+        return pd.DataFrame()
+    all_notifications_df = pd.concat(frames, ignore_index=True)
+
+    # 'notification_sent_date' is like "Jul 22"; parse it for all rows at once to sort newest first
     try:
-        # Create a temporary sortable date column (e.g., 'YYYY-MM-DD')
-        # Assuming 'notification_sent_date' is like "Jul 22" and we need to infer the year.
-        # For simplicity, we'll assume the year is the current year.
-        # A more robust solution might pass the year or use a full date in the CSV.
-        all_notifications_df['sort_date'] = all_notifications_df['notification_sent_date'].apply(
-            lambda x: datetime.strptime(f"{x} {today.year}", "%b %d %Y").date()
-        )
-        all_notifications_df = all_notifications_df.sort_values(by='sort_date', ascending=False).drop(
-            columns=['sort_date'])
+        sort_date = pd.to_datetime(
+            all_notifications_df['notification_sent_date'].astype(str) + " " +
+            all_notifications_df['_file_year'].astype(str),
+            format="%b %d %Y", errors="coerce")
+        all_notifications_df = all_notifications_df.assign(_sort_date=sort_date).sort_values(
+            by='_sort_date', ascending=False, kind="stable").drop(columns=['_sort_date'])
     except KeyError:
         print("Column 'notification_sent_date' not found for sorting. Displaying as-is.")
     except Exception as e:
         print(f"Error sorting notifications: {e}. Displaying as-is.")
 
-    return all_notifications_df
+    return all_notifications_df.drop(columns=['_file_year'])
 
 
 if __name__ == "__main__":
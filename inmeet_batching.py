@@ -0,0 +1,97 @@
+import re
+
+DEFAULT_WINDOW_MS = 12000
+DEFAULT_TOKEN_BUDGET = 300
+
+_SEGMENT_MARKER = re.compile(r"^\s*\[(\d+)\]", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 tokens per 3 English words)."""
+    return (len(text.split()) * 4 + 2) // 3
+
+
+class MicroBatcher:
+    """
+    Groups consecutive chunk transcripts into batches for a single agent request.
+
+    Transcripts may arrive in any order; they are released in chunk order, and a batch is
+    closed once adding the next transcript would make it span more than window_ms or
+    exceed token_budget.
+
+    Args:
+        window_ms (int): Maximum time between the start of the first and end of the last chunk.
+        token_budget (int): Maximum estimated transcript tokens per batch.
+    """
+
+    def __init__(self, window_ms: int = DEFAULT_WINDOW_MS, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.window_ms = window_ms
+        self.token_budget = token_budget
+        self._pending = {}
+        self._next_index = 0
+        self._batch = []
+        self._batch_tokens = 0
+
+    def _fits(self, item) -> bool:
+        start_ms, end_ms, transcript = item
+        return (end_ms - self._batch[0][0] <= self.window_ms and
+                self._batch_tokens + estimate_tokens(transcript) <= self.token_budget)
+
+    def add(self, index: int, item) -> list:
+        """
+        Accepts the transcript of chunk index.
+
+        Args:
+            index (int): Position of the chunk in the recording (0-based, no gaps).
+            item: (start_ms, end_ms, transcript), or None for a chunk that failed.
+
+        Returns:
+            list: Batches (lists of items) completed by this transcript.
+        """
+        self._pending[index] = item
+        completed = []
+        while self._next_index in self._pending:
+            item = self._pending.pop(self._next_index)
+            self._next_index += 1
+            if item is None:
+                continue
+            if self._batch and not self._fits(item):
+                completed.append(self._batch)
+                self._batch, self._batch_tokens = [], 0
+            self._batch.append(item)
+            self._batch_tokens += estimate_tokens(item[2])
+        return completed
+
+    def flush(self) -> list:
+        """Returns the last, partially filled batch (if any)."""
+        completed = [self._batch] if self._batch else []
+        self._batch, self._batch_tokens = [], 0
+        return completed
+
+
+def build_batch_prompt(transcripts: list) -> str:
+    """Agent message asking for per-segment Tone/Sentiment/Feedback on numbered transcripts."""
+    numbered = "\n".join(f"[{i}] {text}" for i, text in enumerate(transcripts, start=1))
+    return ("The following numbered segments are consecutive parts of an ongoing client meeting. "
+            "Analyze each segment separately and answer with exactly one line per segment in the form:\n"
+            "[<number>] Tone: <tone> Sentiment: <sentiment> Feedback: <feedback>\n\n"
+            f"{numbered}")
+
+
+def split_batch_response(response: str, count: int) -> list:
+    """
+    Maps a batched agent response back onto its segments.
+
+    Returns:
+        list: count strings, one per segment. If the response does not follow the numbered
+              format, every segment receives the whole response.
+    """
+    markers = list(_SEGMENT_MARKER.finditer(response or ""))
+    parts = {}
+    for marker, following in zip(markers, markers[1:] + [None]):
+        end = following.start() if following else len(response)
+        parts[int(marker.group(1))] = response[marker.end():end].strip()
+
+    if not parts:
+        return [response] * count
+    return [parts.get(i, response) for i in range(1, count + 1)]
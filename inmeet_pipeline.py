@@ -0,0 +1,213 @@
+import asyncio
+import contextlib
+import os
+import re
+
+from agent_client import ERROR_PREFIX, ainvoke_agent
+from inmeet_batching import MicroBatcher, build_batch_prompt, split_batch_response
+from metrics import get_metrics
+from stt_backend import atranscribe
+
+DEFAULT_STT_CONCURRENCY = int(os.environ.get("PIPELINE_STT_CONCURRENCY", 16))
+DEFAULT_AGENT_CONCURRENCY = int(os.environ.get("PIPELINE_AGENT_CONCURRENCY", 8))
+DEFAULT_QUEUE_SIZE = 32
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+def extract_tone_sentiment(text):
+    """Extract tone and sentiment from agent response"""
+    match = re.search(r"Tone:\s*(\w+)\s+Sentiment:\s*(\w+)", text or "")
+    return match.groups() if match else (None, None)
+
+
+def build_result(start_ms, end_ms, transcript, feedback):
+    """Segment record in the shape the playback view and processed_results.json use"""
+    tone, sentiment = extract_tone_sentiment(feedback)
+    return {
+        "start": start_ms,
+        "end": end_ms,
+        "transcript": transcript,
+        "feedback": feedback,
+        "tone": tone,
+        "sentiment": sentiment
+    }
+
+
+def _slot(semaphore):
+    return semaphore if semaphore is not None else contextlib.nullcontext()
+
+
+async def _analyze(transcript_queue, results, meeting_id, agent_concurrency, queue_size, on_result,
+                   on_failure, batching, agent_slots):
+    # Agent stage: consumes (index, (start_ms, end_ms, transcript) or None) until _DONE
+    agent_queue = asyncio.Queue(maxsize=queue_size)
+
+    async def infer(message):
+        async with _slot(agent_slots):
+            return await ainvoke_agent("inmeet", message, meeting_id=meeting_id)
+
+    async def group():
+        batcher = MicroBatcher(**batching) if batching is not None else None
+        while (item := await transcript_queue.get()) is not _DONE:
+            index, segment = item
+            if batcher:
+                for batch in batcher.add(index, segment):
+                    await agent_queue.put(batch)
+            elif segment is not None:
+                await agent_queue.put([segment])
+        for batch in batcher.flush() if batcher else []:
+            await agent_queue.put(batch)
+        for _ in range(agent_concurrency):
+            await agent_queue.put(_DONE)
+
+    def publish(result):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    def publish_feedback(segments, feedbacks):
+        for (start_ms, end_ms, transcript), feedback in zip(segments, feedbacks):
+            if feedback.startswith(ERROR_PREFIX):
+                # A failed agent call is not feedback; the chunk is reported as failed
+                print(f"Agent error at {start_ms}ms: {feedback}")
+                get_metrics().increment("agent.failed_chunks")
+                if on_failure:
+                    on_failure(start_ms, end_ms, feedback)
+            else:
+                publish(build_result(start_ms, end_ms, transcript, feedback))
+
+    async def agent_worker():
+        while (batch := await agent_queue.get()) is not _DONE:
+            if batching is None:
+                publish_feedback(batch, [await infer(batch[0][2])])
+                continue
+
+            spoken = [segment for segment in batch if segment[2].strip()]
+            for start_ms, end_ms, transcript in batch:
+                if not transcript.strip():
+                    publish(build_result(start_ms, end_ms, transcript, ""))
+            if len(spoken) == 1:
+                feedbacks = [await infer(spoken[0][2])]
+            elif spoken:
+                response = await infer(build_batch_prompt([t for _, _, t in spoken]))
+                # An error answers the whole batch, not its first segment
+                feedbacks = ([response] * len(spoken) if response.startswith(ERROR_PREFIX)
+                             else split_batch_response(response, len(spoken)))
+            else:
+                feedbacks = []
+            publish_feedback(spoken, feedbacks)
+
+    await asyncio.gather(group(), *(agent_worker() for _ in range(agent_concurrency)))
+
+
+async def run_pipeline(chunks, meeting_id=None, stt_concurrency=DEFAULT_STT_CONCURRENCY,
+                       agent_concurrency=DEFAULT_AGENT_CONCURRENCY, queue_size=DEFAULT_QUEUE_SIZE,
+                       on_result=None, batching=None, stt_slots=None, agent_slots=None, on_failure=None):
+    """
+    Transcribes chunks and runs the in-meeting agent on them in two bounded async stages.
+
+    Chunks flow producer -> STT workers -> agent workers through bounded queues, so each
+    stage has its own concurrency limit and a slow stage applies backpressure instead of
+    piling up work. All I/O is awaited on the event loop; no worker threads are held.
+
+    With batching, consecutive transcripts are grouped by a MicroBatcher and analyzed in
+    one agent request; empty transcripts get no agent call at all.
+
+    Args:
+        chunks: Iterable of AudioChunk; may be a generator that blocks (e.g. streamed decoding).
+        meeting_id (str): Scopes the pooled in-meeting agent sessions.
+        stt_concurrency (int): Maximum Speech-to-Text requests in flight.
+        agent_concurrency (int): Maximum agent requests in flight.
+        queue_size (int): Capacity of each inter-stage queue.
+        on_result (callable): Called with each result dict as soon as it is ready.
+        batching (dict): Optional MicroBatcher settings (window_ms, token_budget) enabling
+                         micro-batching of agent calls.
+        stt_slots (asyncio.Semaphore): Optional budget shared with other pipelines on the same
+                                       loop; each Speech-to-Text request holds one slot.
+        agent_slots (asyncio.Semaphore): Same for agent requests.
+        on_failure (callable): Called as on_failure(start_ms, end_ms, error) for each chunk
+                               whose transcription or agent call failed.
+
+    Returns:
+        list: Result dicts sorted by start time. Chunks whose transcription or agent call
+              failed are left out, so callers can tell a complete run by its length.
+    """
+    stt_queue = asyncio.Queue(maxsize=queue_size)
+    transcript_queue = asyncio.Queue(maxsize=queue_size)
+    results = []
+
+    async def produce():
+        # Chunks may come from a decoder pipe, so each is pulled on a thread, not on the loop
+        iterator = iter(chunks)
+        index = 0
+        while (chunk := await asyncio.to_thread(next, iterator, None)) is not None:
+            await stt_queue.put((index, chunk))
+            index += 1
+        for _ in range(stt_concurrency):
+            await stt_queue.put(_DONE)
+
+    async def stt_worker():
+        while (item := await stt_queue.get()) is not _DONE:
+            index, chunk = item
+            try:
+                async with _slot(stt_slots):
+                    transcript = await atranscribe(chunk)
+            except Exception as e:
+                print(f"Chunk processing error at {chunk.start_ms}ms: {e}")
+                if on_failure:
+                    on_failure(chunk.start_ms, chunk.end_ms, e)
+                # Still reported, so the batcher does not wait for this chunk forever
+                await transcript_queue.put((index, None))
+                continue
+            await transcript_queue.put((index, (chunk.start_ms, chunk.end_ms, transcript)))
+
+    async def transcribe_all():
+        await asyncio.gather(produce(), *(stt_worker() for _ in range(stt_concurrency)))
+        await transcript_queue.put(_DONE)
+
+    await asyncio.gather(transcribe_all(), _analyze(transcript_queue, results, meeting_id, agent_concurrency,
+                                                    queue_size, on_result, on_failure, batching, agent_slots))
+    return sorted(results, key=lambda x: x['start'])
+
+
+async def run_analysis(segments, meeting_id=None, agent_concurrency=DEFAULT_AGENT_CONCURRENCY,
+                       queue_size=DEFAULT_QUEUE_SIZE, on_result=None, batching=None, agent_slots=None,
+                       on_failure=None):
+    """
+    Runs only the agent stage of run_pipeline, on transcripts produced elsewhere
+    (e.g. by a streaming recognition session).
+
+    Args:
+        segments: Iterable of (start_ms, end_ms, transcript) in recording order; may be a
+                  generator that blocks until the next transcript is final.
+        Other arguments as for run_pipeline.
+
+    Returns:
+        list: Result dicts sorted by start time, without the segments whose agent call failed.
+    """
+    transcript_queue = asyncio.Queue(maxsize=queue_size)
+    results = []
+
+    async def produce():
+        iterator = iter(segments)
+        index = 0
+        while (segment := await asyncio.to_thread(next, iterator, None)) is not None:
+            await transcript_queue.put((index, segment))
+            index += 1
+        await transcript_queue.put(_DONE)
+
+    await asyncio.gather(produce(), _analyze(transcript_queue, results, meeting_id, agent_concurrency,
+                                             queue_size, on_result, on_failure, batching, agent_slots))
+    return sorted(results, key=lambda x: x['start'])
+
+
+def process_chunks(chunks, meeting_id=None, **options):
+    """Runs run_pipeline to completion from synchronous code (Streamlit, CLI)."""
+    return asyncio.run(run_pipeline(chunks, meeting_id=meeting_id, **options))
+
+
+def analyze_segments(segments, meeting_id=None, **options):
+    """Runs run_analysis to completion from synchronous code."""
+    return asyncio.run(run_analysis(segments, meeting_id=meeting_id, **options))
@@ -4,62 +4,90 @@ import os
 os.environ["PATH"] += os.pathsep + "/usr/local/Cellar/ffmpeg/7.1.1_3/bin"
 os.environ["FFMPEG_BINARY"] = "/usr/local/Cellar/ffmpeg/7.1.1_3/bin/ffmpeg"
 os.environ["FFPROBE_BINARY"] = "/usr/local/Cellar/ffmpeg/7.1.1_3/bin/ffprobe"
-from pydub import AudioSegment
-from io import BytesIO
-import time
-from inmeetagent_test import invoke_inmeet_agent
-from  s2tconcur import speech_to_text_api
+import threading
+import uuid
+from live_meeting import DEFAULT_LATENCY_BUDGET_MS, LiveMeeting, microphone_frames, replay_file, webrtc_frames
 
-# Replace these with your actual implementations
-def dummy_stt(audio_chunk: AudioSegment) -> str:
-    stt = speech_to_text_api(audio_chunk)
-    print(stt)
-    return stt
 
-def dummy_llm(text: str) -> str:
-    agentresp = invoke_inmeet_agent(text)
-    return agentresp
+def render_live(session: LiveMeeting, shown=8):
+    """Live counters and the latest feedback; reruns every second while the session runs"""
+    if session.done and st.session_state.get('live_running'):
+        st.session_state.live_running = False
+        st.rerun()
 
-st.title("🎧 Audio Chunk Analyzer")
+    p50, p95 = session.latency_percentile(50), session.latency_percentile(95)
+    heard, analyzed, dropped, late, failed, median, tail = st.columns(7)
+    heard.metric("Heard", f"{session.heard_ms // 1000}s")
+    analyzed.metric("Segments", len(session.results()))
+    dropped.metric("Dropped", session.dropped)
+    late.metric("Too late", session.late)
+    failed.metric("Failed", session.failed)
+    median.metric("p50 latency", f"{p50 / 1000:.1f}s" if p50 is not None else "-")
+    tail.metric("p95 latency", f"{p95 / 1000:.1f}s" if p95 is not None else "-")
 
-uploaded_file = st.file_uploader("Upload an audio file", type=["mp3", "wav"])
+    # Newest first, as in a live feed
+    for data in reversed(session.results()[-shown:]):
+        feedback = data['feedback'] or ('_agent call failed_' if data['failed']
+                                        else '_skipped, over the latency budget_')
+        st.markdown(f"""
+                  **{data['start'] // 1000}-{data['end'] // 1000}s** ({data['latency_ms'] / 1000:.1f}s after speech)
+                  - **Transcript:** {data['transcript']}
+                  - **Feedback:** {feedback}
+                  """)
 
-if uploaded_file:
-    st.audio(uploaded_file, format="audio/mp3")
+    if session.error:
+        st.error(f"Live session failed: {session.error}")
+    elif session.done:
+        st.success("✅ Live session ended.")
 
-    if st.button("▶️ Start Processing"):
-        st.info("Processing audio in 2-second chunks...")
 
-        # Load audio
-        audio = AudioSegment.from_file(BytesIO(uploaded_file.getvalue()))
+st.title("🎧 Live Meeting Analyzer")
 
-        chunk_duration_ms = 2000  # 2 seconds
-        total_chunks = len(audio) // chunk_duration_ms
+source = st.radio("Audio source", ["Replay a recording", "Microphone", "Browser microphone (WebRTC)"],
+                  horizontal=True)
+latency_budget_ms = int(st.slider("Latency budget (seconds from end of speech to feedback)",
+                                  1.0, 10.0, DEFAULT_LATENCY_BUDGET_MS / 1000, 0.5) * 1000)
 
-        progress_bar = st.progress(0)
-        transcripts = []
-        feedbacks = []
-        chunk_placeholder = st.empty()
+session = st.session_state.get('live_meeting')
+running = session is not None and not session.done
+frames = None
+# Lets stop() end a frame source that waits for audio (WebRTC)
+stop_event = threading.Event()
 
-        for i in range(total_chunks):
-            start = i * chunk_duration_ms
-            end = start + chunk_duration_ms
-            chunk = audio[start:end]
+if source == "Replay a recording":
+    # Local stand-in for a live call: the file is fed in at real-time speed
+    uploaded_file = st.file_uploader("Upload an audio file", type=["mp3", "wav"])
+    if uploaded_file:
+        st.audio(uploaded_file, format="audio/mp3")
+        if st.button("▶️ Start live replay", disabled=running):
+            frames = replay_file(uploaded_file.getvalue(),
+                                 format=os.path.splitext(uploaded_file.name)[1][1:] or None)
+elif source == "Microphone":
+    st.caption("Captures the default input device of the machine running this app (needs sounddevice).")
+    if st.button("🎙️ Start listening", disabled=running):
+        frames = microphone_frames()
+else:
+    try:
+        from streamlit_webrtc import WebRtcMode, webrtc_streamer
+    except ImportError:
+        st.warning("Browser capture needs the streamlit-webrtc package (pip install streamlit-webrtc).")
+    else:
+        ctx = webrtc_streamer(key="live-audio", mode=WebRtcMode.SENDONLY, audio_receiver_size=256,
+                              media_stream_constraints={"audio": True, "video": False})
+        # One live session per browser connection
+        if ctx.audio_receiver is not None and st.session_state.get('live_receiver') is not ctx.audio_receiver:
+            st.session_state.live_receiver = ctx.audio_receiver
+            frames = webrtc_frames(ctx.audio_receiver, stop_event=stop_event)
 
-            # Simulate processing time
-            time.sleep(3)
+if frames is not None:
+    if running:
+        session.stop()
+    session = st.session_state.live_meeting = LiveMeeting(
+        frames, meeting_id=f"live-{uuid.uuid4().hex[:8]}", latency_budget_ms=latency_budget_ms,
+        stop_event=stop_event).start()
+    st.session_state.live_running = running = True
 
-            # Call your actual STT and LLM functions here
-            transcript = dummy_stt(chunk)
-            feedback = dummy_llm(transcript)
-
-            transcripts.append(transcript)
-            feedbacks.append(feedback)
-            chunk_placeholder.markdown(f"""
-                      ### 🧾 Processing Chunk {i + 1}/{total_chunks}
-                      - **Transcript:** {transcript}
-                      - **Feedback:** {feedback}
-                      """)
-            progress_bar.progress((i + 1) / total_chunks)
-
-        st.success("✅ Done processing all chunks.")
+if session is not None:
+    if running and st.button("⏹ Stop"):
+        session.stop()
+    st.fragment(render_live, run_every=1 if running else None)(session)
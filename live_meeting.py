@@ -0,0 +1,344 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from agent_client import ERROR_PREFIX, ainvoke_agent
+from audio_buffer import STREAM_CHANNELS, STREAM_FRAME_RATE, AudioChunk, stream_pcm
+from inmeet_pipeline import build_result
+from metrics import get_metrics
+from stt_backend import atranscribe
+from vad import stream_speech_chunks
+
+# Feedback is due this long after the speech it is about has ended
+DEFAULT_LATENCY_BUDGET_MS = int(os.environ.get("LIVE_LATENCY_BUDGET_MS", 3000))
+LIVE_FRAME_MS = 100
+# Shorter chunks than for recordings, so a chunk's own length does not eat the budget
+LIVE_VAD_PARAMS = {"min_chunk_ms": 600, "max_chunk_ms": 2000}
+# Weight of the latest observation in the running STT / agent latency estimates
+_ESTIMATE_WEIGHT = 0.2
+
+
+def replay_file(source, format: str = None, frame_ms: int = LIVE_FRAME_MS, speed: float = 1.0):
+    """
+    Replays a recording as if it were captured live, as a local stand-in for a microphone.
+
+    Frames are decoded with stream_pcm and released at real-time speed (or speed times
+    faster), each stamped with the time it was "captured".
+
+    Args:
+        source: A file path or raw file bytes.
+        format (str): Optional container format hint (e.g. "mp3").
+        frame_ms (int): Duration of each frame.
+        speed (float): Playback speed; 1.0 is real time.
+
+    Yields:
+        AudioChunk: Frames with a captured_at attribute (time.monotonic()).
+    """
+    started = None
+    for frame in stream_pcm(source, format=format, frame_ms=frame_ms):
+        if started is None:
+            started = time.monotonic()
+        # A frame is available once all of it has been "spoken"
+        delay = started + frame.end_ms / 1000 / speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        frame.captured_at = time.monotonic()
+        yield frame
+
+
+def _sounddevice():
+    try:
+        import sounddevice
+    except ImportError as e:
+        raise ImportError("Microphone capture needs the sounddevice package (pip install sounddevice)") from e
+    return sounddevice
+
+
+def microphone_frames(frame_ms: int = LIVE_FRAME_MS, device=None, frame_rate: int = STREAM_FRAME_RATE):
+    """
+    Captures 16-bit mono frames from a local input device (requires sounddevice).
+
+    Args:
+        frame_ms (int): Duration of each frame.
+        device: sounddevice device index or name; None for the default input.
+        frame_rate (int): Capture sample rate.
+
+    Yields:
+        AudioChunk: Frames with a captured_at attribute, until the generator is closed.
+    """
+    sounddevice = _sounddevice()
+    captured = queue.Queue()
+
+    def on_audio(data, frames, time_info, status):
+        captured.put((bytes(data), time.monotonic()))
+
+    frame_len = frame_rate * frame_ms // 1000
+    position = 0
+    with sounddevice.RawInputStream(samplerate=frame_rate, blocksize=frame_len, device=device,
+                                    channels=STREAM_CHANNELS, dtype="int16", callback=on_audio):
+        while True:
+            data, captured_at = captured.get()
+            samples = np.frombuffer(data, dtype="<i2").reshape(-1, STREAM_CHANNELS)
+            frame = AudioChunk(samples, frame_rate, position * 1000 // frame_rate)
+            frame.captured_at = captured_at
+            position += len(samples)
+            yield frame
+
+
+def webrtc_frames(audio_receiver, frame_rate: int = STREAM_FRAME_RATE, stop_event: threading.Event = None):
+    """
+    Converts the audio of a streamlit-webrtc connection into 16-bit mono frames.
+
+    Args:
+        audio_receiver: The audio_receiver of a webrtc_streamer context (SENDONLY mode).
+        frame_rate (int): Sample rate to resample to.
+        stop_event (threading.Event): Optional; ends the generator once set, even while no
+                                      audio arrives (pass the same event to LiveMeeting).
+
+    Yields:
+        AudioChunk: Frames with a captured_at attribute, until the connection ends or stop_event is set.
+    """
+    import av
+
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=frame_rate)
+    position = 0
+    while stop_event is None or not stop_event.is_set():
+        try:
+            received = audio_receiver.get_frames(timeout=1)
+        except queue.Empty:
+            continue
+        except Exception:
+            # The browser disconnected
+            return
+        captured_at = time.monotonic()
+        for packet in received:
+            for resampled in resampler.resample(packet):
+                samples = resampled.to_ndarray().reshape(-1, STREAM_CHANNELS).astype(np.int16, copy=False)
+                frame = AudioChunk(samples, frame_rate, position * 1000 // frame_rate)
+                frame.captured_at = captured_at
+                position += len(samples)
+                yield frame
+
+
+class LiveMeeting:
+    """
+    Gives in-meeting feedback on live audio within a latency budget.
+
+    Frames from a live source are cut into speech chunks as they arrive. Transcription
+    and agent calls run concurrently in separate worker pools, so the next chunk is
+    transcribed while the previous one is analyzed. Every chunk has a deadline: the end
+    of its speech plus latency_budget_ms. When the pipeline falls behind, work that can
+    no longer make its deadline is dropped instead of queued: chunks waiting for
+    transcription are skipped (the newest speech matters most), and a transcript that
+    arrives too late for the agent is published without feedback. In-flight requests are
+    cancelled once their deadline passes. A chunk whose agent call failed is counted in
+    failed and its transcript is published without feedback, like a late one.
+
+    Args:
+        frames: Iterable of AudioChunk with captured_at (replay_file, microphone_frames,
+                webrtc_frames).
+        meeting_id (str): Scopes the pooled in-meeting agent sessions.
+        latency_budget_ms (int): Time from the end of speech to its feedback.
+        stt_concurrency (int): Maximum Speech-to-Text requests in flight.
+        agent_concurrency (int): Maximum agent requests in flight.
+        vad_params (dict): Planner settings for the speech chunker.
+        stop_event (threading.Event): Event set by stop(); share it with a frame source that
+                                      can block without audio (webrtc_frames).
+    """
+
+    def __init__(self, frames, meeting_id: str = None, latency_budget_ms: int = DEFAULT_LATENCY_BUDGET_MS,
+                 stt_concurrency: int = 4, agent_concurrency: int = 4, vad_params: dict = None,
+                 stop_event: threading.Event = None):
+        self.frames = frames
+        self.meeting_id = meeting_id
+        self.budget_s = latency_budget_ms / 1000
+        self.stt_concurrency = stt_concurrency
+        self.agent_concurrency = agent_concurrency
+        self.vad_params = dict(LIVE_VAD_PARAMS, **(vad_params or {}))
+        # Wall-clock time of audio position 0, from the latest frame
+        self._origin = None
+        # Running estimates of request latency, in seconds
+        self._estimates = {"stt": 0.0, "agent": 0.0}
+        self._results = []
+        self._latencies = []
+        self.dropped = 0
+        self.late = 0
+        self.failed = 0
+        self.heard_ms = 0
+        self._stopping = stop_event or threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.error = None
+        self.done = False
+
+    def _stamped(self):
+        # Tracks the capture clock, so deadlines follow the audio even if the source drifts
+        for frame in self.frames:
+            if self._stopping.is_set():
+                return
+            self._origin = frame.captured_at - frame.end_ms / 1000
+            self.heard_ms = frame.end_ms
+            yield frame
+
+    def deadline(self, chunk) -> float:
+        """When feedback on chunk is due, as time.monotonic()."""
+        return self._origin + chunk.end_ms / 1000 + self.budget_s
+
+    def _estimate(self, stage: str, started: float):
+        # Also called on timeouts, with the time waited as a lower bound of the latency
+        elapsed = time.monotonic() - started
+        current = self._estimates[stage]
+        self._estimates[stage] = elapsed if not current else current + _ESTIMATE_WEIGHT * (elapsed - current)
+
+    def _relax(self, *stages):
+        # Work skipped on an estimate measures nothing, so the estimate decays a little;
+        # otherwise one slow spell would keep every later chunk from being tried
+        for stage in stages:
+            self._estimates[stage] *= 1 - _ESTIMATE_WEIGHT
+
+    def _publish(self, result, chunk, failed: bool = False):
+        latency_s = time.monotonic() - self._origin - chunk.end_ms / 1000
+        get_metrics().observe("live.feedback_latency", latency_s)
+        latency_ms = int(latency_s * 1000)
+        with self._lock:
+            self._results.append(dict(result, latency_ms=latency_ms, failed=failed))
+            self._latencies.append(latency_ms)
+
+    async def _run(self):
+        # A chunk waiting for transcription is replaced rather than queued behind
+        pending = []
+        arrived = asyncio.Condition()
+        analyses = asyncio.Queue(maxsize=self.agent_concurrency)
+        finished = False
+
+        async def ingest():
+            nonlocal finished
+            chunks = iter(stream_speech_chunks(self._stamped(), **self.vad_params))
+            # The generators are only ever run, and closed, on this one thread
+            reader = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-ingest")
+            loop = asyncio.get_running_loop()
+
+            def close():
+                chunks.close()
+                # Releases the microphone / connection when stopped early
+                if hasattr(self.frames, "close"):
+                    self.frames.close()
+
+            try:
+                while (chunk := await loop.run_in_executor(reader, next, chunks, None)) is not None:
+                    async with arrived:
+                        pending.append(chunk)
+                        arrived.notify()
+            finally:
+                # When cancelled mid-read, the read in progress ends at the next frame; the
+                # close is queued behind it instead of racing it
+                self._stopping.set()
+                reader.submit(close)
+                reader.shutdown(wait=False)
+                async with arrived:
+                    finished = True
+                    arrived.notify_all()
+
+        async def take():
+            # Oldest chunk that can still make its deadline; the ones before it are dropped
+            async with arrived:
+                while True:
+                    while pending:
+                        chunk = pending.pop(0)
+                        needed = self._estimates["stt"] + self._estimates["agent"]
+                        if time.monotonic() + needed <= self.deadline(chunk):
+                            return chunk
+                        self.dropped += 1
+                        self._relax("stt", "agent")
+                        get_metrics().increment("live.dropped", stage="queued")
+                    if finished:
+                        return None
+                    await arrived.wait()
+
+        async def stt_worker():
+            while (chunk := await take()) is not None:
+                started = time.monotonic()
+                try:
+                    transcript = await asyncio.wait_for(atranscribe(chunk),
+                                                        max(0.0, self.deadline(chunk) - started))
+                except asyncio.TimeoutError:
+                    self._estimate("stt", started)
+                    self.dropped += 1
+                    get_metrics().increment("live.dropped", stage="stt")
+                    continue
+                except Exception as e:
+                    print(f"Live transcription error at {chunk.start_ms}ms: {e}")
+                    continue
+                self._estimate("stt", started)
+                if transcript.strip():
+                    await analyses.put((chunk, transcript))
+
+        async def agent_worker():
+            while (item := await analyses.get()) is not None:
+                chunk, transcript = item
+                started = time.monotonic()
+                remaining = self.deadline(chunk) - started
+                feedback = ""
+                failed = False
+                if remaining > self._estimates["agent"]:
+                    try:
+                        feedback = await asyncio.wait_for(
+                            ainvoke_agent("inmeet", transcript, meeting_id=self.meeting_id), remaining)
+                    except asyncio.TimeoutError:
+                        feedback = ""
+                    if feedback.startswith(ERROR_PREFIX):
+                        # A failed agent call is not feedback; a fast error says nothing about latency
+                        print(f"Live agent error at {chunk.start_ms}ms: {feedback}")
+                        self.failed += 1
+                        get_metrics().increment("agent.failed_chunks")
+                        feedback, failed = "", True
+                    else:
+                        self._estimate("agent", started)
+                else:
+                    self._relax("agent")
+                if not feedback and not failed:
+                    # Too late for feedback to be useful; the transcript is still recorded
+                    self.late += 1
+                    get_metrics().increment("live.dropped", stage="agent")
+                self._publish(build_result(chunk.start_ms, chunk.end_ms, transcript, feedback), chunk, failed)
+
+        async def transcribe_all():
+            await asyncio.gather(ingest(), *(stt_worker() for _ in range(self.stt_concurrency)))
+            for _ in range(self.agent_concurrency):
+                await analyses.put(None)
+
+        await asyncio.gather(transcribe_all(), *(agent_worker() for _ in range(self.agent_concurrency)))
+
+    def _main(self):
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            self.error = e
+            print(f"Live meeting failed: {e}")
+        finally:
+            self.done = True
+
+    def start(self):
+        """Starts listening on a background thread."""
+        self._thread = threading.Thread(target=self._main, name="live-meeting", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops taking audio; chunks already being processed are still published."""
+        self._stopping.set()
+
+    def results(self) -> list:
+        """Results published so far, sorted by start time, each with its latency_ms and failed flag."""
+        with self._lock:
+            return sorted(self._results, key=lambda result: result['start'])
+
+    def latency_percentile(self, percentile: float):
+        """Percentile of end-of-speech to feedback latency in ms, or None before any result."""
+        with self._lock:
+            return int(np.percentile(self._latencies, percentile)) if self._latencies else None
@@ -0,0 +1,256 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# METRICS=0 turns all timing off
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+# Histogram bucket upper bounds in seconds, from a cached read to a long agent answer
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Latest observations per histogram kept for exact percentiles
+RECENT_OBSERVATIONS = 1024
+# Finished spans kept for the debug panel
+RECENT_SPANS = int(os.environ.get("METRICS_RECENT_SPANS", 200))
+PROMETHEUS_PREFIX = "uidigiexpert"
+
+# The span currently open in this thread / task, so nested spans know their parent
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Histogram:
+    """
+    Distribution of durations (seconds) for one stage and label set.
+
+    Observations are counted in cumulative Prometheus-style buckets; the latest ones are
+    also kept, so percentiles of recent activity are exact.
+
+    Args:
+        buckets (tuple): Upper bounds of the buckets, ascending.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_OBSERVATIONS)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, percentile: float):
+        """Percentile of the recent observations, or None before the first one."""
+        return float(np.percentile(self.recent, percentile)) if self.recent else None
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"],
+                                np.cumsum(self.bucket_counts).tolist())),
+        }
+
+
+class Span:
+    """
+    One timed operation.
+
+    Args:
+        name (str): Stage name, e.g. "stt.rpc".
+        labels (dict): Extra dimensions, e.g. {"agent": "inmeet"}.
+        parent (Span): The span this one was opened in, if any.
+    """
+
+    def __init__(self, name: str, labels: dict, parent=None):
+        self.name = name
+        self.labels = labels
+        self.parent = parent
+        self.started_at = time.time()
+        self.duration_s = None
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "labels": self.labels,
+            "parent": self.parent.name if self.parent else None,
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "error": self.error,
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide store of stage timings and event counters.
+
+    Spans time a block of code and feed a histogram per (stage, labels); counters count
+    events such as errors. Everything can be read as a snapshot, JSON or Prometheus text.
+    Safe to use from threads and asyncio tasks; work done in worker processes is timed
+    by the span around the call in this process.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._histograms = {}
+        self._counters = {}
+        self._spans = deque(maxlen=RECENT_SPANS)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Records a duration measured elsewhere."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: int = 1, **labels):
+        """Adds to an event counter."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels):
+        """
+        Times the enclosed block as one span of the named stage.
+
+        Exceptions are recorded on the span (and counted as "<name>.errors") and re-raised.
+        Not for generators that yield inside the block: they may resume in another context.
+        """
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, labels, _current_span.get())
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = type(e).__name__
+            self.increment(f"{name}.errors", **labels)
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - started
+            _current_span.reset(token)
+            self.observe(name, span.duration_s, **labels)
+            with self._lock:
+                self._spans.append(span)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of span, for plain and async functions."""
+        def decorate(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name, **labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> dict:
+        """
+        Current state of all metrics.
+
+        Returns:
+            dict: {"stages": [...], "counters": [...], "recent_spans": [...]}, with one entry
+                  per stage and label set, sorted by name.
+        """
+        with self._lock:
+            stages = [dict(name=name, labels=dict(labels), **histogram.snapshot())
+                      for (name, labels), histogram in sorted(self._histograms.items())]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            spans = [span.to_dict() for span in self._spans]
+        return {"stages": stages, "counters": counters, "recent_spans": spans}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        def label_text(labels: dict, **extra) -> str:
+            pairs = dict(labels, **extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in pairs.values())
+            return "{" + ",".join(f'{key}="{value}"' for key, value in zip(pairs, escaped)) + "}"
+
+        snapshot = self.snapshot()
+        histogram_name = f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+        counter_name = f"{PROMETHEUS_PREFIX}_events_total"
+        lines = [f"# HELP {histogram_name} Time spent per processing stage.",
+                 f"# TYPE {histogram_name} histogram"]
+        for stage in snapshot["stages"]:
+            labels = dict(stage=stage["name"], **stage["labels"])
+            for bound, count in stage["buckets"].items():
+                lines.append(f"{histogram_name}_bucket{label_text(labels, le=bound)} {count}")
+            lines.append(f"{histogram_name}_sum{label_text(labels)} {stage['sum']:.6f}")
+            lines.append(f"{histogram_name}_count{label_text(labels)} {stage['count']}")
+        lines += [f"# HELP {counter_name} Events such as failed stages.",
+                  f"# TYPE {counter_name} counter"]
+        for counter in snapshot["counters"]:
+            lines.append(f"{counter_name}{label_text(dict(event=counter['name'], **counter['labels']))} "
+                         f"{counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._spans.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+def span(name: str, **labels):
+    """Shorthand for get_metrics().span(name, **labels)."""
+    return get_metrics().span(name, **labels)
+
+
+def timed(name: str, **labels):
+    """Shorthand for get_metrics().timed(name, **labels)."""
+    return get_metrics().timed(name, **labels)
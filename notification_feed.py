@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 20
+
+
+class NotificationFeed:
+    """
+    Notification history prepared once for paged display.
+
+    Display strings are formatted when the feed is built, and the row positions of every
+    client and notification type are indexed, so filtering and paging touch only the
+    rows that are shown instead of the whole history.
+
+    Args:
+        df (pd.DataFrame): Notifications as returned by read_notification_history_from_gcs_new
+                           (notification_sent_date, client_name, message_content and,
+                           optionally, notification_type).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.reset_index(drop=True)
+        self.dates = df['notification_sent_date'].dt.strftime('%Y-%m-%d %H:%M').to_numpy()
+        self.clients = df['client_name'].astype(str).to_numpy()
+        self.messages = df['message_content'].astype(str).to_numpy()
+        if 'notification_type' in df.columns:
+            self.types = df['notification_type'].fillna('N/A').astype(str).to_numpy()
+        else:
+            self.types = np.full(len(df), 'N/A', dtype=object)
+
+        self._by_client = self._index(self.clients)
+        self._by_type = self._index(self.types)
+
+    @staticmethod
+    def _index(values: np.ndarray) -> dict:
+        # value -> sorted row positions, built with one stable sort instead of a scan per value
+        order = np.argsort(values, kind="stable")
+        uniques, starts = np.unique(values[order], return_index=True)
+        return {value: positions for value, positions in zip(uniques, np.split(order, starts[1:]))}
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def client_names(self) -> list:
+        return sorted(self._by_client)
+
+    @property
+    def notification_types(self) -> list:
+        return sorted(self._by_type)
+
+    def select(self, client_name: str = None, notification_type: str = None) -> np.ndarray:
+        """Row positions matching the filters (None matches everything), in feed order."""
+        positions = np.arange(len(self))
+        if client_name is not None:
+            positions = self._by_client.get(client_name, positions[:0])
+        if notification_type is not None:
+            positions = np.intersect1d(positions, self._by_type.get(notification_type, positions[:0]),
+                                       assume_unique=True)
+        return positions
+
+    def page(self, positions: np.ndarray, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> list:
+        """
+        Returns the rows of one page of a selection.
+
+        Args:
+            positions (np.ndarray): Row positions from select().
+            page (int): 1-based page number.
+            page_size (int): Rows per page.
+
+        Returns:
+            list: Dicts with date, client_name, message_content and notification_type.
+        """
+        shown = positions[(page - 1) * page_size:page * page_size]
+        return [{'date': self.dates[i], 'client_name': self.clients[i],
+                 'message_content': self.messages[i], 'notification_type': self.types[i]}
+                for i in shown]
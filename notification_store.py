@@ -0,0 +1,227 @@
+import concurrent.futures
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from gsutil import read_object
+from storage_backend import get_storage_backend
+
+# Notifications are stored as one Parquet file per day under this prefix:
+#   notifications/date=YYYY-MM-DD/part-0.parquet
+PARQUET_PREFIX = os.environ.get("NOTIFICATION_PARQUET_PREFIX", "notifications")
+NOTIFICATION_COLUMNS = ['timestamp', 'client_name', 'message']
+# Rows per Parquet row group; rows are sorted by timestamp, so row-group statistics prune well
+ROW_GROUP_SIZE = 64 * 1024
+PARTITION_WORKERS = 16
+# Bytes fetched from the end of a partition for its footer; a larger footer costs one more read
+FOOTER_FETCH_BYTES = 64 * 1024
+
+
+def _pyarrow():
+    # pyarrow ships with streamlit, but the CSV path must keep working without it
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+def partition_blob_name(day, prefix: str = PARQUET_PREFIX) -> str:
+    """Object holding the notifications of one day."""
+    return f"{prefix}/date={day.isoformat()}/part-0.parquet"
+
+
+class _RangedFile(io.RawIOBase):
+    """
+    Read-only, seekable view of a stored object that downloads only the byte ranges read.
+
+    Fetched ranges are kept, so the footer and the row groups prefetched with fetch()
+    are each downloaded once however the Parquet reader splits its reads.
+
+    Args:
+        bucket_name (str): Bucket of the object.
+        name (str): Object name.
+        size (int): Size of the object in bytes.
+    """
+
+    def __init__(self, bucket_name: str, name: str, size: int):
+        super().__init__()
+        self.bucket_name = bucket_name
+        self.name = name
+        self.size = size
+        self._blocks = []
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def fetch(self, start: int, end: int):
+        """Downloads bytes [start, end) with one ranged read."""
+        data = get_storage_backend().read_range(self.bucket_name, self.name, start, end)
+        if data is None:
+            raise FileNotFoundError(self.name)
+        self._blocks.append((start, data))
+
+    def readinto(self, buffer):
+        start, end = self._position, min(self.size, self._position + len(buffer))
+        if start >= end:
+            return 0
+        for block_start, data in self._blocks:
+            if block_start <= start and end <= block_start + len(data):
+                break
+        else:
+            self.fetch(start, end)
+            block_start, data = self._blocks[-1]
+        buffer[:end - start] = data[start - block_start:end - block_start]
+        self._position = end
+        return end - start
+
+
+def _overlapping_row_groups(metadata, start, end) -> list:
+    # Row groups whose timestamp statistics overlap [start, end]; all of them without statistics
+    names = [metadata.schema.column(i).path for i in range(metadata.num_columns)]
+    if 'timestamp' not in names:
+        return list(range(metadata.num_row_groups))
+    column = names.index('timestamp')
+    groups = []
+    for index in range(metadata.num_row_groups):
+        statistics = metadata.row_group(index).column(column).statistics
+        if (statistics is None or not statistics.has_min_max or
+                (pd.Timestamp(statistics.max) >= start and pd.Timestamp(statistics.min) <= end)):
+            groups.append(index)
+    return groups
+
+
+def _read_partition(bucket_name: str, info, columns: list, start, end):
+    _, pq = _pyarrow()
+    source = _RangedFile(bucket_name, info.name, info.size)
+    source.fetch(max(0, info.size - FOOTER_FETCH_BYTES), info.size)
+    # The footer is parsed once; only the row groups overlapping the range are downloaded
+    parquet_file = pq.ParquetFile(source)
+    metadata = parquet_file.metadata
+    groups = _overlapping_row_groups(metadata, start, end)
+    if not groups:
+        return None
+    available = set(parquet_file.schema_arrow.names)
+    names = [metadata.schema.column(i).path for i in range(metadata.num_columns)]
+    wanted = [names.index(c) for c in columns if c in available]
+    # The chunks of consecutive row groups are adjacent, so one ranged read covers them all
+    offsets = [(chunk.dictionary_page_offset or chunk.data_page_offset,
+                (chunk.dictionary_page_offset or chunk.data_page_offset) + chunk.total_compressed_size)
+               for group in groups for chunk in (metadata.row_group(group).column(c) for c in wanted)]
+    if offsets:
+        source.fetch(min(first for first, _ in offsets), max(last for _, last in offsets))
+    return parquet_file.read_row_groups(groups, columns=[c for c in columns if c in available])
+
+
+def read_notifications(bucket_name: str, start: datetime, end: datetime = None,
+                       columns: list = None, prefix: str = PARQUET_PREFIX) -> pd.DataFrame:
+    """
+    Reads the notifications sent in [start, end] from the date-partitioned Parquet store.
+
+    The partitions of the days in the range are found with one listing and read
+    concurrently with ranged reads: the footer, then only the requested columns of the
+    row groups whose timestamp statistics overlap the range. The cost follows the size of
+    the window rather than of the history.
+
+    Args:
+        bucket_name (str): The name of the GCS bucket.
+        start (datetime): Earliest timestamp to return.
+        end (datetime): Latest timestamp to return (default: now).
+        columns (list): Columns to load (default: NOTIFICATION_COLUMNS).
+        prefix (str): Prefix the partitions are stored under.
+
+    Returns:
+        pd.DataFrame: Matching notifications, newest first. Missing days are skipped.
+    """
+    end = pd.Timestamp(end or datetime.now())
+    start = pd.Timestamp(start)
+    columns = columns or NOTIFICATION_COLUMNS
+    # The timestamp is always read, to filter the rows of the boundary row groups
+    read_columns = list(dict.fromkeys(['timestamp'] + columns))
+
+    days = [start.date() + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)]
+    blob_names = {partition_blob_name(day, prefix) for day in days}
+    listing_prefix = os.path.commonprefix([partition_blob_name(days[0], prefix),
+                                           partition_blob_name(days[-1], prefix)])
+    partitions = [info for info in get_storage_backend().list(bucket_name, listing_prefix)
+                  if info.name in blob_names and info.size]
+
+    tables = []
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(PARTITION_WORKERS, len(partitions)))) as executor:
+        for table in executor.map(lambda info: _read_partition(bucket_name, info, read_columns, start, end),
+                                  partitions):
+            if table is not None and table.num_rows:
+                tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat([table.to_pandas() for table in tables], ignore_index=True)
+    if 'timestamp' in df.columns:
+        df = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+        df = df.sort_values(by='timestamp', ascending=False, kind="stable").reset_index(drop=True)
+    return df[[c for c in columns if c in df.columns]]
+
+
+def convert_csv_to_parquet(bucket_name: str, source_blob_name: str = "notification_sent.csv",
+                           prefix: str = PARQUET_PREFIX) -> int:
+    """
+    Converts the single notification CSV into the date-partitioned Parquet store.
+
+    Each day's rows are sorted by timestamp and written as one zstd-compressed file;
+    existing partitions for those days are overwritten, so the conversion can be re-run.
+
+    Args:
+        bucket_name (str): The name of the GCS bucket.
+        source_blob_name (str): The CSV object to convert.
+        prefix (str): Prefix to write the partitions under.
+
+    Returns:
+        int: Number of partitions written.
+    """
+    pa, pq = _pyarrow()
+    _, data = read_object(bucket_name, source_blob_name)
+    if data is None:
+        print(f"ℹ️ File not found: `{source_blob_name}`")
+        return 0
+
+    df = pd.read_csv(io.BytesIO(data), parse_dates=['timestamp'])
+    df = df.dropna(subset=['timestamp']).sort_values(by='timestamp', kind="stable")
+    backend = get_storage_backend()
+
+    def write_partition(day, df_day):
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df_day, preserve_index=False), buffer,
+                       row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        backend.write(bucket_name, partition_blob_name(day, prefix), buffer.getvalue(),
+                      content_type="application/vnd.apache.parquet")
+        print(f"✅ Wrote: `{partition_blob_name(day, prefix)}` ({len(df_day)} rows)")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=PARTITION_WORKERS) as executor:
+        futures = [executor.submit(write_partition, day, df_day)
+                   for day, df_day in df.groupby(df['timestamp'].dt.date)]
+        for future in futures:
+            future.result()
+    return len(futures)
+
+
+if __name__ == "__main__":
+    # Usage: python notification_store.py <bucket_name> [csv_blob_name]
+    if len(sys.argv) < 2:
+        print("Usage: python notification_store.py <bucket_name> [csv_blob_name]")
+        sys.exit(1)
+    count = convert_csv_to_parquet(*sys.argv[1:3])
+    print(f"Converted into {count} daily partitions under `{PARQUET_PREFIX}/`")
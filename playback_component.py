@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from waveform import PeakPyramid
+
+_component = components.declare_component(
+    "meeting_playback",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "playback"))
+
+
+def meeting_playback(audio_bytes: bytes, mime: str, audio_id: str, pyramid: PeakPyramid,
+                     segments: list, key: str = "meeting_playback"):
+    """
+    Audio player with waveform cursor and per-segment feedback, synchronized in the browser.
+
+    The audio and the segments are only sent until the browser reports holding them (their
+    ids come back in the component value), so later reruns do not transfer them again.
+
+    Args:
+        audio_bytes (bytes): The uploaded recording.
+        mime (str): Its MIME type (e.g. "audio/mpeg").
+        audio_id (str): Identifies the recording (its digest).
+        pyramid (PeakPyramid): Waveform peaks of the recording; the browser draws from the
+                               level matching the canvas width.
+        segments (list): Result dicts (start, end, transcript, tone, sentiment, feedback, and
+                         optionally tone_emoji/sentiment_emoji), sorted by start.
+        key (str): Streamlit widget key.
+
+    Returns:
+        dict: The last reported event ({"event": "play" | "pause" | "seek" | "ended" | ...,
+              "position_ms": ..., "playing": ..., "seq": ...}), or None before the first one.
+    """
+    segments_id = hashlib.sha1(json.dumps(segments, default=str).encode()).hexdigest() if segments else None
+    loaded = st.session_state.get(key) or {}
+    send_audio = loaded.get("audio_id") != audio_id
+    send_segments = segments_id is not None and loaded.get("segments_id") != segments_id
+
+    return _component(audio_id=audio_id, audio=audio_bytes if send_audio else None, mime=mime,
+                      duration_ms=pyramid.duration_ms,
+                      peak_levels=pyramid.display_levels() if send_audio else None,
+                      segments_id=segments_id, segments=segments if send_segments else None,
+                      key=key, default=None)
@@ -1,40 +1,14 @@
-import dotenv, os
-from vertexai import agent_engines
+from agent_client import invoke_agent, stream_agent
 
-# Load environment variables from a .env file
-dotenv.load_dotenv()
 
+def invoke_postmeet_agent(user_input: str, meeting_id: str = None) -> str:
+    """Invokes the post-meeting agent on the full meeting transcript and returns its summary."""
+    return invoke_agent("postmeet", user_input, meeting_id=meeting_id)
 
-def invoke_postmeet_agent(user_input: str) -> str:
 
-    agent_engine_id = "8908322373078351872"
-
-    try:
-        # Get the agent engine and create a new session
-        agent_engine = agent_engines.get(agent_engine_id)
-        session = agent_engine.create_session(user_id="new_user")
-
-        # Initialize a variable to hold the last event
-        last_event = None
-
-        # Stream the query and capture each event, keeping only the last one
-        for event in agent_engine.stream_query(
-                user_id="new_user",
-                session_id=session["id"],
-                message=user_input
-        ):
-            print("Received event:", event)  # Optional: for debugging
-            last_event = event
-
-        # The main response is in the 'text' part of the last event's 'content'
-        if last_event and 'content' in last_event and 'parts' in last_event['content']:
-            main_response = last_event['content']['parts'][0]['text']
-            return main_response
-        else:
-            return "Could not find the main response in the agent's output."
-
-    except Exception as e:
-        return f"An error occurred while invoking the agent: {e}"
+def stream_postmeet_agent(user_input: str, meeting_id: str = None):
+    """Like invoke_postmeet_agent, but yields the summary text as it is generated."""
+    return stream_agent("postmeet", user_input, meeting_id=meeting_id)
 
 
 if __name__ == "__main__":
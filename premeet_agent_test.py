@@ -1,8 +1,4 @@
-import dotenv, os
-from vertexai import agent_engines
-
-# Load environment variables from a .env file
-dotenv.load_dotenv()
+from agent_client import invoke_agent, stream_agent
 
 
 def invoke_premeet_agent(client_name: str) -> str:
@@ -16,35 +12,17 @@ def invoke_premeet_agent(client_name: str) -> str:
         str: The final, main response from the agent as a formatted string,
              or an error message if the agent fails.
     """
-    agent_engine_id = "6835540644581081088"
-    user_input = f"Pre-Meeting Brief for  {client_name}"
-
-    try:
-        # Get the agent engine and create a new session
-        agent_engine = agent_engines.get(agent_engine_id)
-        session = agent_engine.create_session(user_id="new_user")
-
-        # Initialize a variable to hold the last event
-        last_event = None
-
-        # Stream the query and capture each event, keeping only the last one
-        for event in agent_engine.stream_query(
-                user_id="new_user",
-                session_id=session["id"],
-                message=user_input
-        ):
-            print("Received event:", event)  # Optional: for debugging
-            last_event = event
-
-        # The main response is in the 'text' part of the last event's 'content'
-        if last_event and 'content' in last_event and 'parts' in last_event['content']:
-            main_response = last_event['content']['parts'][0]['text']
-            return main_response
-        else:
-            return "Could not find the main response in the agent's output."
-
-    except Exception as e:
-        return f"An error occurred while invoking the agent: {e}"
+    # Each client gets its own session, so briefings never share conversation context
+    return invoke_agent("premeet", client_name, meeting_id=client_name)
+
+
+def stream_premeet_agent(client_name: str, raise_errors: bool = False):
+    """
+    Like invoke_premeet_agent, but yields the briefing text as it is generated.
+
+    With raise_errors, a failed call raises instead of yielding an error message.
+    """
+    return stream_agent("premeet", client_name, meeting_id=client_name, raise_errors=raise_errors)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Bump when the shape or meaning of cached results changes
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "uidigiexpert_results"))
+DEFAULT_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1000))
+
+
+def audio_digest(source) -> str:
+    """
+    Content hash of an audio recording.
+
+    Args:
+        source: Raw file bytes or a path to the file.
+
+    Returns:
+        str: Hex SHA-256 digest of the bytes.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(digest: str, **params) -> str:
+    """Combines an audio digest with the processing parameters that shaped the results."""
+    payload = json.dumps({"audio": digest, "version": CACHE_VERSION, "params": params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Disk-backed store of processed meeting results, one JSON file per key.
+
+    Reads refresh a file's modification time, so eviction (oldest mtime first) keeps the
+    cache within max_bytes and max_entries in least-recently-used order.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Returns the cached results for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                results = json.load(f)
+            os.utime(path)
+            return results
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, results):
+        """Stores results under key atomically, then evicts old entries if needed."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(results, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Could not write result cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+                _, size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache shared by the dashboard and the batch processor."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
@@ -1,49 +1,27 @@
 import concurrent.futures
-import io
-from pydub import AudioSegment
-from google.cloud import speech_v1p1beta1 as speech
 
+from audio_buffer import decode_audio
+from metrics import get_metrics, span
+from stt_backend import transcribe
 
 
-def speech_to_text_api(audio_chunk: AudioSegment) -> str:
+def speech_to_text_api(audio_chunk) -> str:
     """
     Transcribes a given audio chunk using the Google Cloud Speech-to-Text API.
 
+    The chunk is downmixed to mono, resampled to 16 kHz and sent through the process-wide
+    transcription backend (see stt_backend), which reuses a pool of long-lived clients.
+
     Args:
-        audio_chunk (AudioSegment): A pydub AudioSegment object representing a short
-                                    chunk of audio (e.g., 2 seconds).
+        audio_chunk (AudioChunk | AudioSegment): A short chunk of audio (e.g., 2 seconds).
 
     Returns:
         str: The transcribed text, or an empty string if transcription fails.
     """
-    client = speech.SpeechClient()
-
-    # Convert the pydub AudioSegment into raw audio bytes
-    with io.BytesIO() as audio_io:
-        audio_chunk.export(audio_io, format="wav")
-        content = audio_io.getvalue()
-
-    audio = speech.RecognitionAudio(content=content)
-
-    # Configure the request for the API
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=audio_chunk.frame_rate,
-        language_code="en-US",  # Change to the appropriate language code if needed
-        model="latest_short"  # Recommended model for short audio chunks
-    )
-
     try:
-        # Send the audio chunk to the Speech-to-Text API
-        response = client.recognize(config=config, audio=audio)
-
-        # The transcription is usually in the first alternative of the first result
-        if response.results:
-            return response.results[0].alternatives[0].transcript
-        else:
-            return ""
-
+        return transcribe(audio_chunk)
     except Exception as e:
+        get_metrics().increment("stt.failed_chunks")
         print(f"An error occurred during transcription: {e}")
         return ""
 
@@ -62,14 +40,15 @@ def process_chunk(audio_chunk):
 
 def process_audio_concurrently(audio_data):
     """Main function to orchestrate concurrent processing."""
-    audio = AudioSegment.from_file(io.BytesIO(audio_data))
+    audio = decode_audio(audio_data)
     chunk_duration_ms = 2000
-    chunks = [audio[i:i + chunk_duration_ms] for i in range(0, len(audio), chunk_duration_ms)]
+    chunks = list(audio.iter_chunks(chunk_duration_ms))
 
     transcriptions = {}
 
     # Create a thread pool with a limited number of workers
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+    with span("stt.batch"), \
+            concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
         # Submit all transcription jobs and map them to their chunk index
         future_to_chunk_index = {
             executor.submit(process_chunk, chunk): i
@@ -79,7 +58,7 @@ def process_audio_concurrently(audio_data):
         # Process the results as they are completed
         for future in concurrent.futures.as_completed(future_to_chunk_index):
             chunk_index = future_to_chunk_index[future]
-
+            transcriptions[chunk_index] = future.result()
 
 
 
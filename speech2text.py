@@ -1,12 +1,15 @@
-import io
-from google.cloud import speech
 from pydub import AudioSegment
 
+from stt_backend import transcribe
+
 
 def speech_to_text_api(audio_chunk: AudioSegment) -> str:
     """
     Transcribes a given audio chunk using the Google Cloud Speech-to-Text API.
 
+    Requests go through the process-wide transcription backend (see stt_backend), so the
+    Speech client and its channel are reused across calls.
+
     Args:
         audio_chunk (AudioSegment): A pydub AudioSegment object representing a short
                                     chunk of audio (e.g., 2 seconds).
@@ -14,33 +17,8 @@ def speech_to_text_api(audio_chunk: AudioSegment) -> str:
     Returns:
         str: The transcribed text, or an empty string if transcription fails.
     """
-    client = speech.SpeechClient()
-
-    # Convert the pydub AudioSegment into raw audio bytes
-    with io.BytesIO() as audio_io:
-        audio_chunk.export(audio_io, format="wav")
-        content = audio_io.getvalue()
-
-    audio = speech.RecognitionAudio(content=content)
-
-    # Configure the request for the API
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=audio_chunk.frame_rate,
-        language_code="en-US",  # Change to the appropriate language code if needed
-        model="latest_short"  # Recommended model for short audio chunks
-    )
-
     try:
-        # Send the audio chunk to the Speech-to-Text API
-        response = client.recognize(config=config, audio=audio)
-
-        # The transcription is usually in the first alternative of the first result
-        if response.results:
-            return response.results[0].alternatives[0].transcript
-        else:
-            return ""
-
+        return transcribe(audio_chunk, model="latest_short")
     except Exception as e:
         print(f"An error occurred during transcription: {e}")
         return ""
\ No newline at end of file
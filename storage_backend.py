@@ -0,0 +1,224 @@
+import os
+import threading
+
+
+class NotModified(Exception):
+    """Raised by a conditional read when the object still has the given generation."""
+
+
+class ObjectInfo:
+    """
+    Metadata of a stored object.
+
+    Args:
+        name (str): Object name within the bucket.
+        generation: Version token; changes whenever the content changes.
+        size (int): Size in bytes.
+    """
+
+    def __init__(self, name: str, generation, size: int):
+        self.name = name
+        self.generation = generation
+        self.size = size
+
+
+class StorageBackend:
+    """Interface of an object store holding the dashboard's data; implementations must be thread-safe."""
+
+    def read(self, bucket_name: str, name: str, if_generation_not_match=None):
+        """
+        Reads a whole object.
+
+        Args:
+            bucket_name (str): Bucket (or top-level directory) of the object.
+            name (str): Object name within the bucket.
+            if_generation_not_match: Raise NotModified instead of returning the content
+                                     if the object still has this generation.
+
+        Returns:
+            tuple: (generation, bytes); (None, None) if the object does not exist.
+        """
+        raise NotImplementedError
+
+    def read_range(self, bucket_name: str, name: str, start: int, end: int = None):
+        """
+        Reads bytes [start, end) of an object (to the end if end is None); None if it does not exist.
+
+        Used by the Parquet notification store to fetch footers and row groups without
+        downloading whole partitions.
+        """
+        raise NotImplementedError
+
+    def list(self, bucket_name: str, prefix: str = "") -> list:
+        """Returns ObjectInfo for every object whose name starts with prefix."""
+        raise NotImplementedError
+
+    def write(self, bucket_name: str, name: str, data: bytes, content_type: str = None):
+        """Creates or replaces an object."""
+        raise NotImplementedError
+
+
+class GcsStorageBackend(StorageBackend):
+    """Google Cloud Storage, through one shared storage.Client."""
+
+    def __init__(self, client=None):
+        # Imported here so the local and in-memory backends work without the GCS library
+        from google.api_core import exceptions
+        from google.cloud import storage
+
+        self._exceptions = exceptions
+        self.client = client or storage.Client()
+
+    def _blob(self, bucket_name: str, name: str):
+        return self.client.bucket(bucket_name).blob(name)
+
+    def read(self, bucket_name, name, if_generation_not_match=None):
+        blob = self._blob(bucket_name, name)
+        try:
+            # One request either way: a 304 if unchanged, the content otherwise
+            data = blob.download_as_bytes(if_generation_not_match=if_generation_not_match)
+        except self._exceptions.NotModified:
+            raise NotModified(name)
+        except self._exceptions.NotFound:
+            return None, None
+        return blob.generation, data
+
+    def read_range(self, bucket_name, name, start, end=None):
+        try:
+            # download_as_bytes takes an inclusive end offset
+            return self._blob(bucket_name, name).download_as_bytes(
+                start=start, end=None if end is None else end - 1)
+        except self._exceptions.NotFound:
+            return None
+
+    def list(self, bucket_name, prefix=""):
+        return [ObjectInfo(blob.name, blob.generation, blob.size)
+                for blob in self.client.list_blobs(bucket_name, prefix=prefix)]
+
+    def write(self, bucket_name, name, data, content_type=None):
+        self._blob(bucket_name, name).upload_from_string(data, content_type=content_type)
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Objects as files under root/<bucket>/<name>; the file's mtime (ns) is the generation.
+
+    Args:
+        root (str): Directory holding one subdirectory per bucket.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket_name: str, name: str) -> str:
+        return os.path.join(self.root, bucket_name, *name.split("/"))
+
+    def read(self, bucket_name, name, if_generation_not_match=None):
+        path = self._path(bucket_name, name)
+        try:
+            generation = os.stat(path).st_mtime_ns
+            if if_generation_not_match is not None and generation == if_generation_not_match:
+                raise NotModified(name)
+            with open(path, "rb") as f:
+                return generation, f.read()
+        except FileNotFoundError:
+            return None, None
+
+    def read_range(self, bucket_name, name, start, end=None):
+        try:
+            with open(self._path(bucket_name, name), "rb") as f:
+                f.seek(start)
+                return f.read() if end is None else f.read(max(0, end - start))
+        except FileNotFoundError:
+            return None
+
+    def list(self, bucket_name, prefix=""):
+        bucket_dir = os.path.join(self.root, bucket_name)
+        # Only walk the directory the prefix points into
+        start_dir = os.path.join(bucket_dir, *prefix.split("/")[:-1])
+        objects = []
+        for dir_path, _, file_names in os.walk(start_dir):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                name = os.path.relpath(path, bucket_dir).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    stat = os.stat(path)
+                    objects.append(ObjectInfo(name, stat.st_mtime_ns, stat.st_size))
+        return sorted(objects, key=lambda info: info.name)
+
+    def write(self, bucket_name, name, data, content_type=None):
+        path = self._path(bucket_name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial object
+        tmp_path = f"{path}.tmp{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class MemoryStorageBackend(StorageBackend):
+    """Objects held in a dict; generations count up from 1 on every write."""
+
+    def __init__(self):
+        self._objects = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def read(self, bucket_name, name, if_generation_not_match=None):
+        with self._lock:
+            stored = self._objects.get((bucket_name, name))
+        if stored is None:
+            return None, None
+        if if_generation_not_match is not None and stored[0] == if_generation_not_match:
+            raise NotModified(name)
+        return stored
+
+    def read_range(self, bucket_name, name, start, end=None):
+        with self._lock:
+            stored = self._objects.get((bucket_name, name))
+        return None if stored is None else stored[1][start:end]
+
+    def list(self, bucket_name, prefix=""):
+        with self._lock:
+            items = list(self._objects.items())
+        return sorted((ObjectInfo(name, generation, len(data))
+                       for (bucket, name), (generation, data) in items
+                       if bucket == bucket_name and name.startswith(prefix)),
+                      key=lambda info: info.name)
+
+    def write(self, bucket_name, name, data, content_type=None):
+        with self._lock:
+            self._generation += 1
+            self._objects[(bucket_name, name)] = (self._generation, bytes(data))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    Returns the process-wide backend, chosen by STORAGE_BACKEND.
+
+    "gcs" (default) uses Google Cloud Storage, "local" the directory STORAGE_ROOT
+    (default ./storage) with one subdirectory per bucket, and "memory" an empty
+    in-process store to be filled with write().
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = os.environ.get("STORAGE_BACKEND", "gcs").lower()
+            if kind == "local":
+                _backend = LocalStorageBackend(os.environ.get("STORAGE_ROOT", "storage"))
+            elif kind == "memory":
+                _backend = MemoryStorageBackend()
+            else:
+                _backend = GcsStorageBackend()
+        return _backend
+
+
+def set_storage_backend(backend: StorageBackend):
+    """Replaces the process-wide backend (e.g. with a MemoryStorageBackend)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
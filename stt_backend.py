@@ -0,0 +1,546 @@
+import asyncio
+import io
+import itertools
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+import soundfile
+from scipy import signal
+
+from adaptive_limiter import acall_with_retry, call_with_retry, get_limiter
+from audio_buffer import AudioChunk, from_segment
+from cpu_pool import attach_chunk, get_cpu_pool, run_in_pool
+from metrics import get_metrics, span
+
+# Speech-to-Text is trained on 16 kHz mono; anything more only inflates the payload
+TARGET_SAMPLE_RATE = 16000
+ENCODINGS = ("LINEAR16", "FLAC", "OGG_OPUS")
+DEFAULT_ENCODING = os.environ.get("STT_ENCODING", "LINEAR16")
+DEFAULT_POOL_SIZE = int(os.environ.get("STT_POOL_SIZE", 4))
+# Streaming sessions are capped at ~305 s of audio; reopen them a little before that
+STREAM_SESSION_LIMIT_MS = 290_000
+
+
+class SpeechPayload:
+    """
+    Encoded mono audio ready to be sent to a recognizer.
+
+    Args:
+        content (bytes): Encoded audio.
+        encoding (str): One of ENCODINGS.
+        sample_rate_hertz (int): Sample rate of the encoded audio.
+        duration_ms (int): Length of the audio, used for logging and by the fake backend.
+    """
+
+    def __init__(self, content: bytes, encoding: str, sample_rate_hertz: int, duration_ms: int):
+        self.content = content
+        self.encoding = encoding
+        self.sample_rate_hertz = sample_rate_hertz
+        self.duration_ms = duration_ms
+
+
+class TranscriptEvent:
+    """
+    A streaming recognition result.
+
+    Args:
+        text (str): Transcript of the result.
+        start_ms (int): Start of the result, measured from the start of the recording.
+        end_ms (int): End of the audio covered by the result.
+        is_final (bool): False for interim hypotheses that may still change.
+    """
+
+    def __init__(self, text: str, start_ms: int, end_ms: int, is_final: bool):
+        self.text = text
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.is_final = is_final
+
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    """Downmixes int16 samples of shape (frames, channels) to a float32 mono signal."""
+    if samples.shape[1] == 1:
+        return samples[:, 0].astype(np.float32)
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+class StreamResampler:
+    """
+    Resamples a mono float signal that arrives in blocks, with scipy.signal.resample_poly.
+
+    Each block is resampled together with the input the filter still needs from the
+    previous ones, and only the output samples whose filter window is complete are
+    returned, so a signal fed in pieces resamples exactly like the whole signal, without
+    artifacts at the block edges.
+
+    Args:
+        source_rate (int): Sample rate of the input.
+        target_rate (int): Sample rate of the output.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int = TARGET_SAMPLE_RATE):
+        divisor = np.gcd(int(source_rate), int(target_rate))
+        self.up = int(target_rate) // divisor
+        self.down = int(source_rate) // divisor
+        # Half-length of resample_poly's default filter, in upsampled samples
+        self.half_len = 10 * max(self.up, self.down)
+        # _buffer[0] is input sample _start, always a multiple of down so outputs stay aligned
+        self._buffer = np.empty(0, dtype=np.float32)
+        self._start = 0
+        self._produced = 0
+
+    def process(self, mono: np.ndarray, final: bool = False) -> np.ndarray:
+        """
+        Resamples the next block of the signal.
+
+        Args:
+            mono (np.ndarray): The next input samples.
+            final (bool): True for the last block; the filter tail is flushed.
+
+        Returns:
+            np.ndarray: float32 output samples that are complete so far.
+        """
+        self._buffer = np.concatenate([self._buffer, np.asarray(mono, dtype=np.float32)])
+        received = self._start + len(self._buffer)
+        if final:
+            end = -(-received * self.up // self.down)
+        else:
+            # Outputs whose filter window ends within the input received so far
+            end = max(self._produced, ((received - 1) * self.up - self.half_len) // self.down + 1)
+        if end <= self._produced or not len(self._buffer):
+            return np.empty(0, dtype=np.float32)
+        offset = self._start * self.up // self.down
+        out = signal.resample_poly(self._buffer, self.up, self.down)[self._produced - offset:end - offset]
+        self._produced = end
+        # Keep only the input the next output's filter window reaches back to
+        first = max(0, (end * self.down - self.half_len) // self.up) // self.down * self.down
+        drop = min(max(0, first - self._start), len(self._buffer))
+        self._buffer = self._buffer[drop:]
+        self._start += drop
+        return out.astype(np.float32, copy=False)
+
+
+def resample(mono: np.ndarray, source_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Resamples a mono float signal with scipy's polyphase anti-aliasing filter."""
+    if source_rate == target_rate or len(mono) == 0:
+        return mono
+    divisor = np.gcd(int(source_rate), int(target_rate))
+    return signal.resample_poly(mono, target_rate // divisor, source_rate // divisor).astype(np.float32)
+
+
+_SOUNDFILE_FORMATS = {"FLAC": ("FLAC", "PCM_16"), "OGG_OPUS": ("OGG", "OPUS")}
+
+
+def payload_encoding(encoding: str) -> str:
+    """
+    Validates a requested encoding. FLAC and OGG_OPUS are encoded by libsndfile (via
+    soundfile); a libsndfile build without the format is an error, not a silent fallback.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    if encoding != "LINEAR16" and not soundfile.check_format(*_SOUNDFILE_FORMATS[encoding]):
+        raise ValueError(f"libsndfile {soundfile.__libsndfile_version__} cannot encode {encoding}")
+    return encoding
+
+
+def encode_pcm(pcm: np.ndarray, sample_rate: int, encoding: str) -> bytes:
+    """
+    Encodes mono int16 samples for the Speech-to-Text API.
+
+    LINEAR16 is returned as raw samples; FLAC and OGG_OPUS are encoded in-process by
+    libsndfile.
+    """
+    if encoding == "LINEAR16":
+        return pcm.tobytes()
+    if encoding not in _SOUNDFILE_FORMATS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    container, subtype = _SOUNDFILE_FORMATS[encoding]
+    with io.BytesIO() as out:
+        soundfile.write(out, pcm, sample_rate, format=container, subtype=subtype)
+        return out.getvalue()
+
+
+def _in_wire_format(audio_chunk, encoding: str, target_rate: int) -> bool:
+    # Mono LINEAR16 at the target rate needs no work beyond copying the samples
+    return (encoding == "LINEAR16" and isinstance(audio_chunk, AudioChunk) and
+            audio_chunk.channels == 1 and audio_chunk.frame_rate == target_rate)
+
+
+def prepare_payload(audio_chunk, encoding: str = None,
+                    target_rate: int = TARGET_SAMPLE_RATE) -> SpeechPayload:
+    """
+    Downmixes, resamples and encodes a chunk for recognition.
+
+    Args:
+        audio_chunk (AudioChunk | AudioSegment): The audio to send.
+        encoding (str): One of ENCODINGS, defaults to the STT_ENCODING setting.
+        target_rate (int): Sample rate sent to the API.
+
+    Returns:
+        SpeechPayload: The encoded request body.
+    """
+    encoding = payload_encoding(encoding or DEFAULT_ENCODING)
+    with span("stt.encode", encoding=encoding):
+        if not isinstance(audio_chunk, AudioChunk):
+            audio_chunk = from_segment(audio_chunk).chunk(0, len(audio_chunk))
+
+        if _in_wire_format(audio_chunk, encoding, target_rate):
+            # Send the buffer view as-is
+            return SpeechPayload(bytes(audio_chunk.linear16()), encoding, target_rate, len(audio_chunk))
+
+        mono = resample(to_mono(audio_chunk.samples), audio_chunk.frame_rate, target_rate)
+        pcm = np.clip(mono, -32768, 32767).astype(np.int16)
+        return SpeechPayload(encode_pcm(pcm, target_rate, encoding), encoding, target_rate,
+                             int(round(len(pcm) * 1000 / target_rate)))
+
+
+def prepare_shared_payload(ref, encoding: str = None, target_rate: int = TARGET_SAMPLE_RATE) -> SpeechPayload:
+    """prepare_payload for a SharedPcmBuffer chunk, given its shared_ref; runs in a pool worker."""
+    return prepare_payload(attach_chunk(ref), encoding, target_rate)
+
+
+async def aprepare_payload(audio_chunk, encoding: str = None,
+                           target_rate: int = TARGET_SAMPLE_RATE) -> SpeechPayload:
+    """
+    prepare_payload without blocking the event loop.
+
+    Chunks already in the wire format (e.g. streamed 16 kHz mono audio sent as LINEAR16)
+    are only copied, which is done inline. Chunks that have to be resampled or compressed
+    go to the CPU worker pool when it is enabled: chunks of a SharedPcmBuffer are read
+    there from shared memory, others are pickled to it. Without the pool they are
+    prepared on a thread.
+    """
+    encoding = payload_encoding(encoding or DEFAULT_ENCODING)
+    if _in_wire_format(audio_chunk, encoding, target_rate):
+        return prepare_payload(audio_chunk, encoding, target_rate)
+    if get_cpu_pool() is None:
+        return await asyncio.to_thread(prepare_payload, audio_chunk, encoding, target_rate)
+    # Timed here, since spans recorded in the worker process stay there
+    ref = getattr(audio_chunk, "shared_ref", None)
+    with span("stt.encode", encoding=encoding, mode="pool"):
+        if ref is not None:
+            return await run_in_pool(prepare_shared_payload, ref, encoding, target_rate)
+        return await run_in_pool(prepare_payload, audio_chunk, encoding, target_rate)
+
+
+class SpeechBackend:
+    """Interface of a transcription backend; implementations must be thread-safe."""
+
+    def recognize(self, payload: SpeechPayload, language_code: str = "en-US",
+                  model: str = "latest_short") -> str:
+        raise NotImplementedError
+
+    async def arecognize(self, payload: SpeechPayload, language_code: str = "en-US",
+                         model: str = "latest_short") -> str:
+        """Async variant of recognize; by default runs recognize on a worker thread."""
+        return await asyncio.to_thread(self.recognize, payload, language_code, model)
+
+    def streaming_recognize(self, frames, sample_rate_hertz: int = TARGET_SAMPLE_RATE,
+                            language_code: str = "en-US", model: str = "latest_long",
+                            interim_results: bool = True):
+        """
+        Runs one streaming session over mono LINEAR16 frames.
+
+        Args:
+            frames: Iterable of LINEAR16 byte strings, consumed as the session runs.
+            sample_rate_hertz (int): Sample rate of the frames.
+            language_code (str): BCP-47 language of the speech.
+            model (str): Recognition model name.
+            interim_results (bool): Also yield non-final hypotheses.
+
+        Yields:
+            TranscriptEvent: Results with times relative to the start of the session.
+        """
+        raise NotImplementedError
+
+
+class GoogleSpeechBackend(SpeechBackend):
+    """
+    Google Cloud Speech-to-Text backend backed by a small pool of long-lived clients.
+
+    Each SpeechClient owns one gRPC channel, which multiplexes concurrent calls; the pool
+    spreads worker threads over a few channels instead of opening one per request.
+
+    Args:
+        pool_size (int): Number of clients (channels) to keep open.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        from google.cloud import speech_v1p1beta1 as speech
+
+        self._speech = speech
+        self._pool_size = max(1, pool_size)
+        self._clients = []
+        self._cycle = None
+        # grpc.aio channels are bound to the event loop that created them
+        self._async_cycles = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _client(self):
+        with self._lock:
+            if self._cycle is None:
+                self._clients = [self._speech.SpeechClient() for _ in range(self._pool_size)]
+                self._cycle = itertools.cycle(self._clients)
+            return next(self._cycle)
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            cycle = self._async_cycles.get(loop)
+            if cycle is None:
+                cycle = itertools.cycle([self._speech.SpeechAsyncClient() for _ in range(self._pool_size)])
+                self._async_cycles[loop] = cycle
+            return next(cycle)
+
+    def _recognition_config(self, payload: SpeechPayload, language_code: str, model: str):
+        speech = self._speech
+        return speech.RecognitionConfig(
+            encoding=getattr(speech.RecognitionConfig.AudioEncoding, payload.encoding),
+            sample_rate_hertz=payload.sample_rate_hertz,
+            audio_channel_count=1,
+            language_code=language_code,
+            model=model,
+        )
+
+    @staticmethod
+    def _transcript(response) -> str:
+        # Longer chunks can come back as several results; keep the top alternative of each
+        return " ".join(result.alternatives[0].transcript
+                        for result in response.results if result.alternatives).strip()
+
+    def recognize(self, payload: SpeechPayload, language_code: str = "en-US",
+                  model: str = "latest_short") -> str:
+        response = self._client().recognize(config=self._recognition_config(payload, language_code, model),
+                                            audio=self._speech.RecognitionAudio(content=payload.content))
+        return self._transcript(response)
+
+    async def arecognize(self, payload: SpeechPayload, language_code: str = "en-US",
+                         model: str = "latest_short") -> str:
+        response = await self._async_client().recognize(
+            config=self._recognition_config(payload, language_code, model),
+            audio=self._speech.RecognitionAudio(content=payload.content))
+        return self._transcript(response)
+
+    def streaming_recognize(self, frames, sample_rate_hertz: int = TARGET_SAMPLE_RATE,
+                            language_code: str = "en-US", model: str = "latest_long",
+                            interim_results: bool = True):
+        speech = self._speech
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=sample_rate_hertz,
+                audio_channel_count=1,
+                language_code=language_code,
+                model=model,
+                enable_automatic_punctuation=True,
+            ),
+            interim_results=interim_results,
+        )
+        requests = (speech.StreamingRecognizeRequest(audio_content=bytes(frame)) for frame in frames)
+
+        last_final_ms = 0
+        for response in self._client().streaming_recognize(config=streaming_config, requests=requests):
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                end_ms = int(result.result_end_time.total_seconds() * 1000)
+                yield TranscriptEvent(result.alternatives[0].transcript.strip(), last_final_ms,
+                                      end_ms, result.is_final)
+                if result.is_final:
+                    last_final_ms = end_ms
+
+
+class FakeSpeechBackend(SpeechBackend):
+    """
+    Offline backend for tests and benchmarks. Records every payload it receives.
+
+    Args:
+        transcribe (callable): Optional function mapping a SpeechPayload to text.
+        latency_s (float): Simulated round-trip time per request.
+    """
+
+    def __init__(self, transcribe=None, latency_s: float = 0.0):
+        self._transcribe = transcribe
+        self.latency_s = latency_s
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def recognize(self, payload: SpeechPayload, language_code: str = "en-US",
+                  model: str = "latest_short") -> str:
+        with self._lock:
+            self.requests.append(payload)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self._transcribe:
+            return self._transcribe(payload)
+        return f"[{payload.duration_ms / 1000:.1f}s of speech]"
+
+    async def arecognize(self, payload: SpeechPayload, language_code: str = "en-US",
+                         model: str = "latest_short") -> str:
+        with self._lock:
+            self.requests.append(payload)
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self._transcribe:
+            return self._transcribe(payload)
+        return f"[{payload.duration_ms / 1000:.1f}s of speech]"
+
+    def streaming_recognize(self, frames, sample_rate_hertz: int = TARGET_SAMPLE_RATE,
+                            language_code: str = "en-US", model: str = "latest_long",
+                            interim_results: bool = True):
+        # Emits an interim hypothesis every second and a final result every two seconds
+        received_ms, last_final_ms, last_interim_ms = 0, 0, 0
+        for frame in frames:
+            received_ms += len(frame) * 1000 // (2 * sample_rate_hertz)
+            if received_ms - last_final_ms >= 2000:
+                yield TranscriptEvent(f"[{(received_ms - last_final_ms) / 1000:.1f}s of speech]",
+                                      last_final_ms, received_ms, True)
+                last_final_ms = last_interim_ms = received_ms
+            elif interim_results and received_ms - last_interim_ms >= 1000:
+                yield TranscriptEvent("[...]", last_final_ms, received_ms, False)
+                last_interim_ms = received_ms
+        if received_ms > last_final_ms:
+            yield TranscriptEvent(f"[{(received_ms - last_final_ms) / 1000:.1f}s of speech]",
+                                  last_final_ms, received_ms, True)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_speech_backend() -> SpeechBackend:
+    """Returns the process-wide backend, chosen by STT_BACKEND ("google" or "fake")."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.environ.get("STT_BACKEND", "google").lower() == "fake":
+                _backend = FakeSpeechBackend()
+            else:
+                _backend = GoogleSpeechBackend()
+        return _backend
+
+
+def set_speech_backend(backend: SpeechBackend):
+    """Replaces the process-wide backend (e.g. with a FakeSpeechBackend)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def transcribe(audio_chunk, language_code: str = "en-US", model: str = "latest_short",
+               encoding: str = None) -> str:
+    """
+    Transcribes a chunk with the process-wide backend.
+
+    Args:
+        audio_chunk (AudioChunk | AudioSegment): The audio to transcribe.
+        language_code (str): BCP-47 language of the speech.
+        model (str): Recognition model name.
+        encoding (str): One of ENCODINGS, defaults to the STT_ENCODING setting.
+
+    Returns:
+        str: The transcript (empty if nothing was recognized). Quota errors are retried with
+             backoff under the adaptive "speech" limiter; other API errors are raised.
+    """
+    payload = prepare_payload(audio_chunk, encoding)
+    # Includes waiting for a limiter slot and any quota retries
+    with span("stt.rpc", model=model):
+        return call_with_retry(get_limiter("speech"), get_speech_backend().recognize,
+                               payload, language_code, model)
+
+
+async def atranscribe(audio_chunk, language_code: str = "en-US", model: str = "latest_short",
+                      encoding: str = None) -> str:
+    """Async variant of transcribe for use inside an event loop."""
+    payload = await aprepare_payload(audio_chunk, encoding)
+    with span("stt.rpc", model=model):
+        return await acall_with_retry(get_limiter("speech"), get_speech_backend().arecognize,
+                                      payload, language_code, model)
+
+
+def _linear16_frames(chunks, target_rate: int, timing: dict):
+    # Downmixes and resamples the frames as one continuous signal; yields (bytes, samples)
+    resampler = None
+    for chunk in chunks:
+        started = time.perf_counter()
+        mono = to_mono(chunk.samples)
+        if chunk.frame_rate != target_rate:
+            if resampler is None:
+                resampler = StreamResampler(chunk.frame_rate, target_rate)
+            mono = resampler.process(mono)
+        pcm = np.clip(mono, -32768, 32767).astype(np.int16)
+        timing["encode_s"] += time.perf_counter() - started
+        if len(pcm):
+            yield pcm.tobytes(), len(pcm)
+    if resampler is not None:
+        pcm = np.clip(resampler.process(np.empty(0, dtype=np.float32), final=True), -32768, 32767).astype(np.int16)
+        if len(pcm):
+            yield pcm.tobytes(), len(pcm)
+
+
+def stream_transcribe(audio, frame_ms: int = 100, language_code: str = "en-US",
+                      model: str = "latest_long", interim_results: bool = True,
+                      session_limit_ms: int = STREAM_SESSION_LIMIT_MS, realtime: bool = True):
+    """
+    Transcribes a whole recording over streaming sessions instead of one RPC per chunk.
+
+    The audio is fed to the backend in short 16 kHz mono LINEAR16 frames, resampled as
+    one continuous signal. The streaming API rejects audio sent faster than it is spoken,
+    so frames are released at real-time speed; a live source is not slowed down by this.
+    Sessions are reopened transparently before the API's per-stream duration limit, so a
+    meeting of any length produces one continuous sequence of events.
+
+    Args:
+        audio (PcmBuffer | iterable of AudioChunk): The recording to transcribe.
+        frame_ms (int): Duration of each streamed frame.
+        language_code (str): BCP-47 language of the speech.
+        model (str): Recognition model name.
+        interim_results (bool): Also yield non-final hypotheses.
+        session_limit_ms (int): Audio sent per session before a new one is opened.
+        realtime (bool): Pace frames at real-time speed; only backends without that limit
+                         (e.g. FakeSpeechBackend) can be fed faster.
+
+    Yields:
+        TranscriptEvent: Results timed from the start of the recording.
+    """
+    chunks = audio.iter_chunks(frame_ms) if hasattr(audio, "iter_chunks") else audio
+    timing = {"encode_s": 0.0}
+    frames = _linear16_frames(chunks, TARGET_SAMPLE_RATE, timing)
+    backend = get_speech_backend()
+    session_limit = session_limit_ms * TARGET_SAMPLE_RATE // 1000
+
+    state = {"pending": next(frames, None), "session_samples": 0, "started": 0.0}
+
+    def session_frames():
+        while state["pending"] is not None and state["session_samples"] < session_limit:
+            content, samples = state["pending"]
+            if realtime:
+                # A frame is sent once the audio before it has "played"
+                delay = state["started"] + state["session_samples"] / TARGET_SAMPLE_RATE - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            state["session_samples"] += samples
+            yield content
+            state["pending"] = next(frames, None)
+
+    offset_samples = 0
+    try:
+        while state["pending"] is not None:
+            state["session_samples"] = 0
+            state["started"] = time.monotonic()
+            for event in backend.streaming_recognize(session_frames(), TARGET_SAMPLE_RATE,
+                                                     language_code, model, interim_results):
+                offset_ms = offset_samples * 1000 // TARGET_SAMPLE_RATE
+                event.start_ms += offset_ms
+                event.end_ms += offset_ms
+                yield event
+            get_metrics().observe("stt.stream_session", time.monotonic() - state["started"], model=model)
+            if not state["session_samples"]:
+                break
+            offset_samples += state["session_samples"]
+    finally:
+        # One observation per stream rather than a span per frame
+        get_metrics().observe("stt.encode", timing["encode_s"], encoding="LINEAR16", mode="stream")
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# No process pool in tests: pool paths fall back to in-process work
+os.environ.setdefault("CPU_WORKERS", "0")
+
+from audio_buffer import AudioChunk  # noqa: E402
+
+
+def tone(duration_ms, frame_rate=16000, frequency=440.0, amplitude=8000, start_ms=0):
+    """Mono int16 sine wave as an AudioChunk."""
+    t = np.arange(frame_rate * duration_ms // 1000) / frame_rate
+    samples = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+    return AudioChunk(samples.reshape(-1, 1), frame_rate, start_ms)
+
+
+def silence(duration_ms, frame_rate=16000, start_ms=0):
+    """Mono int16 silence as an AudioChunk."""
+    return AudioChunk(np.zeros((frame_rate * duration_ms // 1000, 1), dtype=np.int16), frame_rate, start_ms)
+
+
+@pytest.fixture
+def fake_speech():
+    """Installs a FakeSpeechBackend for the test and restores the previous backend."""
+    import stt_backend
+
+    previous = stt_backend._backend
+    backend = stt_backend.FakeSpeechBackend()
+    stt_backend.set_speech_backend(backend)
+    yield backend
+    stt_backend.set_speech_backend(previous)
+
+
+@pytest.fixture
+def stub_agent(monkeypatch):
+    """
+    Replaces the in-meeting agent with a canned reply; the returned list records every
+    message sent. Set stub_agent.reply to change the answer (a callable gets the message).
+    """
+    import inmeet_pipeline
+    import live_meeting
+
+    class StubAgent(list):
+        reply = "Tone: calm Sentiment: positive Feedback: keep going"
+
+    agent = StubAgent()
+
+    async def ainvoke_agent(agent_name, user_input, user_id=None, meeting_id=None):
+        agent.append(user_input)
+        return agent.reply(user_input) if callable(agent.reply) else agent.reply
+
+    monkeypatch.setattr(inmeet_pipeline, "ainvoke_agent", ainvoke_agent)
+    monkeypatch.setattr(live_meeting, "ainvoke_agent", ainvoke_agent)
+    return agent
+
+
+@pytest.fixture
+def memory_storage():
+    """Installs an empty MemoryStorageBackend and clears the GCS read caches around the test."""
+    import gsutil
+    import storage_backend
+
+    previous = storage_backend._backend
+    backend = storage_backend.MemoryStorageBackend()
+    storage_backend.set_storage_backend(backend)
+    gsutil._object_cache.clear()
+    gsutil._parsed_cache.clear()
+    yield backend
+    storage_backend.set_storage_backend(previous)
+    gsutil._object_cache.clear()
+    gsutil._parsed_cache.clear()
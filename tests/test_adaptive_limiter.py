@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from adaptive_limiter import AdaptiveLimiter, acall_with_retry, call_with_retry, is_throttling_error
+
+
+class Throttled(Exception):
+    pass
+
+
+def test_throttling_errors_are_recognized():
+    assert is_throttling_error(Exception("429 Too Many Requests"))
+    assert is_throttling_error(Exception("RESOURCE_EXHAUSTED: quota"))
+    assert not is_throttling_error(Exception("500 Internal error"))
+
+
+def test_throttle_halves_the_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter("test", initial_limit=16, cooldown_s=60)
+
+    limiter.on_throttle()
+    limiter.on_throttle()
+
+    assert int(limiter.limit) == 8
+
+
+def test_acquire_blocks_at_the_limit():
+    limiter = AdaptiveLimiter("test", initial_limit=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=second, daemon=True).start()
+    assert not acquired.wait(0.1)
+    limiter.release()
+    assert acquired.wait(1)
+
+
+def test_call_with_retry_retries_throttling(monkeypatch):
+    monkeypatch.setattr("adaptive_limiter.backoff_delay", lambda attempt: 0)
+    limiter = AdaptiveLimiter("test", initial_limit=4, cooldown_s=0)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise Throttled("429 Too Many Requests")
+        return "ok"
+
+    assert call_with_retry(limiter, flaky) == "ok"
+    assert len(calls) == 3
+    assert limiter.in_flight == 0
+    assert limiter.limit < 4
+
+
+def test_call_with_retry_raises_other_errors_at_once():
+    limiter = AdaptiveLimiter("test")
+
+    def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_retry(limiter, broken)
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_async_call_frees_its_slot():
+    limiter = AdaptiveLimiter("test", initial_limit=1)
+
+    async def main():
+        async def slow():
+            await asyncio.sleep(10)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(acall_with_retry(limiter, slow), 0.05)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+
+
+def test_limit_grows_only_while_latency_stays_near_the_baseline():
+    limiter = AdaptiveLimiter("test", initial_limit=4)
+    for _ in range(20):
+        limiter.on_success(0.1)
+    grown = limiter.limit
+
+    for _ in range(40):
+        limiter.on_success(1.0)
+
+    assert grown > 4
+    assert limiter.limit < grown
+
+
+def test_freed_slots_go_to_waiters_in_arrival_order():
+    limiter = AdaptiveLimiter("test", initial_limit=1)
+    limiter.acquire()
+    order = []
+
+    def waiting_thread():
+        limiter.acquire()
+        order.append("thread")
+        limiter.release()
+
+    async def main():
+        thread = threading.Thread(target=waiting_thread)
+        thread.start()
+        while not limiter._waiters:
+            await asyncio.sleep(0.01)
+        waiting = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+
+        limiter.release()
+        await asyncio.to_thread(thread.join)
+        await waiting
+        order.append("coroutine")
+        assert limiter.in_flight == 1
+        limiter.release()
+
+    asyncio.run(main())
+    assert order == ["thread", "coroutine"]
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    limiter = AdaptiveLimiter("test", initial_limit=1)
+    limiter.acquire()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire_async(), 0.05)
+
+    asyncio.run(main())
+    assert not limiter._waiters
+    limiter.release()
+    assert limiter.in_flight == 0
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+import agent_client
+from adaptive_limiter import get_limiter
+from agent_client import ERROR_PREFIX, ainvoke_agent, stream_agent
+
+
+class BrokenEngine:
+    """Streams part of an answer, then fails."""
+
+    def create_session(self, user_id):
+        return {"id": "session"}
+
+    def stream_query(self, user_id, session_id, message):
+        yield {"partial": True, "content": {"parts": [{"text": "The client "}]}}
+        raise RuntimeError("500 Internal error")
+
+
+@pytest.fixture
+def broken_engine(monkeypatch):
+    monkeypatch.setattr(agent_client, "get_agent_engine", lambda engine_id: BrokenEngine())
+
+
+def test_stream_failure_is_yielded_as_text_by_default(broken_engine):
+    deltas = list(stream_agent("premeet", "Alice", meeting_id="test-yield"))
+
+    assert deltas[0] == "The client "
+    assert deltas[-1].startswith(ERROR_PREFIX)
+
+
+def test_stream_failure_can_be_raised(broken_engine):
+    deltas = []
+
+    with pytest.raises(RuntimeError):
+        for delta in stream_agent("premeet", "Alice", meeting_id="test-raise", raise_errors=True):
+            deltas.append(delta)
+    assert deltas == ["The client "]
+
+
+class SlowEngine:
+    """A synchronous-only engine that streams one event every 50 ms."""
+
+    def __init__(self):
+        self.events = 0
+
+    def create_session(self, user_id):
+        return {"id": "session"}
+
+    def stream_query(self, user_id, session_id, message):
+        for _ in range(40):
+            time.sleep(0.05)
+            self.events += 1
+            yield {"content": {"parts": [{"text": "still thinking"}]}}
+
+
+def test_a_cancelled_fallback_call_stops_and_frees_its_slot(monkeypatch):
+    engine = SlowEngine()
+    monkeypatch.setattr(agent_client, "get_agent_engine", lambda engine_id: engine)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(ainvoke_agent("inmeet", "hello", meeting_id="test-cancel"), 0.2))
+    time.sleep(0.3)
+
+    assert engine.events < 10
+    limiter = get_limiter(f"agent:{agent_client.AGENTS['inmeet'].engine_id}")
+    assert limiter.in_flight == 0
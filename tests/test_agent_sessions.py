@@ -0,0 +1,86 @@
+import itertools
+import threading
+import time
+
+import agent_sessions
+from agent_sessions import SessionPool
+
+
+def counting_pool(**options):
+    ids = itertools.count()
+    return SessionPool(lambda agent_name, user_id: f"{agent_name}-{next(ids)}", **options)
+
+
+def test_sessions_are_reused_per_key():
+    pool = counting_pool()
+
+    with pool.checkout("chat", "u1", "m1") as first:
+        pass
+    with pool.checkout("chat", "u1", "m1") as second:
+        pass
+    with pool.checkout("chat", "u1", "m2") as other:
+        pass
+
+    assert second is first
+    assert other is not first
+
+
+def test_failed_exchange_discards_the_session():
+    deleted = []
+    pool = counting_pool(delete_session=lambda agent_name, session: deleted.append(session))
+
+    try:
+        with pool.checkout("chat", "u1") as failed:
+            raise RuntimeError("agent error")
+    except RuntimeError:
+        pass
+    with pool.checkout("chat", "u1") as session:
+        pass
+    pool._worker.shutdown(wait=True)
+
+    assert session is not failed
+    assert deleted == [failed]
+
+
+def test_turn_limit_retires_sessions_and_replaces_them():
+    deleted = []
+    pool = counting_pool(max_turns={"inmeet": 3},
+                         delete_session=lambda agent_name, session: deleted.append(session.session_id))
+
+    used = []
+    for _ in range(3):
+        with pool.checkout("inmeet", "u1", "m1") as session:
+            used.append(session)
+    deadline = time.monotonic() + 2
+    while not (deleted and pool._idle.get(("inmeet", "u1", "m1"))) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with pool.checkout("inmeet", "u1", "m1") as replacement:
+        pass
+
+    # Reused across exchanges until the limit, then deleted and replaced
+    assert used[1] is used[0] and used[2] is used[0]
+    assert deleted == [used[0].session_id]
+    assert replacement is not used[0]
+    assert replacement.turns == 1
+
+
+def test_replacements_share_the_pool_workers():
+    pool = counting_pool(max_turns={"inmeet": 1})
+    threads = threading.active_count()
+
+    for _ in range(50):
+        with pool.checkout("inmeet", "u1", "m1"):
+            pass
+    pool.warm("inmeet", "u1", "m1", count=20)
+
+    assert threading.active_count() - threads <= agent_sessions.SESSION_WORKERS
+
+
+def test_expired_sessions_are_pruned():
+    pool = counting_pool(ttl_s=0)
+    with pool.checkout("chat", "u1"):
+        pass
+
+    pool.prune()
+
+    assert pool._idle == {}
@@ -0,0 +1,96 @@
+import io
+import shutil
+import wave
+
+import numpy as np
+import pytest
+from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+
+from audio_buffer import AudioChunk, stream_fixed_chunks, stream_pcm
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    # Other modules point pydub at their own ffmpeg location on import; use the one on PATH
+    path = shutil.which("ffmpeg")
+    if path is None:
+        pytest.skip("ffmpeg is not installed")
+    monkeypatch.setattr(AudioSegment, "converter", path)
+
+
+def ramp(duration_ms, frame_rate=16000):
+    # Every sample differs from its neighbours, so misplaced boundaries show up
+    frames = frame_rate * duration_ms // 1000
+    return (np.arange(frames) % 20000 - 10000).astype(np.int16).reshape(-1, 1)
+
+
+def wav_bytes(samples, frame_rate=16000):
+    data = io.BytesIO()
+    with wave.open(data, "wb") as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(samples.tobytes())
+    return data.getvalue()
+
+
+def frames_of(samples, sizes_ms, start_ms=0):
+    frames, offset = [], 0
+    while offset < len(samples):
+        for size_ms in sizes_ms:
+            frame = samples[offset:offset + 16 * size_ms]
+            if len(frame):
+                frames.append(AudioChunk(frame, 16000, start_ms + offset // 16))
+            offset += 16 * size_ms
+    return frames
+
+
+def test_fixed_chunks_are_cut_at_chunk_boundaries_across_frames():
+    samples = ramp(1100)
+
+    chunks = list(stream_fixed_chunks(frames_of(samples, [70, 130]), 250))
+
+    assert [(chunk.start_ms, chunk.end_ms) for chunk in chunks] == \
+        [(0, 250), (250, 500), (500, 750), (750, 1000), (1000, 1100)]
+    for chunk in chunks:
+        np.testing.assert_array_equal(chunk.samples, samples[chunk.start_ms * 16:chunk.end_ms * 16])
+
+
+def test_fixed_chunks_are_timed_from_the_first_frame():
+    samples = ramp(500)
+
+    chunks = list(stream_fixed_chunks(frames_of(samples, [100], start_ms=2000), 200))
+
+    assert [(chunk.start_ms, chunk.end_ms) for chunk in chunks] == [(2000, 2200), (2200, 2400), (2400, 2500)]
+    np.testing.assert_array_equal(chunks[-1].samples, samples[6400:])
+
+
+def test_no_frames_give_no_chunks():
+    assert list(stream_fixed_chunks([], 250)) == []
+
+
+def test_stream_pcm_yields_consecutive_frames(ffmpeg):
+    samples = ramp(1050)
+
+    frames = list(stream_pcm(wav_bytes(samples), format="wav", frame_ms=100))
+
+    assert [frame.start_ms for frame in frames] == list(range(0, 1100, 100))
+    assert [len(frame.samples) for frame in frames] == [1600] * 10 + [800]
+    np.testing.assert_array_equal(np.concatenate([frame.samples for frame in frames]), samples)
+
+
+def test_stream_pcm_starts_at_an_offset(ffmpeg, tmp_path):
+    samples = ramp(1000)
+    path = tmp_path / "meeting.wav"
+    path.write_bytes(wav_bytes(samples))
+
+    frames = list(stream_pcm(str(path), frame_ms=200, start_ms=400))
+
+    assert [frame.start_ms for frame in frames] == [400, 600, 800]
+    np.testing.assert_array_equal(np.concatenate([frame.samples for frame in frames]), samples[6400:])
+
+
+def test_stream_pcm_reports_undecodable_input(ffmpeg):
+    with pytest.raises(CouldntDecodeError):
+        list(stream_pcm(b"not audio", format="wav"))
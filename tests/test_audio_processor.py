@@ -0,0 +1,43 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import audio_processor
+from agent_client import ERROR_PREFIX
+from audio_buffer import PcmBuffer
+from audio_processor import process_recording, read_checkpoint
+from conftest import tone
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch, fake_speech):
+    """A 5-chunk recording whose transcripts name their chunk, with a throwaway result cache."""
+    path = tmp_path / "meeting.wav"
+    path.write_bytes(b"meeting")
+    # Chunk i is a tone of amplitude 1000 * (i + 1), which the fake recognizer reports back
+    samples = np.concatenate([tone(1000, amplitude=1000 * (i + 1)).samples for i in range(5)])
+    monkeypatch.setattr(audio_processor, "decode_audio_shared", lambda source: PcmBuffer(samples, 16000))
+    monkeypatch.setattr(audio_processor, "get_result_cache", lambda: ResultCache(str(tmp_path / "cache")))
+    fake_speech._transcribe = lambda payload: \
+        f"chunk {round(int(np.frombuffer(payload.content, np.int16).max()), -3) // 1000 - 1}"
+    return {"id": "meeting", "path": str(path)}
+
+
+def test_a_resumed_run_retries_exactly_the_failed_chunks(recording, tmp_path, stub_agent):
+    output_dir = str(tmp_path / "out")
+    (tmp_path / "out").mkdir()
+    stub_agent.reply = lambda message: (f"{ERROR_PREFIX}: 503 Service Unavailable"
+                                        if message in ("chunk 1", "chunk 3") else "Tone: calm Sentiment: positive")
+
+    assert not asyncio.run(process_recording(recording, output_dir, 1000, 100))
+    checkpoint, = [p for p in (tmp_path / "out").iterdir() if p.suffix == ".jsonl"]
+    assert sorted(read_checkpoint(str(checkpoint))) == [0, 2, 4]
+
+    stub_agent.clear()
+    stub_agent.reply = "Tone: calm Sentiment: positive"
+    assert asyncio.run(process_recording(recording, output_dir, 1000, 100))
+
+    assert sorted(stub_agent) == ["chunk 1", "chunk 3"]
+    assert sorted(read_checkpoint(str(checkpoint))) == [0, 1, 2, 3, 4]
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from agent_client import ERROR_PREFIX
+from briefing_cache import BriefingCache
+
+
+class FlakyAgent:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def __call__(self, client_name):
+        self.calls.append(client_name)
+        return self.replies.pop(0)
+
+
+def test_briefings_are_cached():
+    agent = FlakyAgent(["briefing"])
+    cache = BriefingCache(agent)
+
+    assert cache.get("Alice") == "briefing"
+    assert cache.get("Alice") == "briefing"
+    assert cache.peek("Alice") == "briefing"
+    assert agent.calls == ["Alice"]
+
+
+def test_failed_prefetch_is_not_retried_until_its_backoff_expires():
+    agent = FlakyAgent([f"{ERROR_PREFIX}: 500", "briefing"])
+    cache = BriefingCache(agent, retry_s=60)
+
+    cache.prefetch(["Alice"])
+    cache._executor.shutdown(wait=True)
+    cache.prefetch(["Alice"])
+
+    assert agent.calls == ["Alice"]
+    assert cache.peek("Alice") is None
+
+
+def test_failed_prefetch_is_retried_after_its_backoff():
+    agent = FlakyAgent([f"{ERROR_PREFIX}: 500", "briefing"])
+    cache = BriefingCache(agent, retry_s=0)
+
+    assert cache.get("Alice").startswith(ERROR_PREFIX)
+    cache.prefetch(["Alice"])
+
+    assert cache.get("Alice") == "briefing"
+    assert len(agent.calls) == 2
+
+
+def test_stream_follows_a_prefetch_while_it_is_generated():
+    release = threading.Event()
+    calls = []
+
+    def agent(client_name):
+        calls.append(client_name)
+        yield "Portfolio "
+        release.wait(5)
+        yield "review"
+
+    cache = BriefingCache(agent)
+    cache.prefetch(["Alice"])
+    stream = cache.stream("Alice")
+
+    # The first delta arrives while the prefetch is still waiting to finish
+    assert next(stream) == "Portfolio "
+    assert cache.is_loading("Alice")
+    release.set()
+    assert list(stream) == ["review"]
+    assert cache.peek("Alice") == "Portfolio review"
+    assert calls == ["Alice"]
+
+
+def test_briefing_cut_off_mid_stream_is_not_cached():
+    def agent(client_name):
+        yield "Portfolio "
+        raise RuntimeError("connection reset")
+
+    cache = BriefingCache(agent)
+
+    received = []
+    with pytest.raises(RuntimeError, match="connection reset"):
+        for text in cache.stream("Alice"):
+            received.append(text)
+
+    assert received == ["Portfolio "]
+    assert cache.peek("Alice") is None
+    assert cache.get("Alice").startswith(ERROR_PREFIX)
+
+
+def test_earlier_days_are_dropped_when_a_load_starts():
+    cache = BriefingCache(FlakyAgent(["briefing"]))
+    cache._entries[("Alice", "2000-01-01")] = (0.0, "old briefing")
+    cache._failures[("Bob", "2000-01-01")] = (0.0, 1)
+
+    cache.get("Alice")
+
+    assert list(cache._entries) == [cache._key("Alice")]
+    assert cache._failures == {}
@@ -0,0 +1,46 @@
+from agent_client import ERROR_PREFIX
+from chunk_scheduler import MAX_CHUNK_ATTEMPTS, PlaybackScheduler
+from conftest import tone
+
+
+def open_chunks(start_ms, duration_ms=4000, chunk_ms=1000):
+    for position in range(start_ms, duration_ms, chunk_ms):
+        yield tone(chunk_ms, start_ms=position)
+
+
+def run(scheduler):
+    scheduler.start()._thread.join(timeout=10)
+    return scheduler
+
+
+def test_the_whole_recording_is_processed(fake_speech, stub_agent):
+    scheduler = run(PlaybackScheduler(open_chunks, 4000, stt_concurrency=2, agent_concurrency=2))
+
+    assert [result['start'] for result in scheduler.results()] == [0, 1000, 2000, 3000]
+    assert scheduler.complete
+
+
+def test_a_failed_chunk_is_handed_out_again(fake_speech, stub_agent):
+    calls = []
+
+    def reply(message):
+        calls.append(message)
+        return f"{ERROR_PREFIX}: 503 Service Unavailable" if len(calls) == 1 else "Tone: calm Sentiment: positive"
+
+    stub_agent.reply = reply
+    scheduler = run(PlaybackScheduler(open_chunks, 4000, stt_concurrency=1, agent_concurrency=1))
+
+    assert [result['start'] for result in scheduler.results()] == [0, 1000, 2000, 3000]
+    assert not any(result['feedback'].startswith(ERROR_PREFIX) for result in scheduler.results())
+    assert len(calls) == 5
+    assert scheduler.failed == 0 and scheduler.complete
+
+
+def test_chunks_that_keep_failing_leave_the_run_incomplete(fake_speech, stub_agent):
+    stub_agent.reply = f"{ERROR_PREFIX}: 500 Internal error"
+    scheduler = run(PlaybackScheduler(open_chunks, 4000, stt_concurrency=2, agent_concurrency=2))
+
+    assert scheduler.results() == []
+    assert len(stub_agent) == 4 * MAX_CHUNK_ATTEMPTS
+    assert scheduler.failed == 4
+    assert scheduler.done and not scheduler.complete
@@ -0,0 +1,107 @@
+import gc
+import io
+import multiprocessing
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import cpu_pool
+from audio_buffer import PcmBuffer
+from cpu_pool import SharedPcmBuffer, attach_chunk, decode_audio_shared
+
+
+def wav_bytes(samples, frame_rate=8000):
+    data = io.BytesIO()
+    with wave.open(data, "wb") as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(samples.tobytes())
+    return data.getvalue()
+
+
+@pytest.fixture
+def stereo():
+    return (np.arange(16000, dtype=np.int16) - 8000).reshape(-1, 2)
+
+
+@pytest.fixture(autouse=True)
+def fresh_attachments(monkeypatch):
+    # Mappings a test attaches must not outlive it in this process
+    monkeypatch.setattr(cpu_pool, "_attached", type(cpu_pool._attached)())
+
+
+def shared(stereo):
+    return SharedPcmBuffer(*cpu_pool._decode_to_shared(wav_bytes(stereo), "wav"))
+
+
+def test_decoded_audio_is_shared_through_shared_memory(stereo):
+    audio = shared(stereo)
+
+    assert not os.path.isabs(audio.name)
+    np.testing.assert_array_equal(audio.samples, stereo)
+    assert audio.frame_rate == 8000
+
+
+def test_chunks_are_rebuilt_from_their_shared_ref(stereo):
+    audio = shared(stereo)
+
+    chunk = audio.chunk(250, 500)
+    rebuilt = attach_chunk(chunk.shared_ref)
+
+    assert rebuilt.start_ms == 250 and rebuilt.frame_rate == 8000
+    np.testing.assert_array_equal(rebuilt.samples, stereo[2000:4000])
+
+
+def test_shared_memory_is_released_with_the_buffer(stereo):
+    audio = shared(stereo)
+    name = audio.name
+
+    del audio
+    gc.collect()
+
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_recordings_too_large_for_shm_are_memory_mapped(stereo, tmp_path, monkeypatch):
+    monkeypatch.setattr(cpu_pool, "SHM_MAX_FRACTION", 0)
+    monkeypatch.setattr(cpu_pool, "SHARED_AUDIO_DIR", str(tmp_path))
+
+    audio = shared(stereo)
+    path = audio.name
+
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.getsize(path) == stereo.nbytes
+    np.testing.assert_array_equal(audio.samples, stereo)
+    np.testing.assert_array_equal(attach_chunk(audio.chunk(0, 125).shared_ref).samples, stereo[:1000])
+
+    del audio
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_decode_audio_shared_decodes_in_the_pool(stereo, monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    monkeypatch.setattr(cpu_pool, "_pool", pool)
+    monkeypatch.setattr(cpu_pool, "CPU_WORKERS", 1)
+    try:
+        audio = decode_audio_shared(wav_bytes(stereo), "wav")
+    finally:
+        pool.shutdown()
+
+    assert isinstance(audio, SharedPcmBuffer)
+    np.testing.assert_array_equal(audio.samples, stereo)
+
+
+def test_decode_audio_shared_without_a_pool(stereo, monkeypatch):
+    monkeypatch.setattr(cpu_pool, "CPU_WORKERS", 0)
+
+    audio = decode_audio_shared(wav_bytes(stereo), "wav")
+
+    assert type(audio) is PcmBuffer
+    np.testing.assert_array_equal(audio.samples, stereo)
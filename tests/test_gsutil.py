@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timedelta
+
+import gsutil
+from gsutil import _LruCache, read_notification_history_from_gcs_new, read_object, read_schedule_from_gcs
+
+
+def test_lru_cache_is_bounded_by_size_and_count():
+    cache = _LruCache(max_entries=3, max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    cache.get("a")
+    cache.put("c", 3, 40)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    cache.put("huge", 4, 1000)
+    assert cache.get("huge") is None
+
+
+def test_lru_cache_entries_expire():
+    cache = _LruCache(expire_s=0.05)
+    cache.put("a", 1)
+    time.sleep(0.06)
+
+    assert cache.get("a") is None
+
+
+def test_unchanged_objects_are_revalidated_not_downloaded(memory_storage, monkeypatch):
+    memory_storage.write("bucket", "schedule.csv", b"client,age\nAlice,40\n")
+    monkeypatch.setattr(gsutil, "GCS_CACHE_TTL_S", 0)
+
+    assert read_schedule_from_gcs("bucket", "schedule.csv") == [{"client": "Alice", "age": 40}]
+    assert read_schedule_from_gcs("bucket", "schedule.csv") == [{"client": "Alice", "age": 40}]
+    # Parsed objects are not also kept as raw bytes
+    assert gsutil._object_cache.get(("bucket", "schedule.csv")) is None
+
+    memory_storage.write("bucket", "schedule.csv", b"client,age\nBob,50\n")
+    assert read_schedule_from_gcs("bucket", "schedule.csv") == [{"client": "Bob", "age": 50}]
+
+
+def test_read_object_returns_the_cached_copy_when_not_modified(memory_storage):
+    memory_storage.write("bucket", "day.csv", b"payload")
+
+    first = read_object("bucket", "day.csv")
+    second = read_object("bucket", "day.csv")
+
+    assert first == second == (1, b"payload")
+    assert read_object("bucket", "missing.csv") == (None, None)
+
+
+def test_notification_history_keeps_the_notification_type(memory_storage):
+    recent = (datetime.now() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    memory_storage.write("bucket", "notification_sent.csv",
+                         f"timestamp,client_name,message,notification_type\n"
+                         f"{recent},Alice,Hello,email\n".encode())
+
+    df = read_notification_history_from_gcs_new("bucket")
+
+    assert list(df.columns) == ['notification_sent_date', 'client_name', 'message_content',
+                                'notification_type']
+    assert df['notification_type'].tolist() == ['email']
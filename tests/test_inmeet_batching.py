@@ -0,0 +1,39 @@
+from inmeet_batching import MicroBatcher, build_batch_prompt, split_batch_response
+
+
+def test_batches_are_released_in_chunk_order():
+    batcher = MicroBatcher(window_ms=10_000, token_budget=1000)
+
+    assert batcher.add(1, (1000, 2000, "second")) == []
+    assert batcher.add(0, (0, 1000, "first")) == []
+    assert batcher.flush() == [[(0, 1000, "first"), (1000, 2000, "second")]]
+
+
+def test_window_closes_a_batch():
+    batcher = MicroBatcher(window_ms=3000, token_budget=1000)
+
+    batcher.add(0, (0, 2000, "a"))
+    completed = batcher.add(1, (2000, 4000, "b"))
+
+    assert completed == [[(0, 2000, "a")]]
+    assert batcher.flush() == [[(2000, 4000, "b")]]
+
+
+def test_failed_chunks_do_not_hold_up_the_batch():
+    batcher = MicroBatcher(window_ms=10_000, token_budget=1000)
+
+    batcher.add(0, (0, 1000, "a"))
+    batcher.add(1, None)
+    batcher.add(2, (2000, 3000, "c"))
+
+    assert batcher.flush() == [[(0, 1000, "a"), (2000, 3000, "c")]]
+
+
+def test_split_batch_response_maps_numbered_lines():
+    prompt = build_batch_prompt(["hello", "goodbye"])
+    response = "[1] Tone: warm Sentiment: positive Feedback: a\n[2] Tone: flat Sentiment: neutral Feedback: b"
+
+    assert "[2] goodbye" in prompt
+    assert split_batch_response(response, 2) == ["Tone: warm Sentiment: positive Feedback: a",
+                                                 "Tone: flat Sentiment: neutral Feedback: b"]
+    assert split_batch_response("unnumbered", 2) == ["unnumbered", "unnumbered"]
@@ -0,0 +1,72 @@
+from agent_client import ERROR_PREFIX
+from conftest import silence, tone
+from inmeet_pipeline import analyze_segments, build_result, extract_tone_sentiment, process_chunks
+
+
+def chunks(count, duration_ms=1000):
+    return [tone(duration_ms, start_ms=i * duration_ms) for i in range(count)]
+
+
+def test_every_chunk_is_transcribed_and_analyzed(fake_speech, stub_agent):
+    results = process_chunks(chunks(5), stt_concurrency=2, agent_concurrency=2)
+
+    assert [result['start'] for result in results] == [0, 1000, 2000, 3000, 4000]
+    assert len(fake_speech.requests) == 5
+    assert len(stub_agent) == 5
+    assert results[0]['transcript'] == "[1.0s of speech]"
+    assert (results[0]['tone'], results[0]['sentiment']) == ("calm", "positive")
+
+
+def test_agent_errors_are_reported_as_failures(fake_speech, stub_agent):
+    stub_agent.reply = lambda message: f"{ERROR_PREFIX}: 500 Internal error"
+    failed = []
+
+    results = process_chunks(chunks(3), on_failure=lambda start, end, error: failed.append((start, end)))
+
+    assert results == []
+    assert sorted(failed) == [(0, 1000), (1000, 2000), (2000, 3000)]
+
+
+def test_transcription_errors_are_reported_as_failures(fake_speech, stub_agent):
+    def recognize(payload):
+        if payload.duration_ms == 500:
+            raise RuntimeError("503 Service Unavailable")
+        return "words"
+
+    fake_speech._transcribe = recognize
+    failed = []
+    audio = chunks(2) + [silence(500, start_ms=2000)]
+
+    results = process_chunks(audio, on_failure=lambda start, end, error: failed.append(start))
+
+    assert [result['start'] for result in results] == [0, 1000]
+    assert failed == [2000]
+
+
+def test_batching_sends_one_request_per_batch(fake_speech, stub_agent):
+    stub_agent.reply = lambda message: "\n".join(
+        f"[{i}] Tone: calm Sentiment: neutral Feedback: segment {i}" for i in range(1, 4))
+
+    results = process_chunks(chunks(3), batching={"window_ms": 10_000})
+
+    assert len(stub_agent) == 1
+    assert [result['feedback'] for result in results] == [
+        f"Tone: calm Sentiment: neutral Feedback: segment {i}" for i in range(1, 4)]
+
+
+def test_build_result_extracts_tone_and_sentiment():
+    result = build_result(0, 1000, "hi", "Tone: upbeat Sentiment: positive Feedback: ok")
+
+    assert (result['tone'], result['sentiment']) == ("upbeat", "positive")
+    assert extract_tone_sentiment("no structure") == (None, None)
+
+
+def test_analyze_segments_runs_only_the_agent_stage(fake_speech, stub_agent):
+    segments = [(0, 2000, "hello there"), (2000, 4000, "how are you")]
+
+    results = analyze_segments(iter(segments))
+
+    assert fake_speech.requests == []
+    assert stub_agent == ["hello there", "how are you"]
+    assert [(result['start'], result['transcript']) for result in results] == [(0, "hello there"),
+                                                                               (2000, "how are you")]
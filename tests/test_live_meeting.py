@@ -0,0 +1,66 @@
+import time
+
+from agent_client import ERROR_PREFIX
+from conftest import silence, tone
+from live_meeting import LiveMeeting
+
+
+def live_frames(pattern, frame_ms=100):
+    """Frames of (tone or silence, duration_ms) segments, stamped as captured right now."""
+    position = 0
+    for make, duration_ms in pattern:
+        for _ in range(duration_ms // frame_ms):
+            frame = make(frame_ms, start_ms=position)
+            frame.captured_at = time.monotonic()
+            position += frame_ms
+            yield frame
+
+
+SPEECH = [(tone, 1000), (silence, 600)] * 3
+
+
+def run(meeting, timeout_s=10):
+    meeting.start()
+    started = time.monotonic()
+    while not meeting.done and time.monotonic() - started < timeout_s:
+        time.sleep(0.02)
+    return meeting
+
+
+def test_feedback_is_published_for_each_speech_chunk(fake_speech, stub_agent):
+    meeting = run(LiveMeeting(live_frames(SPEECH), latency_budget_ms=5000))
+
+    results = meeting.results()
+    assert meeting.done and meeting.error is None
+    assert len(results) == 3
+    assert all(result['tone'] == "calm" and not result['failed'] for result in results)
+    assert (meeting.late, meeting.failed) == (0, 0)
+
+
+def test_agent_errors_are_not_published_as_feedback(fake_speech, stub_agent):
+    stub_agent.reply = f"{ERROR_PREFIX}: 500 Internal error"
+
+    meeting = run(LiveMeeting(live_frames(SPEECH), latency_budget_ms=5000))
+
+    results = meeting.results()
+    assert len(results) == 3
+    assert all(result['feedback'] == "" and result['failed'] for result in results)
+    assert all(result['transcript'] for result in results)
+    assert (meeting.failed, meeting.late) == (3, 0)
+
+
+def test_stop_ends_an_endless_source(fake_speech, stub_agent):
+    def endless():
+        position = 0
+        while True:
+            time.sleep(0.01)
+            frame = silence(100, start_ms=position)
+            frame.captured_at = time.monotonic()
+            position += 100
+            yield frame
+
+    meeting = LiveMeeting(endless()).start()
+    time.sleep(0.2)
+    meeting.stop()
+
+    assert run(meeting, timeout_s=2).done
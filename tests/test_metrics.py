@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from metrics import Histogram, MetricsRegistry
+
+
+def stage(registry, name):
+    return next(stage for stage in registry.snapshot()["stages"] if stage["name"] == name)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    # An observation equal to a bound falls in that bound's bucket, as in Prometheus
+    assert snapshot["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert snapshot["count"] == 4 and snapshot["max"] == 2.0
+    assert snapshot["sum"] == pytest.approx(2.65)
+    assert snapshot["p50"] == pytest.approx(0.3)
+
+
+def test_observations_are_kept_per_stage_and_labels():
+    registry = MetricsRegistry(enabled=True)
+    registry.observe("stt.rpc", 0.2, backend="google")
+    registry.observe("stt.rpc", 0.4, backend="google")
+    registry.observe("stt.rpc", 1.0, backend="fake")
+
+    stages = registry.snapshot()["stages"]
+
+    assert [(stage["labels"], stage["count"]) for stage in stages] == \
+        [({"backend": "fake"}, 1), ({"backend": "google"}, 2)]
+
+
+def test_nested_spans_record_their_parent():
+    registry = MetricsRegistry(enabled=True)
+
+    with registry.span("chunk", index=1):
+        with registry.span("stt.rpc"):
+            pass
+
+    inner, outer = registry.snapshot()["recent_spans"]
+    assert (inner["name"], inner["parent"]) == ("stt.rpc", "chunk")
+    assert (outer["name"], outer["parent"]) == ("chunk", None)
+    assert outer["duration_s"] >= inner["duration_s"]
+
+
+def test_failed_span_is_timed_counted_and_reraised():
+    registry = MetricsRegistry(enabled=True)
+
+    with pytest.raises(ValueError):
+        with registry.span("agent.query", agent="inmeet"):
+            raise ValueError("bad reply")
+
+    snapshot = registry.snapshot()
+    assert snapshot["recent_spans"][0]["error"] == "ValueError"
+    assert snapshot["counters"] == [{"name": "agent.query.errors", "labels": {"agent": "inmeet"}, "value": 1}]
+    assert stage(registry, "agent.query")["count"] == 1
+
+
+def test_timed_wraps_async_functions():
+    registry = MetricsRegistry(enabled=True)
+
+    @registry.timed("agent.query")
+    async def query():
+        with registry.span("agent.session"):
+            await asyncio.sleep(0)
+        return "reply"
+
+    assert asyncio.run(query()) == "reply"
+    assert [(span["name"], span["parent"]) for span in registry.snapshot()["recent_spans"]] == \
+        [("agent.session", "agent.query"), ("agent.query", None)]
+
+
+def test_prometheus_output():
+    registry = MetricsRegistry(enabled=True)
+    registry.observe("stt.rpc", 0.2, backend='say "hi"')
+    registry.increment("stt.rpc.errors", backend="google")
+
+    lines = registry.to_prometheus().splitlines()
+
+    assert "# TYPE uidigiexpert_stage_duration_seconds histogram" in lines
+    assert 'uidigiexpert_stage_duration_seconds_bucket{stage="stt.rpc",backend="say \\"hi\\"",le="0.1"} 0' in lines
+    assert 'uidigiexpert_stage_duration_seconds_bucket{stage="stt.rpc",backend="say \\"hi\\"",le="0.25"} 1' in lines
+    assert 'uidigiexpert_stage_duration_seconds_bucket{stage="stt.rpc",backend="say \\"hi\\"",le="+Inf"} 1' in lines
+    assert 'uidigiexpert_stage_duration_seconds_sum{stage="stt.rpc",backend="say \\"hi\\""} 0.200000' in lines
+    assert 'uidigiexpert_stage_duration_seconds_count{stage="stt.rpc",backend="say \\"hi\\""} 1' in lines
+    assert 'uidigiexpert_events_total{event="stt.rpc.errors",backend="google"} 1' in lines
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+
+    with registry.span("stt.rpc"):
+        registry.increment("stt.rpc.errors")
+
+    assert registry.snapshot() == {"stages": [], "counters": [], "recent_spans": []}
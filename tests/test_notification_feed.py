@@ -0,0 +1,37 @@
+import pandas as pd
+
+from notification_feed import NotificationFeed
+
+
+def make_feed(with_types=True):
+    df = pd.DataFrame({
+        'notification_sent_date': pd.to_datetime(["2024-05-03 10:00", "2024-05-02 09:30", "2024-05-01 08:15"]),
+        'client_name': ["Alice", "Bob", "Alice"],
+        'message_content': ["m1", "m2", "m3"],
+    })
+    if with_types:
+        df['notification_type'] = ["email", "sms", None]
+    return NotificationFeed(df)
+
+
+def test_select_filters_by_client_and_type():
+    feed = make_feed()
+
+    assert feed.client_names == ["Alice", "Bob"]
+    assert feed.notification_types == ["N/A", "email", "sms"]
+    assert list(feed.select("Alice")) == [0, 2]
+    assert list(feed.select("Alice", "email")) == [0]
+    assert list(feed.select("Carol")) == []
+
+
+def test_page_returns_display_rows():
+    feed = make_feed()
+
+    rows = feed.page(feed.select(), page=2, page_size=2)
+
+    assert rows == [{'date': "2024-05-01 08:15", 'client_name': "Alice",
+                     'message_content': "m3", 'notification_type': "N/A"}]
+
+
+def test_missing_type_column():
+    assert make_feed(with_types=False).notification_types == ["N/A"]
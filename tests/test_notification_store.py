@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import notification_store  # noqa: E402
+from notification_store import convert_csv_to_parquet, read_notifications  # noqa: E402
+
+
+@pytest.fixture
+def parquet_store(memory_storage, monkeypatch):
+    monkeypatch.setattr(notification_store, "ROW_GROUP_SIZE", 100)
+    timestamps = pd.date_range("2024-05-01", "2024-05-08", freq="7min")
+    df = pd.DataFrame({'timestamp': timestamps,
+                       'client_name': [f"client {i % 5}" for i in range(len(timestamps))],
+                       'message': [f"message {i}" for i in range(len(timestamps))]})
+    memory_storage.write("bucket", "notification_sent.csv", df.to_csv(index=False).encode())
+    convert_csv_to_parquet("bucket")
+
+    ranges = []
+    read_range = memory_storage.read_range
+
+    def counting_read_range(bucket_name, name, start, end=None):
+        data = read_range(bucket_name, name, start, end)
+        ranges.append((name, len(data)))
+        return data
+
+    def no_whole_reads(*args, **kwargs):
+        raise AssertionError("partitions must be read by range")
+
+    monkeypatch.setattr(memory_storage, "read_range", counting_read_range)
+    monkeypatch.setattr(memory_storage, "read", no_whole_reads)
+    return df, ranges
+
+
+def test_reads_exactly_the_rows_in_range(parquet_store):
+    df, _ = parquet_store
+    start, end = datetime(2024, 5, 3, 12), datetime(2024, 5, 5, 6)
+
+    result = read_notifications("bucket", start, end)
+
+    expected = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+    assert len(result) == len(expected)
+    assert result['timestamp'].is_monotonic_decreasing
+    assert list(result.columns) == ['timestamp', 'client_name', 'message']
+
+
+def test_only_overlapping_row_groups_are_downloaded(parquet_store, memory_storage):
+    df, ranges = parquet_store
+    name = "notifications/date=2024-05-03/part-0.parquet"
+    size = next(info.size for info in memory_storage.list("bucket", name))
+    start, end = datetime(2024, 5, 3, 10), datetime(2024, 5, 3, 11)
+
+    narrow = read_notifications("bucket", start, end, columns=['timestamp', 'client_name'])
+
+    assert len(narrow) == ((df['timestamp'] >= start) & (df['timestamp'] <= end)).sum()
+    assert list(narrow.columns) == ['timestamp', 'client_name']
+    # Footer plus one ranged read of the matching row groups, well short of the file
+    assert [n for n, _ in ranges] == [name, name]
+    assert ranges[1][1] < size / 2
+
+
+def test_missing_days_are_skipped(parquet_store):
+    result = read_notifications("bucket", datetime(2024, 4, 20), datetime(2024, 5, 1, 1))
+
+    assert len(result) == 9
@@ -0,0 +1,70 @@
+import os
+
+from result_cache import ResultCache, audio_digest, cache_key
+
+
+def age(cache, key, mtime):
+    # Pin modification times so the eviction order does not depend on clock resolution
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def test_key_depends_on_audio_and_chunking_parameters(tmp_path):
+    path = tmp_path / "meeting.wav"
+    path.write_bytes(b"RIFF meeting")
+    digest = audio_digest(str(path))
+
+    assert digest == audio_digest(b"RIFF meeting")
+    key = cache_key(digest, chunking="vad", min_chunk_ms=1000)
+    assert key == cache_key(digest, min_chunk_ms=1000, chunking="vad")
+    assert key != cache_key(digest, chunking="vad", min_chunk_ms=2000)
+    assert key != cache_key(digest, chunking="fixed", min_chunk_ms=1000)
+    assert key != cache_key(audio_digest(b"RIFF other meeting"), chunking="vad", min_chunk_ms=1000)
+
+
+def test_results_round_trip_one_file_per_key(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache_key(audio_digest(b"audio"), chunking="vad")
+
+    cache.put(key, [{"start_ms": 0, "feedback": "ok"}])
+
+    assert cache.get(key) == [{"start_ms": 0, "feedback": "ok"}]
+    assert os.listdir(tmp_path) == [f"{key}.json"]
+
+
+def test_least_recently_read_entry_is_evicted_first(tmp_path):
+    cache = ResultCache(str(tmp_path), max_entries=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    age(cache, "a", 1000)
+    age(cache, "b", 2000)
+
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == [1]
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
+
+
+def test_entries_are_evicted_to_fit_max_bytes(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=150)
+    cache.put("old", ["x" * 60])
+    age(cache, "old", 1000)
+    cache.put("new", ["y" * 60])
+    age(cache, "new", 2000)
+    cache.put("newest", ["z" * 60])
+
+    assert cache.get("old") is None
+    assert cache.get("new") is not None and cache.get("newest") is not None
+
+
+def test_missing_and_corrupt_entries_are_misses(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    (tmp_path / "corrupt.json").write_text('[{"start_ms": 0, "feedb')
+
+    assert cache.get("missing") is None
+    assert cache.get("corrupt") is None
+
+    # A corrupt entry is simply replaced by the next put
+    cache.put("corrupt", [1])
+    assert cache.get("corrupt") == [1]
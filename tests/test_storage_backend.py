@@ -0,0 +1,39 @@
+import pytest
+
+from storage_backend import LocalStorageBackend, MemoryStorageBackend, NotModified
+
+
+@pytest.fixture(params=["memory", "local"])
+def backend(request, tmp_path):
+    return MemoryStorageBackend() if request.param == "memory" else LocalStorageBackend(str(tmp_path))
+
+
+def test_read_and_conditional_read(backend):
+    backend.write("bucket", "dir/object.bin", b"0123456789")
+
+    generation, data = backend.read("bucket", "dir/object.bin")
+
+    assert data == b"0123456789"
+    with pytest.raises(NotModified):
+        backend.read("bucket", "dir/object.bin", if_generation_not_match=generation)
+    assert backend.read("bucket", "missing.bin") == (None, None)
+
+
+def test_read_range(backend):
+    backend.write("bucket", "dir/object.bin", b"0123456789")
+
+    assert backend.read_range("bucket", "dir/object.bin", 2, 5) == b"234"
+    assert backend.read_range("bucket", "dir/object.bin", 7) == b"789"
+    assert backend.read_range("bucket", "dir/object.bin", 8, 100) == b"89"
+    assert backend.read_range("bucket", "missing.bin", 0, 4) is None
+
+
+def test_list_by_prefix(backend):
+    for name in ("a/date=2024-05-01/part-0.parquet", "a/date=2024-05-02/part-0.parquet", "b/other.csv"):
+        backend.write("bucket", name, b"x" * 3)
+
+    infos = backend.list("bucket", "a/date=2024-05-0")
+
+    assert [info.name for info in infos] == ["a/date=2024-05-01/part-0.parquet",
+                                             "a/date=2024-05-02/part-0.parquet"]
+    assert all(info.size == 3 for info in infos)
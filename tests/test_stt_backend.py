@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from conftest import tone
+from stt_backend import (FakeSpeechBackend, StreamResampler, TARGET_SAMPLE_RATE, payload_encoding,
+                         prepare_payload, resample, stream_transcribe, transcribe)
+
+
+@pytest.mark.parametrize("source_rate", [8000, 22050, 32000, 44100, 48000])
+def test_stream_resampler_blocks_match_whole_signal(source_rate):
+    rng = np.random.default_rng(0)
+    signal = rng.standard_normal(source_rate * 2).astype(np.float32)
+    whole = resample(signal, source_rate)
+
+    resampler, parts, position = StreamResampler(source_rate), [], 0
+    while position < len(signal):
+        size = int(rng.integers(1, 3000))
+        parts.append(resampler.process(signal[position:position + size],
+                                       final=position + size >= len(signal)))
+        position += size
+
+    assert len(whole) == -(-len(signal) * TARGET_SAMPLE_RATE // source_rate)
+    np.testing.assert_allclose(np.concatenate(parts), whole, atol=1e-5)
+
+
+def test_resample_keeps_passband_and_removes_aliases():
+    t = np.arange(44100) / 44100
+    passband = resample(np.sin(2 * np.pi * 1000 * t).astype(np.float32), 44100)
+    expected = np.sin(2 * np.pi * 1000 * np.arange(len(passband)) / TARGET_SAMPLE_RATE)
+    assert np.abs(passband[200:-200] - expected[200:-200]).max() < 0.01
+
+    # 10 kHz is above the 8 kHz Nyquist rate of the output and must not fold back
+    aliased = resample(np.sin(2 * np.pi * 10000 * t).astype(np.float32), 44100)
+    assert np.sqrt(np.mean(aliased ** 2)) < 0.01
+
+
+def test_prepare_payload_downmixes_and_resamples():
+    chunk = tone(1000, frame_rate=48000)
+    chunk.samples = np.repeat(chunk.samples, 2, axis=1)
+
+    payload = prepare_payload(chunk, "LINEAR16")
+
+    assert payload.encoding == "LINEAR16"
+    assert payload.sample_rate_hertz == TARGET_SAMPLE_RATE
+    assert payload.duration_ms == 1000
+    assert len(payload.content) == 2 * TARGET_SAMPLE_RATE
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        payload_encoding("MP3")
+
+
+@pytest.mark.parametrize("encoding", ["FLAC", "OGG_OPUS"])
+def test_compressed_encodings_are_encoded_in_process(encoding):
+    payload = prepare_payload(tone(1000), encoding)
+
+    assert payload.encoding == encoding
+    assert 0 < len(payload.content) < 2 * TARGET_SAMPLE_RATE
+
+
+def test_fake_backend_records_requests(fake_speech):
+    assert transcribe(tone(1500)) == "[1.5s of speech]"
+    assert [payload.duration_ms for payload in fake_speech.requests] == [1500]
+
+
+def test_fake_backend_streaming_emits_final_results():
+    backend = FakeSpeechBackend()
+    frames = [bytes(2 * TARGET_SAMPLE_RATE // 10)] * 45
+
+    events = [event for event in backend.streaming_recognize(frames) if event.is_final]
+
+    assert [(event.start_ms, event.end_ms) for event in events] == [(0, 2000), (2000, 4000), (4000, 4500)]
+
+
+def test_stream_transcribe_resamples_frames_as_one_signal(fake_speech):
+    received = []
+    fake_speech.streaming_recognize = lambda frames, *args: received.extend(frames) or iter(())
+    frames = [tone(100, frame_rate=44100, start_ms=i * 100) for i in range(30)]
+
+    list(stream_transcribe(frames, realtime=False))
+
+    whole = resample(np.concatenate([frame.samples[:, 0] for frame in frames]).astype(np.float32), 44100)
+    sent = np.frombuffer(b"".join(received), dtype=np.int16)
+    np.testing.assert_allclose(sent, np.clip(whole, -32768, 32767).astype(np.int16), atol=1)
+
+
+def test_stream_transcribe_paces_frames_in_real_time(fake_speech):
+    started = time.monotonic()
+
+    events = list(stream_transcribe([tone(100, start_ms=i * 100) for i in range(10)]))
+
+    assert time.monotonic() - started >= 0.85
+    assert events[-1].is_final and events[-1].end_ms == 1000
+
+
+def test_chunks_in_wire_format_are_not_sent_to_the_pool(monkeypatch):
+    import stt_backend
+
+    monkeypatch.setattr(stt_backend, "get_cpu_pool", lambda: object())
+    pooled = []
+
+    async def run_in_pool(fn, *args):
+        pooled.append(fn)
+        return fn(*args)
+
+    monkeypatch.setattr(stt_backend, "run_in_pool", run_in_pool)
+
+    wire = asyncio.run(stt_backend.aprepare_payload(tone(500), "LINEAR16"))
+    resampled = asyncio.run(stt_backend.aprepare_payload(tone(500, frame_rate=44100), "LINEAR16"))
+
+    assert wire.content == tone(500).samples.tobytes()
+    assert resampled.sample_rate_hertz == TARGET_SAMPLE_RATE
+    assert pooled == [stt_backend.prepare_payload]
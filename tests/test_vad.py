@@ -0,0 +1,69 @@
+import numpy as np
+
+from audio_buffer import AudioChunk, PcmBuffer
+from conftest import silence, tone
+from vad import VadChunker, plan_chunks, stream_speech_chunks
+
+
+def speech_with_pauses():
+    # 1 s silence, 2 s speech, 1.5 s silence, 1.5 s speech, 1 s silence
+    parts = [silence(1000), tone(2000), silence(1500), tone(1500, frequency=300), silence(1000)]
+    return PcmBuffer(np.concatenate([part.samples for part in parts]), 16000)
+
+
+def frames_of(audio, frame_ms):
+    return (AudioChunk(audio.samples[start:start + 16 * frame_ms], 16000, start // 16)
+            for start in range(0, len(audio.samples), 16 * frame_ms))
+
+
+def test_plan_chunks_skips_silence():
+    spans = plan_chunks(speech_with_pauses())
+
+    assert len(spans) == 2
+    (first_start, first_end), (second_start, second_end) = spans
+    assert 800 <= first_start <= 1000 and 3000 <= first_end <= 3200
+    assert 4300 <= second_start <= 4500 and 6000 <= second_end <= 6200
+
+
+def test_silence_gives_no_chunks():
+    assert plan_chunks(PcmBuffer(silence(5000).samples, 16000)) == []
+
+
+def test_long_speech_is_cut_at_max_chunk_ms():
+    spans = plan_chunks(PcmBuffer(tone(10000).samples, 16000), max_chunk_ms=4000)
+
+    assert len(spans) >= 3
+    assert all(end - start <= 4000 for start, end in spans)
+
+
+def test_feeding_in_blocks_matches_whole_buffer():
+    audio = speech_with_pauses()
+    chunker = VadChunker(16000)
+    spans = []
+    for start in range(0, len(audio.samples), 777):
+        spans += chunker.feed(audio.samples[start:start + 777])
+
+    assert spans + chunker.flush() == plan_chunks(audio)
+
+
+def test_stream_speech_chunks_matches_plan_chunks():
+    audio = speech_with_pauses()
+
+    chunks = list(stream_speech_chunks(frames_of(audio, 100)))
+
+    assert [(chunk.start_ms, chunk.end_ms) for chunk in chunks] == plan_chunks(audio)
+    first = chunks[0]
+    np.testing.assert_array_equal(first.samples, audio.chunk(first.start_ms, first.end_ms).samples)
+
+
+def test_chunk_after_a_short_pause_keeps_its_lead_in():
+    # Speech from the very start, then a pause just long enough to end the first chunk,
+    # so the second one starts before the history has refilled with silent frames
+    parts = [tone(1500), silence(330), tone(1500, frequency=300)]
+    audio = PcmBuffer(np.concatenate([part.samples for part in parts]), 16000)
+
+    (first_start, first_end), (second_start, _) = plan_chunks(audio, pad_ms=150)
+
+    assert (first_start, first_end) == (0, 1650)
+    # Speech resumes at 1830 ms; the chunk is cut pad_ms before that, inside the pause
+    assert second_start == 1830 - 150
@@ -0,0 +1,64 @@
+import numpy as np
+
+from audio_buffer import AudioChunk, PcmBuffer
+from waveform import MAX_DISPLAY_PEAKS, MIN_DISPLAY_PEAKS, PeakPyramid
+
+
+def noise(frames, channels=1, seed=0):
+    samples = np.random.default_rng(seed).integers(-20000, 20000, (frames, channels))
+    return PcmBuffer(samples.astype(np.int16), 16000)
+
+
+def test_finest_level_holds_block_peaks_over_all_channels():
+    samples = np.array([[1, 0], [-2, 4], [3, 0], [0, -1], [5, 5], [-7, 1], [9, 2]], dtype=np.int16)
+
+    pyramid = PeakPyramid(PcmBuffer(samples, 8000), base_block=2)
+
+    # Blocks of two frames; the partial last block gets a peak of its own
+    np.testing.assert_array_equal(pyramid.levels[0], [[-2, 4], [-1, 3], [-7, 5], [2, 9]])
+    assert pyramid.scale == 9.0
+
+
+def test_each_level_halves_the_previous_one():
+    pyramid = PeakPyramid(noise(1001 * 16), base_block=16)
+
+    assert [len(level) for level in pyramid.levels] == [1001, 501, 251]
+    finer, coarser = pyramid.levels[0], pyramid.levels[1]
+    np.testing.assert_array_equal(coarser[:500, 0], np.minimum(finer[0:1000:2, 0], finer[1:1000:2, 0]))
+    np.testing.assert_array_equal(coarser[:500, 1], np.maximum(finer[0:1000:2, 1], finer[1:1000:2, 1]))
+    # The odd peak out is carried into the last pair on its own
+    np.testing.assert_array_equal(coarser[-1], finer[-1])
+
+
+def test_display_levels_are_bounded_and_normalized():
+    pyramid = PeakPyramid(noise(40000 * 4), base_block=4)
+
+    levels = pyramid.display_levels()
+
+    sizes = [len(level) for level in levels]
+    assert sizes == sorted(sizes)
+    assert len(levels[0]) <= MIN_DISPLAY_PEAKS and len(levels[-1]) <= MAX_DISPLAY_PEAKS
+    # The finest level is left out; it is too wide for any display
+    assert len(levels[-1]) * 2 > MAX_DISPLAY_PEAKS and len(levels) < len(pyramid.levels)
+    peaks = np.array(levels[-1])
+    assert peaks.min() >= -1 and peaks.max() <= 1 and max(-peaks.min(), peaks.max()) == 1
+
+
+def test_short_recording_is_still_displayed():
+    pyramid = PeakPyramid(noise(100), base_block=256)
+
+    assert [len(level) for level in pyramid.display_levels()] == [1]
+
+
+def test_from_frames_matches_the_whole_buffer():
+    audio = noise(50000, channels=2)
+    frames = [AudioChunk(audio.samples[start:start + 3001], 16000, start // 16)
+              for start in range(0, len(audio.samples), 3001)]
+
+    whole = PeakPyramid(audio, base_block=64)
+    streamed = PeakPyramid.from_frames(frames, base_block=64)
+
+    assert streamed.duration_ms == whole.duration_ms
+    assert streamed.scale == whole.scale
+    for streamed_level, whole_level in zip(streamed.levels, whole.levels, strict=True):
+        np.testing.assert_array_equal(streamed_level, whole_level)
@@ -0,0 +1,216 @@
+from collections import deque
+
+import numpy as np
+
+from audio_buffer import StreamWindow
+from metrics import span
+
+# Planner defaults, tuned for two-party advisor calls
+DEFAULT_MIN_CHUNK_MS = 1000
+DEFAULT_MAX_CHUNK_MS = 4000
+
+
+class VadChunker:
+    """
+    Incremental energy-based voice activity detector that turns PCM samples into
+    chunk boundaries.
+
+    Samples are scored in short frames against an energy threshold. Silent spans are
+    dropped, utterances shorter than ``min_chunk_ms`` are merged with the next one when
+    the pause between them is short, and boundaries are placed in pauses. Speech running
+    longer than ``max_chunk_ms`` is cut at the quietest frame past ``min_chunk_ms``.
+
+    Samples can be fed in blocks of any size, so the same chunker serves whole decoded
+    buffers and streamed audio.
+
+    Args:
+        frame_rate (int): Sample rate of the audio in Hz.
+        min_chunk_ms (int): Preferred minimum amount of speech per chunk.
+        max_chunk_ms (int): Hard upper bound on chunk length.
+        min_silence_ms (int): Pause length that may end a chunk.
+        max_gap_ms (int): Pause length that always ends a chunk, however short it is.
+        threshold_db (float): Minimum frame energy (dBFS) treated as speech.
+        margin_db (float): Speech must also be this far above the tracked noise floor.
+        frame_ms (int): Analysis frame length.
+        pad_ms (int): Silence kept around speech so word onsets/endings are not clipped.
+        min_speech_ms (int): Chunks with less voiced audio than this are discarded as noise.
+    """
+
+    def __init__(self, frame_rate: int, min_chunk_ms: int = DEFAULT_MIN_CHUNK_MS,
+                 max_chunk_ms: int = DEFAULT_MAX_CHUNK_MS, min_silence_ms: int = 300,
+                 max_gap_ms: int = 1000, threshold_db: float = -45.0, margin_db: float = 10.0,
+                 frame_ms: int = 30, pad_ms: int = 150, min_speech_ms: int = 120):
+        self.frame_rate = frame_rate
+        self.frame_len = max(1, frame_rate * frame_ms // 1000)
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+
+        to_frames = lambda ms: max(1, int(round(ms * frame_rate / 1000 / self.frame_len)))
+        self.min_chunk_frames = to_frames(min_chunk_ms)
+        self.max_chunk_frames = max(to_frames(max_chunk_ms), 2)
+        self.min_silence_frames = to_frames(min_silence_ms)
+        self.max_gap_frames = to_frames(max_gap_ms)
+        self.pad_frames = int(round(pad_ms * frame_rate / 1000 / self.frame_len))
+        self.min_speech_frames = to_frames(min_speech_ms)
+
+        self._pending = np.empty(0, dtype=np.float32)
+        self._frame_index = 0
+        self._noise_floor_db = -90.0
+        self._history = deque(maxlen=self.pad_frames or 1)
+        self._last_end = 0
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self._seg_start = None
+        self._energies = []
+        self._flags = []
+        self._speech_frames = 0
+        self._silence_run = 0
+
+    def _to_ms(self, frame: int) -> int:
+        return int(round(frame * self.frame_len * 1000 / self.frame_rate))
+
+    def _frame_energies(self, mono: np.ndarray) -> np.ndarray:
+        frames = mono.reshape(-1, self.frame_len)
+        rms = np.sqrt(np.mean(np.square(frames), axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-9) / 32768.0)
+
+    def _is_speech(self, energy_db: float) -> bool:
+        speech = energy_db > max(self.threshold_db, self._noise_floor_db + self.margin_db)
+        # The floor follows quiet frames immediately and loud frames only slowly
+        if energy_db < self._noise_floor_db:
+            self._noise_floor_db = energy_db
+        else:
+            self._noise_floor_db += 0.002 * (energy_db - self._noise_floor_db)
+        return speech
+
+    def _close(self, end: int, spans: list):
+        if self._speech_frames >= self.min_speech_frames:
+            spans.append((self._to_ms(self._seg_start), self._to_ms(end)))
+        self._last_end = end
+        self._reset_segment()
+
+    def _step(self, energy_db: float, spans: list):
+        i = self._frame_index
+        self._frame_index += 1
+        speech = self._is_speech(energy_db)
+
+        if self._seg_start is None:
+            if speech:
+                self._seg_start = max(i - len(self._history), self._last_end)
+                lead = i - self._seg_start
+                self._energies = (list(self._history)[-lead:] if lead else []) + [energy_db]
+                self._flags = [False] * lead + [True]
+                self._speech_frames = 1
+            self._history.append(energy_db)
+            return
+
+        self._energies.append(energy_db)
+        self._flags.append(speech)
+        if speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        length = i + 1 - self._seg_start
+        voiced_len = length - self._silence_run
+        if not speech and (self._silence_run >= self.max_gap_frames or
+                           (self._silence_run >= self.min_silence_frames and
+                            voiced_len >= self.min_chunk_frames)):
+            # The pause that ended this chunk is the lead-in of the next one; take it
+            # before _close() resets the segment
+            trailing = self._energies[len(self._energies) - self._silence_run:]
+            self._close(self._seg_start + voiced_len + min(self.pad_frames, self._silence_run), spans)
+            self._history.clear()
+            self._history.extend(trailing)
+        elif length >= self.max_chunk_frames:
+            # Cut at the quietest frame between the minimum and maximum chunk length,
+            # preferring the latest one so unbroken speech yields full-length chunks
+            lower = min(self.min_chunk_frames, length - 1)
+            window = self._energies[lower:]
+            cut = lower + len(window) - 1 - int(np.argmin(window[::-1]))
+            carry, carry_flags = self._energies[cut:], self._flags[cut:]
+            self._close(self._seg_start + cut, spans)
+            self._seg_start = i + 1 - len(carry)
+            self._energies, self._flags = carry, carry_flags
+            self._speech_frames = sum(carry_flags)
+            self._silence_run = len(carry_flags) - 1 - max(
+                (k for k, flag in enumerate(carry_flags) if flag), default=-1)
+
+    def feed(self, samples: np.ndarray) -> list:
+        """
+        Consumes a block of int16 samples of shape (frames, channels) or (frames,).
+
+        Returns:
+            list: (start_ms, end_ms) spans completed by this block.
+        """
+        spans = []
+        # Work through large buffers in blocks so the float copy stays small
+        block = self.frame_len * 2000
+        for offset in range(0, len(samples), block):
+            part = samples[offset:offset + block]
+            mono = part.mean(axis=1, dtype=np.float32) if part.ndim == 2 else part
+            mono = np.concatenate([self._pending, mono.astype(np.float32, copy=False)])
+            whole = len(mono) - len(mono) % self.frame_len
+            self._pending = mono[whole:]
+            for energy_db in self._frame_energies(mono[:whole]):
+                self._step(float(energy_db), spans)
+        return spans
+
+    def retained_ms(self) -> int:
+        """Earliest offset a span not returned yet can start at; older audio is no longer needed."""
+        if self._seg_start is not None:
+            return self._to_ms(self._seg_start)
+        return self._to_ms(max(self._frame_index - len(self._history), self._last_end))
+
+    def flush(self) -> list:
+        """Closes any open chunk at the end of the audio and returns its span."""
+        spans = []
+        if self._seg_start is not None:
+            voiced_end = self._frame_index - self._silence_run
+            self._close(voiced_end + min(self.pad_frames, self._silence_run), spans)
+        return spans
+
+
+def plan_chunks(audio, **params) -> list:
+    """
+    Plans speech chunks for a fully decoded recording.
+
+    Args:
+        audio (PcmBuffer): The decoded recording.
+        **params: Planner settings forwarded to VadChunker (min_chunk_ms, max_chunk_ms, ...).
+
+    Returns:
+        list: (start_ms, end_ms) tuples in chronological order, silence excluded.
+    """
+    with span("vad.plan", mode="whole"):
+        chunker = VadChunker(audio.frame_rate, **params)
+        return chunker.feed(audio.samples) + chunker.flush()
+
+
+def stream_speech_chunks(frames, **params):
+    """
+    Plans speech chunks while the audio is still being decoded.
+
+    Args:
+        frames: Iterable of AudioChunk in stream order (e.g. from stream_pcm).
+        **params: Planner settings forwarded to VadChunker (min_chunk_ms, max_chunk_ms, ...).
+
+    Yields:
+        AudioChunk: Each speech chunk as soon as its end has been decoded. Only the audio
+                    of the chunk being planned is held, not the recording.
+    """
+    chunker = window = None
+    for frame in frames:
+        if chunker is None:
+            chunker = VadChunker(frame.frame_rate, **params)
+            window = StreamWindow(frame.frame_rate, frame.channels, frame.start_ms)
+            origin = frame.start_ms
+        window.append(frame)
+        for start, end in chunker.feed(frame.samples):
+            yield window.chunk(origin + start, origin + end)
+        window.discard_before(origin + chunker.retained_ms())
+    if chunker is not None:
+        for start, end in chunker.flush():
+            yield window.chunk(origin + start, origin + end)
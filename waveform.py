@@ -0,0 +1,98 @@
+import numpy as np
+
+from audio_buffer import PcmBuffer
+
+# Samples (per channel) summarized by one peak of the finest level
+DEFAULT_BASE_BLOCK = 256
+# Coarsest level sent for display; about the narrowest waveform that is drawn
+MIN_DISPLAY_PEAKS = 256
+# Finest level sent for display; enough for a wide, high-DPI canvas
+MAX_DISPLAY_PEAKS = 8192
+
+
+class PeakPyramid:
+    """
+    Min/max peaks of a recording at several resolutions.
+
+    Level 0 holds the (min, max) of every base_block samples over all channels; each
+    further level halves the previous one by combining neighbouring peaks. Built once
+    per recording from views of the sample buffer, so no full-length copy is made, and
+    any display width is served from the level closest to it.
+
+    Args:
+        audio (PcmBuffer): The decoded recording.
+        base_block (int): Samples per peak at the finest level.
+    """
+
+    def __init__(self, audio: PcmBuffer, base_block: int = DEFAULT_BASE_BLOCK):
+        mins, maxs, tail = _block_peaks(audio.samples, base_block)
+        self._build(len(audio), base_block, mins, maxs, tail)
+
+    @classmethod
+    def from_frames(cls, frames, base_block: int = DEFAULT_BASE_BLOCK) -> "PeakPyramid":
+        """
+        Builds the pyramid from decoded frames (e.g. stream_pcm) in a single pass.
+
+        Only the peaks are kept, so this works for recordings of any length without
+        holding their samples.
+
+        Args:
+            frames: Iterable of AudioChunk in stream order.
+            base_block (int): Samples per peak at the finest level.
+        """
+        mins, maxs = [], []
+        carry = None
+        total_frames, frame_rate = 0, 1
+        for frame in frames:
+            frame_rate = frame.frame_rate
+            total_frames += len(frame.samples)
+            samples = frame.samples if carry is None else np.concatenate([carry, frame.samples])
+            block_mins, block_maxs, carry = _block_peaks(samples, base_block)
+            mins.append(block_mins)
+            maxs.append(block_maxs)
+
+        pyramid = cls.__new__(cls)
+        pyramid._build(int(round(total_frames * 1000 / frame_rate)), base_block,
+                       np.concatenate(mins or [np.empty(0, np.int16)]),
+                       np.concatenate(maxs or [np.empty(0, np.int16)]), carry)
+        return pyramid
+
+    def _build(self, duration_ms, base_block, mins, maxs, tail):
+        self.duration_ms = duration_ms
+        self.base_block = base_block
+        if tail is not None and len(tail):
+            # The partial last block gets a peak of its own
+            mins = np.append(mins, tail.min())
+            maxs = np.append(maxs, tail.max())
+
+        self.scale = float(max(1, -int(mins.min(initial=0)), int(maxs.max(initial=0))))
+        self.levels = [np.stack([mins, maxs], axis=1)]
+        while len(self.levels[-1]) > MIN_DISPLAY_PEAKS:
+            self.levels.append(self._halve(self.levels[-1]))
+
+    @staticmethod
+    def _halve(peaks: np.ndarray) -> np.ndarray:
+        if len(peaks) % 2:
+            peaks = np.concatenate([peaks, peaks[-1:]])
+        pairs = peaks.reshape(-1, 2, 2)
+        return np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+
+    def display_levels(self) -> list:
+        """
+        Levels for the browser to draw from, coarsest first.
+
+        Only levels between MIN_DISPLAY_PEAKS and MAX_DISPLAY_PEAKS are included, so the
+        payload has the same bounded size for a 2-minute and a 2-hour recording.
+
+        Returns:
+            list: One list of [min, max] pairs in [-1, 1] per level.
+        """
+        shown = [peaks for peaks in self.levels if len(peaks) <= MAX_DISPLAY_PEAKS] or self.levels[-1:]
+        return [(peaks / self.scale).round(3).tolist() for peaks in reversed(shown)]
+
+
+def _block_peaks(samples: np.ndarray, base_block: int):
+    # (min, max) of every whole block of base_block frames, plus the frames left over
+    whole = len(samples) // base_block * base_block
+    blocks = samples[:whole].reshape(-1, base_block * samples.shape[1])
+    return blocks.min(axis=1), blocks.max(axis=1), samples[whole:]